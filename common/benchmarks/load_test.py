@@ -0,0 +1,448 @@
+"""
+Load test for the DevOps and MLOps serving stacks.
+
+    python common/benchmarks/load_test.py [--stack devops|mlops|both] [--duration 30]
+        [--concurrency 8] [--mix predict=70,batch=10,races=10,images=10]
+        [--replay requests.jsonl] [--output load_test_results.json]
+
+Starts devops/model_server.py and/or mlops/model_server.py on free local
+ports against a seeded synthetic model and feature store (--races races of
+88-176 riders, RaceRegressionModel-shaped). The MLOps server is pointed at a
+stub service started from this script: mlops/scoring_service.py serving
+the same model via the NumPy engine at /invocations, plus /retrain and the
+two MLflow registry calls its ProductionModelWatcher makes (without MLflow
+installed the watcher never sees a production model, so every MLOps request
+is scored live through /invocations). --devops-url/--mlops-url target
+already running servers instead.
+
+--concurrency closed-loop clients, each with its own seeded RNG, send the
+weighted --mix of request kinds (predict, batch, races, images, redeploy)
+for --duration seconds after --warmup seconds. With --replay, the clients
+instead send each request of a captured log once: one JSON object per line
+with "method", "path" and optionally "json", "headers" and "t" (seconds
+from the start, honoured with --replay-timing); lines without a "path" are
+skipped. RPS, latency percentiles and error rates per request kind go to
+--output.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+
+import numpy as np
+import requests
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.abspath(os.path.join(BENCHMARK_DIR, "..", ".."))
+DEVOPS_DIR = os.path.join(REPO_DIR, "devops")
+MLOPS_DIR = os.path.join(REPO_DIR, "mlops")
+IMAGE_DIR = os.path.join(REPO_DIR, "common", "images")
+RACE_NAMES_PATH = os.path.join(REPO_DIR, "common", "race_names.csv")
+sys.path.insert(0, DEVOPS_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "common"))
+
+from feature_store import RaggedRaces, save_feature_store  # noqa: E402
+from model_artifact import open_model_artifact, save_model_artifact  # noqa: E402
+from numpy_model import NumpyRaceModel  # noqa: E402
+
+KINDS = ("predict", "batch", "races", "images", "redeploy")
+PERCENTILES = (50, 90, 95, 99)
+REGISTERED_MODEL = "Race prediction"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(","):
+        kind, _, weight = part.partition("=")
+        if kind not in KINDS:
+            raise argparse.ArgumentTypeError(f"Unknown request kind {kind!r}, expected one of {', '.join(KINDS)}")
+        weights[kind] = float(weight or 1)
+    return weights
+
+
+def rider_name_pool():
+    # Real image file names, so /images serves pictures rather than the placeholder
+    names = sorted(os.path.splitext(name)[0] for name in os.listdir(IMAGE_DIR) if name.endswith(".jpg")) \
+        if os.path.isdir(IMAGE_DIR) else []
+    return names or [f"Rider {i}" for i in range(2000)]
+
+
+def build_fixtures(workdir, n_races, race_width, rider_width, seed):
+    """
+    A random model artifact plus the same races stored the way each stack
+    serves them: factorized (race and rider features) for DevOps, full rows
+    for MLOps.
+    """
+    rng = np.random.default_rng(seed)
+    input_size = race_width + rider_width
+    model_path = os.path.join(workdir, "model.weights")
+    save_model_artifact(model_path, {
+        "fc1.weight": rng.standard_normal((128, input_size)) * 0.1,
+        "fc1.bias": rng.standard_normal(128) * 0.1,
+        "fc2.weight": rng.standard_normal((1, 128)) * 0.1,
+        "fc2.bias": np.zeros(1)
+    }, {"input_size": input_size, "hidden_size": 128})
+
+    lengths = rng.integers(88, 177, n_races)
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    race_features = rng.random((n_races, race_width), dtype=np.float32)
+    rider_rows = rng.random((offsets[-1], rider_width), dtype=np.float32)
+    pool = rider_name_pool()
+    rider_names = [list(rng.choice(pool, size=n, replace=n > len(pool))) for n in lengths]
+
+    devops_store = os.path.join(workdir, "devops_feature_store")
+    save_feature_store(devops_store, "test", RaggedRaces(rider_rows, offsets, race_features), rider_names)
+    mlops_store = os.path.join(workdir, "mlops_feature_store")
+    full_rows = np.hstack([np.repeat(race_features, lengths, axis=0), rider_rows])
+    save_feature_store(mlops_store, "test", RaggedRaces(full_rows, offsets), rider_names)
+    return model_path, devops_store, mlops_store, sorted({name for race in rider_names for name in race})
+
+
+class DelayedModel:
+    def __init__(self, model, latency):
+        self.model = model
+        self.latency = latency
+
+    def predict(self, X):
+        time.sleep(self.latency)
+        return np.atleast_1d(self.model.predict(X))
+
+
+def run_stub(port, model_path, latency):
+    """
+    Stand-in for the model's scoring service (mlops/scoring_service.py, which
+    takes JSON and NPY bodies), the local retraining server (/retrain) and
+    the registry lookups of mlops/check_model_version.py.
+    """
+    from flask import jsonify
+    from werkzeug.serving import make_server
+    sys.path.insert(0, MLOPS_DIR)
+    from scoring_service import create_app
+
+    model = NumpyRaceModel(open_model_artifact(model_path).weights)
+    version = {
+        "name": REGISTERED_MODEL, "version": "1", "run_id": "load-test",
+        "creation_timestamp": 0, "aliases": ["production"], "current_stage": "None", "status": "READY"
+    }
+    app = create_app(DelayedModel(model, latency))
+
+    @app.route("/retrain", methods=["POST"])
+    def retrain():
+        time.sleep(latency)
+        return jsonify({"message": "Model redeployed successfully.", "result": None}), 200
+
+    @app.route("/api/2.0/mlflow/model-versions/search", methods=["GET", "POST"])
+    def search_model_versions():
+        return jsonify({"model_versions": [version]})
+
+    @app.route("/api/2.0/mlflow/registered-models/alias", methods=["GET"])
+    def get_model_version_by_alias():
+        return jsonify({"model_version": version})
+
+    make_server("127.0.0.1", port, app, threaded=True).serve_forever()
+
+
+class Server:
+    """A server subprocess with its own working directory and log file."""
+
+    def __init__(self, name, args, workdir, env, ready_path):
+        self.name = name
+        self.url = None
+        os.makedirs(workdir, exist_ok=True)
+        self.log_path = os.path.join(workdir, f"{name}.log")
+        self._log = open(self.log_path, "w")
+        self.process = subprocess.Popen(
+            args, cwd=workdir, env={**os.environ, **env}, stdout=self._log, stderr=subprocess.STDOUT
+        )
+        self.ready_path = ready_path
+
+    def wait_ready(self, url, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                break
+            try:
+                if requests.get(url + self.ready_path, timeout=2).status_code == 200:
+                    self.url = url
+                    return url
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        self.stop()
+        with open(self.log_path) as f:
+            log = f.read()[-2000:]
+        raise RuntimeError(f"{self.name} did not become ready (log {self.log_path}):\n{log}")
+
+    def stop(self):
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self._log.close()
+
+
+def server_command(script_dir, port, server):
+    if server == "gunicorn":
+        # As deployed by redeploy_model.sh and webhook_listener.sh
+        return ["gunicorn", "-w", "1", "--threads", "8", "-b", f"127.0.0.1:{port}", "--chdir", script_dir, "model_server:app"]
+    return [sys.executable, os.path.join(script_dir, "model_server.py")]
+
+
+def start_stacks(args, workdir):
+    servers, urls, image_names = [], {}, []
+    needs_fixtures = (args.stack in ("devops", "both") and not args.devops_url) or \
+                     (args.stack in ("mlops", "both") and not args.mlops_url)
+    if needs_fixtures:
+        model_path, devops_store, mlops_store, image_names = build_fixtures(
+            workdir, args.races, args.race_width, args.features - args.race_width, args.seed
+        )
+
+    try:
+        if args.stack in ("devops", "both"):
+            if args.devops_url:
+                urls["devops"] = args.devops_url.rstrip("/")
+            else:
+                port = free_port()
+                server = Server("devops", server_command(DEVOPS_DIR, port, args.server), os.path.join(workdir, "devops"), {
+                    "APP_PORT": str(port), "MODEL_PATH": model_path, "FEATURE_STORE_DIR": devops_store,
+                    "IMAGE_DIR": IMAGE_DIR, "RACE_NAMES_PATH": RACE_NAMES_PATH,
+                    "PROFILE_DIR": os.path.join(workdir, "devops", "profiles")
+                }, "/health")
+                servers.append(server)
+                urls["devops"] = server.wait_ready(f"http://127.0.0.1:{port}", args.startup_timeout)
+
+        if args.stack in ("mlops", "both"):
+            if args.mlops_url:
+                urls["mlops"] = args.mlops_url.rstrip("/")
+            else:
+                stub_port, port = free_port(), free_port()
+                stub = Server("stub", [
+                    sys.executable, os.path.abspath(__file__), "--stub-port", str(stub_port),
+                    "--stub-model", model_path, "--stub-latency-ms", str(args.stub_latency_ms)
+                ], os.path.join(workdir, "stub"), {}, "/ping")
+                servers.append(stub)
+                stub_url = stub.wait_ready(f"http://127.0.0.1:{stub_port}", args.startup_timeout)
+                server = Server("mlops", server_command(MLOPS_DIR, port, args.server), os.path.join(workdir, "mlops"), {
+                    "APP_PORT": str(port), "FEATURE_STORE_DIR": mlops_store,
+                    "IMAGE_DIR": IMAGE_DIR, "RACE_NAMES_PATH": RACE_NAMES_PATH,
+                    "INVOCATIONS_URL": f"{stub_url}/invocations", "RETRAIN_URL": f"{stub_url}/retrain",
+                    "MLFLOW_TRACKING_URI": stub_url, "PROFILE_DIR": os.path.join(workdir, "mlops", "profiles"),
+                    "REDEPLOY_STATE_DIR": os.path.join(workdir, "mlops", "redeploy_jobs")
+                }, "/races")
+                servers.append(server)
+                urls["mlops"] = server.wait_ready(f"http://127.0.0.1:{port}", args.startup_timeout)
+    except Exception:
+        for server in servers:
+            server.stop()
+        raise
+    return servers, urls, image_names
+
+
+def replay_kind(path):
+    path = path.split("?")[0].rstrip("/")
+    if path.startswith("/images/"):
+        return "images"
+    return {"/predict": "predict", "/predict/batch": "batch", "/races": "races", "/redeploy": "redeploy"}.get(path, path)
+
+
+def mix_request(kind, rng, n_races, image_names, batch_size):
+    if kind == "predict":
+        return "POST", "/predict", {"index": rng.randrange(n_races)}
+    if kind == "batch":
+        return "POST", "/predict/batch", {"indices": rng.sample(range(n_races), min(batch_size, n_races))}
+    if kind == "races":
+        return "GET", "/races", None
+    if kind == "images":
+        return "GET", f"/images/{rng.choice(image_names)}.jpg", None
+    return "POST", "/redeploy", {"index": 0}
+
+
+def drive(url, args, image_names, replay=None):
+    """
+    Runs the clients against one server and returns per-request
+    (kind, status, seconds) records from the measured window.
+    """
+    session = requests.Session()
+    n_races = len(session.get(url + "/races", timeout=30).json())
+    if not image_names:
+        image_names = [rider["name"] for rider in session.post(url + "/predict", json={"index": 0}, timeout=30).json()["prediction"]]
+
+    weights = args.mix
+    kinds, cumulative = list(weights), np.cumsum(list(weights.values())).tolist()
+    records, lock = [], threading.Lock()
+    started = time.monotonic()
+    measure_from = started + (0 if replay is not None else args.warmup)
+    stop_at = measure_from + args.duration
+    replay_queue = iter(enumerate(replay or []))
+
+    def client(worker):
+        rng = random.Random(args.seed * 1000 + worker)
+        client_session = requests.Session()
+        local = []
+        while True:
+            if replay is not None:
+                with lock:
+                    entry = next(replay_queue, None)
+                if entry is None:
+                    break
+                _, line = entry
+                if args.replay_timing and "t" in line:
+                    time.sleep(max(0.0, started + float(line["t"]) - time.monotonic()))
+                kind = line.get("kind") or replay_kind(line["path"])
+                method, path, body, headers = line.get("method", "GET"), line["path"], line.get("json"), line.get("headers")
+            else:
+                if time.monotonic() >= stop_at:
+                    break
+                kind = kinds[min(len(kinds) - 1, np.searchsorted(cumulative, rng.random() * cumulative[-1], side="right"))]
+                method, path, body = mix_request(kind, rng, n_races, image_names, args.batch_size)
+                headers = None
+
+            sent = time.monotonic()
+            try:
+                response = client_session.request(method, url + path, json=body, headers=headers, timeout=args.timeout)
+                response.content
+                status = response.status_code
+            except requests.RequestException as e:
+                status = type(e).__name__
+            finished = time.monotonic()
+            if sent >= measure_from:
+                local.append((kind, status, finished - sent, finished))
+        with lock:
+            records.extend(local)
+
+    threads = [threading.Thread(target=client, args=(worker,)) for worker in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = (max(r[3] for r in records) - measure_from) if replay is not None and records else args.duration
+    return records, elapsed
+
+
+def summarize(records, elapsed):
+    def stats(rows):
+        latencies = np.array([seconds for _, _, seconds, _ in rows]) * 1000
+        statuses = Counter(str(status) for _, status, _, _ in rows)
+        errors = sum(count for status, count in statuses.items() if not status.isdigit() or int(status) >= 400)
+        summary = {
+            "requests": len(rows),
+            "rps": len(rows) / elapsed if elapsed > 0 else 0.0,
+            "errors": errors,
+            "error_rate": errors / len(rows) if rows else 0.0,
+            "status": dict(statuses)
+        }
+        if len(latencies):
+            summary["latency_ms"] = {
+                "mean": float(latencies.mean()),
+                **{f"p{p}": float(np.percentile(latencies, p)) for p in PERCENTILES},
+                "max": float(latencies.max())
+            }
+        return summary
+
+    by_kind = defaultdict(list)
+    for record in records:
+        by_kind[record[0]].append(record)
+    return {"seconds": elapsed, "overall": stats(records), "by_kind": {kind: stats(rows) for kind, rows in sorted(by_kind.items())}}
+
+
+def load_replay(path):
+    entries, skipped = [], 0
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if isinstance(entry, dict) and isinstance(entry.get("path"), str):
+                entries.append(entry)
+            else:
+                skipped += 1
+    return entries, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stack", choices=("devops", "mlops", "both"), default="both")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds per stack")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Unmeasured seconds before that")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("predict=70,batch=10,races=10,images=10"))
+    parser.add_argument("--batch-size", type=int, default=10, help="Races per /predict/batch request")
+    parser.add_argument("--replay", help="JSONL request log to replay instead of the mix")
+    parser.add_argument("--replay-timing", action="store_true", help="Honour the log's 't' offsets")
+    parser.add_argument("--output", default="load_test_results.json")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout")
+    parser.add_argument("--server", choices=("flask", "gunicorn"), default="flask", help="How to run the servers")
+    parser.add_argument("--devops-url", help="Use a running DevOps server")
+    parser.add_argument("--mlops-url", help="Use a running MLOps server")
+    parser.add_argument("--races", type=int, default=150, help="Synthetic test races")
+    parser.add_argument("--race-width", type=int, default=200)
+    parser.add_argument("--features", type=int, default=227)
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0, help="Added to each stub /invocations call")
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--keep-workdir", action="store_true", help="Keep fixtures and server logs")
+    parser.add_argument("--stub-port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--stub-model", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stub_port:
+        run_stub(args.stub_port, args.stub_model, args.stub_latency_ms / 1000)
+        return
+
+    replay, skipped = (load_replay(args.replay) if args.replay else (None, 0))
+    if replay is not None and skipped:
+        print(f"Skipping {skipped} lines of {args.replay} without a request path")
+
+    workdir = tempfile.mkdtemp(prefix="load_test_")
+    servers, urls, image_names = start_stacks(args, workdir)
+    results = {
+        "config": {
+            key: value for key, value in vars(args).items()
+            if key not in ("stub_port", "stub_model", "keep_workdir")
+        },
+        "replay_skipped": skipped,
+        "stacks": {}
+    }
+    try:
+        for stack, url in urls.items():
+            print(f"Load testing {stack} at {url}...")
+            records, elapsed = drive(url, args, image_names, replay)
+            summary = results["stacks"][stack] = {"url": url, **summarize(records, elapsed)}
+            overall = summary["overall"]
+            latency = overall.get("latency_ms", {})
+            print(
+                f"{stack}: {overall['requests']} requests, {overall['rps']:.1f} req/s, "
+                f"error rate {overall['error_rate']:.2%}, "
+                + ", ".join(f"p{p} {latency[f'p{p}']:.1f}ms" for p in PERCENTILES if f"p{p}" in latency)
+            )
+    finally:
+        for server in reversed(servers):
+            server.stop()
+        if args.keep_workdir:
+            print(f"Fixtures and server logs kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Hot-swap test for the MLOps API's in-process model (INFERENCE_MODE=in_process)
+against a local file-backed MLflow tracking store.
+
+    python common/benchmarks/model_swap_test.py [--concurrency 4] [--before 5] [--after 10]
+
+Creates a temporary file: tracking store and a synthetic feature store,
+registers version 1 of the model behind the 'production' alias and starts
+mlops/model_server.py against them. Once version 1 answers /predict, clients
+keep sending /predict while version 2 is registered and the alias is moved
+to it. Exits non-zero if any request got a non-200 answer, if the server
+didn't switch to version 2 within --swap-timeout seconds, or if the scores
+didn't change with it.
+
+Needs MLflow installed (mlflow-skinny is enough). MLflow 3 only reads file
+stores with MLFLOW_ALLOW_FILE_STORE=true, which is set here.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+import requests
+
+from load_test import MLOPS_DIR, IMAGE_DIR, RACE_NAMES_PATH, REGISTERED_MODEL, Server, build_fixtures, free_port, server_command
+
+os.environ["MLFLOW_ALLOW_FILE_STORE"] = "true"
+
+
+def register_version(tracking_uri, weights_path):
+    """Logs the NumPy weights as a pyfunc model and points 'production' at it."""
+    import mlflow
+    import mlflow.pyfunc
+
+    class NumpyRaceRegression(mlflow.pyfunc.PythonModel):
+        # fc1 -> ReLU -> fc2 with NumPy only, so the server needs no torch
+        def load_context(self, context):
+            self.weights = dict(np.load(context.artifacts["weights"]))
+
+        def predict(self, context, model_input, params=None):
+            w = self.weights
+            hidden = np.maximum(np.asarray(model_input, dtype=np.float32) @ w["fc1.weight"].T + w["fc1.bias"], 0)
+            return (hidden @ w["fc2.weight"].T + w["fc2.bias"]).reshape(-1)
+
+    mlflow.set_tracking_uri(tracking_uri)
+    mlflow.set_experiment("model-swap-test")
+    with mlflow.start_run():
+        info = mlflow.pyfunc.log_model(
+            artifact_path="model", python_model=NumpyRaceRegression(),
+            artifacts={"weights": weights_path}, registered_model_name=REGISTERED_MODEL
+        )
+    client = mlflow.tracking.MlflowClient()
+    version = str(info.registered_model_version)
+    client.set_registered_model_alias(REGISTERED_MODEL, "production", version)
+    return version
+
+
+def random_weights(path, input_size, seed):
+    rng = np.random.default_rng(seed)
+    np.savez(
+        path,
+        **{
+            "fc1.weight": (rng.standard_normal((128, input_size)) * 0.1).astype(np.float32),
+            "fc1.bias": (rng.standard_normal(128) * 0.1).astype(np.float32),
+            "fc2.weight": (rng.standard_normal((1, 128)) * 0.1).astype(np.float32),
+            "fc2.bias": np.zeros(1, dtype=np.float32)
+        }
+    )
+    return path
+
+
+def served_version(url):
+    metrics = requests.get(url + "/metrics", timeout=5).text
+    match = re.search(r"^mlops_in_process_model_version ([0-9.]+)$", metrics, re.MULTILINE)
+    return None if match is None else str(int(float(match.group(1))))
+
+
+def scores(url, index):
+    response = requests.post(url + "/predict", json={"index": index}, timeout=30)
+    response.raise_for_status()
+    return [rider["prediction"] for rider in response.json()["prediction"]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--before", type=float, default=5.0, help="Seconds of load before the alias moves")
+    parser.add_argument("--after", type=float, default=10.0, help="Seconds of load after the server switched")
+    parser.add_argument("--swap-timeout", type=float, default=120.0)
+    parser.add_argument("--races", type=int, default=40)
+    parser.add_argument("--race-width", type=int, default=200)
+    parser.add_argument("--features", type=int, default=227)
+    parser.add_argument("--server", choices=("flask", "gunicorn"), default="flask")
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--keep-workdir", action="store_true")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="model_swap_test_")
+    tracking_uri = "file://" + os.path.join(workdir, "mlruns")
+    server = None
+    try:
+        _, _, mlops_store, _ = build_fixtures(workdir, args.races, args.race_width, args.features - args.race_width, 0)
+        first = register_version(tracking_uri, random_weights(os.path.join(workdir, "v1.npz"), args.features, 1))
+
+        port = free_port()
+        server = Server("mlops", server_command(MLOPS_DIR, port, args.server), os.path.join(workdir, "mlops"), {
+            "APP_PORT": str(port), "INFERENCE_MODE": "in_process", "MODEL_POLL_INTERVAL": "1",
+            "MLFLOW_TRACKING_URI": tracking_uri, "FEATURE_STORE_DIR": mlops_store,
+            "IMAGE_DIR": IMAGE_DIR, "RACE_NAMES_PATH": RACE_NAMES_PATH,
+            "INVOCATIONS_URL": "http://127.0.0.1:9/invocations", "RETRAIN_URL": "http://127.0.0.1:9/retrain",
+            "PROFILE_DIR": os.path.join(workdir, "mlops", "profiles"),
+            "REDEPLOY_STATE_DIR": os.path.join(workdir, "mlops", "redeploy_jobs")
+        }, "/predict?index=0")
+        # /predict answers 503 until the first version is loaded
+        url = server.wait_ready(f"http://127.0.0.1:{port}", args.startup_timeout)
+        print(f"Serving version {served_version(url)} at {url}")
+        scores_before = scores(url, 0)
+
+        statuses, done = Counter(), threading.Event()
+        lock = threading.Lock()
+
+        def client(seed):
+            rng = random.Random(seed)
+            session = requests.Session()
+            while not done.is_set():
+                try:
+                    status = session.post(url + "/predict", json={"index": rng.randrange(args.races)}, timeout=30).status_code
+                except requests.RequestException as e:
+                    status = type(e).__name__
+                with lock:
+                    statuses[str(status)] += 1
+
+        clients = [threading.Thread(target=client, args=(seed,)) for seed in range(args.concurrency)]
+        for thread in clients:
+            thread.start()
+        try:
+            time.sleep(args.before)
+            second = register_version(tracking_uri, random_weights(os.path.join(workdir, "v2.npz"), args.features, 2))
+            moved_at = time.monotonic()
+            print(f"Moved 'production' from version {first} to {second}")
+            while served_version(url) != second and time.monotonic() - moved_at < args.swap_timeout:
+                time.sleep(0.2)
+            swap_seconds = time.monotonic() - moved_at
+            time.sleep(args.after)
+        finally:
+            done.set()
+            for thread in clients:
+                thread.join()
+
+        switched = served_version(url) == second
+        scores_changed = switched and scores(url, 0) != scores_before
+        failures = sum(count for status, count in statuses.items() if status != "200")
+        result = {
+            "requests": sum(statuses.values()),
+            "status": dict(statuses),
+            "non_200": failures,
+            "switched": switched,
+            "swap_seconds": round(swap_seconds, 2),
+            "scores_changed": scores_changed
+        }
+        print(json.dumps(result))
+        if failures or not switched or not scores_changed:
+            print(f"FAILED (server log: {server.log_path})", file=sys.stderr)
+            return 1
+        print("OK: no non-200 answers across the swap")
+        return 0
+    finally:
+        if server is not None:
+            server.stop()
+        if args.keep_workdir:
+            print(f"Work directory kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""
+Latency and memory of the float32 and int8 NumPy engines.
+
+    python common/benchmarks/quantization_benchmark.py [--model devops/model/model.weights]
+        [--feature-store devops/feature_store --y devops/y_test.npy]
+
+Without --model a random RaceRegressionModel-shaped artifact (227 -> 128 -> 1)
+is used. Without --feature-store the races are random, with the same race
+width and field sizes as the test split; with it (and --y) the accuracy
+guardrail is reported as well.
+
+The DevOps server only serves the int8 engine with QUANTIZED=1: NumPy has no
+int8 GEMM, so it trades the smaller artifact for activations quantized per
+call, which is what this benchmark measures.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+DEVOPS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "devops")
+sys.path.insert(0, DEVOPS_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from feature_store import RaggedRaces, open_feature_store, resolve_feature_store  # noqa: E402
+from model_artifact import INT8, open_model_artifact, quantize_weights, save_model_artifact  # noqa: E402
+from numpy_model import NumpyRaceModel, QuantizedNumpyRaceModel  # noqa: E402
+from quantization import predict_races  # noqa: E402
+from quantization_guardrail import quantization_guardrail, top_k_agreement  # noqa: E402
+
+
+def timed(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def peak_allocation(fn):
+    # Temporary memory one call allocates (NumPy reports its buffers to tracemalloc)
+    fn()
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def random_races(rng, n_races, race_width, rider_width, min_riders, max_riders):
+    lengths = rng.integers(min_riders, max_riders + 1, n_races)
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    return RaggedRaces(
+        rng.random((offsets[-1], rider_width), dtype=np.float32),
+        offsets,
+        rng.random((n_races, race_width), dtype=np.float32)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", help="Float model weight artifact")
+    parser.add_argument("--feature-store", help="Feature store root with a test split to score")
+    parser.add_argument("--y", help="y_test.npy matching the feature store, for the guardrail")
+    parser.add_argument("--races", type=int, default=153)
+    parser.add_argument("--race-width", type=int, default=200)
+    parser.add_argument("--features", type=int, default=227)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    workdir = tempfile.mkdtemp()
+    float_path = args.model
+    if float_path is None:
+        float_path = os.path.join(workdir, "model.weights")
+        save_model_artifact(float_path, {
+            "fc1.weight": rng.standard_normal((128, args.features)) * 0.1,
+            "fc1.bias": rng.standard_normal(128) * 0.1,
+            "fc2.weight": rng.standard_normal((1, 128)) * 0.1,
+            "fc2.bias": np.zeros(1)
+        }, {"input_size": args.features, "hidden_size": 128})
+    artifact = open_model_artifact(float_path)
+    int8_path = os.path.join(workdir, "model.int8.weights")
+    save_model_artifact(int8_path, quantize_weights(artifact.weights), artifact.manifest["hyperparameters"], quantization=INT8)
+    int8_artifact = open_model_artifact(int8_path)
+
+    if args.feature_store:
+        races = open_feature_store(resolve_feature_store(args.feature_store, "test")).features
+    else:
+        races = random_races(rng, args.races, args.race_width, args.features - args.race_width, 88, 176)
+    race = races[[int(np.argmax(races.lengths))]]
+
+    engines = {
+        "float32": (float_path, artifact, NumpyRaceModel(artifact.weights)),
+        "int8": (int8_path, int8_artifact, QuantizedNumpyRaceModel(int8_artifact.weights))
+    }
+    results = {}
+    for label, (path, engine_artifact, engine) in engines.items():
+        results[label] = {
+            "artifact_bytes": os.path.getsize(path),
+            "weight_bytes": sum(weights.nbytes for weights in engine_artifact.weights.values()),
+            "race_ms": timed(lambda: predict_races(engine, race), args.repeat),
+            "table_ms": timed(lambda: predict_races(engine, races), max(args.repeat // 20, 1)),
+            "race_peak_bytes": peak_allocation(lambda: predict_races(engine, race)),
+            "table_peak_bytes": peak_allocation(lambda: predict_races(engine, races))
+        }
+
+    reference = predict_races(engines["float32"][2], races)
+    candidate = predict_races(engines["int8"][2], races)
+    results["int8"]["max_prediction_difference"] = float(np.max(np.abs(reference - candidate)))
+    results["int8"]["top3_agreement"] = top_k_agreement(reference, candidate, races.offsets)
+    if args.y:
+        results["guardrail"] = quantization_guardrail(reference, candidate, np.load(args.y), races.offsets)
+
+    print(f"{len(races)} races, {len(races.rider_rows)} riders; single race of {len(race.rider_rows)} riders")
+    print(f"{'':8} {'artifact':>10} {'weights':>10} {'race':>9} {'table':>9} {'race peak':>10} {'table peak':>11}")
+    for label in engines:
+        r = results[label]
+        print(
+            f"{label:8} {r['artifact_bytes'] / 1024:8.1f}KB {r['weight_bytes'] / 1024:8.1f}KB "
+            f"{r['race_ms']:7.3f}ms {r['table_ms']:7.3f}ms "
+            f"{r['race_peak_bytes'] / 1024:8.1f}KB {r['table_peak_bytes'] / 1024:9.1f}KB"
+        )
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
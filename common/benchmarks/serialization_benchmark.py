@@ -0,0 +1,119 @@
+"""
+Serialization share of /predict latency, before and after the RiderEncoder
+fast path.
+
+    python common/benchmarks/serialization_benchmark.py [--model devops/model/model.weights]
+
+Without --model the forward pass is timed with a NumPy stand-in of the same
+shape as RaceRegressionModel (227 -> 128 -> 1).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+DEVOPS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "devops")
+sys.path.insert(0, DEVOPS_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import serialization  # noqa: E402
+from model_artifact import open_model_artifact  # noqa: E402
+from numpy_model import NumpyRaceModel  # noqa: E402
+
+IMAGE_URL = "http://seito.lavbic.net:15000/images/{name}.jpg"
+
+
+def legacy_dumps():
+    # What jsonify used to do with the list of dicts
+    try:
+        from flask import Flask
+        return Flask(__name__).json.dumps
+    except ImportError:
+        return lambda obj: json.dumps(obj, sort_keys=True)
+
+
+def legacy_response(dumps, names, prediction):
+    rider_prediction = [
+        {
+            "name": name,
+            "prediction": float(pred),
+            "image_url": os.path.join(f"http://seito.lavbic.net:15000/images/{name}.jpg")
+        }
+        for name, pred in zip(names, prediction) if name != "PAD"
+    ]
+    rider_prediction.sort(key=lambda x: x["prediction"], reverse=True)
+    return dumps({"prediction": rider_prediction}).encode()
+
+
+def fast_response(encoder, names, prediction):
+    riders = np.flatnonzero(names != "PAD")
+    scores = prediction[riders]
+    order = np.lexsort((np.arange(len(riders)), -scores))
+    return serialization.prediction_body(encoder.encode(names[riders[order]], scores[order]))
+
+
+def timed(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", help="Model weight artifact to time the forward pass with")
+    parser.add_argument("--riders", type=int, default=150, help="Starters in the race")
+    parser.add_argument("--max-riders", type=int, default=207, help="Padded race size")
+    parser.add_argument("--features", type=int, default=227)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    race = rng.standard_normal((args.max_riders, args.features)).astype(np.float32)
+    names = np.array(
+        [f"Rider  Nümber{i}" for i in range(args.riders)] + ["PAD"] * (args.max_riders - args.riders),
+        dtype=object
+    )
+
+    if args.model:
+        forward = NumpyRaceModel(open_model_artifact(args.model).weights).predict
+    else:
+        w1 = rng.standard_normal((args.features, 128)).astype(np.float32)
+        w2 = rng.standard_normal((128, 1)).astype(np.float32)
+        forward = lambda X: (np.maximum(X @ w1, 0) @ w2).reshape(-1)  # noqa: E731
+    prediction = np.asarray(forward(race)).reshape(-1)
+
+    forward_ms = timed(lambda: forward(race), args.repeat)
+    results = {"forward_ms": forward_ms, "serializers": {}}
+
+    dumps = legacy_dumps()
+    candidates = [("legacy dicts + jsonify", lambda: legacy_response(dumps, names, prediction))]
+    for backend in ("json", "orjson"):
+        if backend == "orjson" and serialization.orjson is None:
+            continue
+        serialization.JSON_BACKEND = backend
+        encoder = serialization.RiderEncoder(IMAGE_URL)
+        # Fills the per-rider table now, while this backend is selected
+        fast_response(encoder, names, prediction)
+        candidates.append((f"RiderEncoder ({backend})", lambda encoder=encoder: fast_response(encoder, names, prediction)))
+
+    # Table hit: the rows are already encoded, only the body is joined
+    rows = serialization.RiderEncoder(IMAGE_URL).encode(names[:args.riders], prediction[:args.riders])
+    candidates.append(("prediction table hit", lambda: serialization.prediction_body(rows)))
+
+    print(f"forward pass ({args.riders} riders): {forward_ms:.3f} ms")
+    for label, fn in candidates:
+        ms = timed(fn, args.repeat)
+        share = ms / (ms + forward_ms) * 100
+        results["serializers"][label] = {"ms": ms, "share_of_predict": share, "bytes": len(fn())}
+        print(f"{label:<28} {ms:8.3f} ms  {share:5.1f}% of forward+serialize  {len(fn())} bytes")
+
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Bytes and latency of JSON vs NPY bodies for MLOps -> /invocations calls.
+
+    python common/benchmarks/transport_benchmark.py [--rows 150 4096] [--repeat 50]
+
+Encodes --rows rows of --features float32 features each way, then scores
+them through mlops/scoring_service.py, served locally in a background thread
+with a RaceRegressionModel-shaped NumPy model, over one keep-alive
+connection. 150 rows is a typical race (a live /predict); 4096 is one
+prediction table batch.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, "..", "..", "devops"))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, "..", "..", "mlops"))
+
+from http_client import UpstreamClient  # noqa: E402
+from numpy_model import NumpyRaceModel  # noqa: E402
+from scoring_service import create_app  # noqa: E402
+from tensor_transport import InvocationsTransport, decode_npy, encode_npy  # noqa: E402
+
+
+def timed(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def serve(app):
+    from werkzeug.serving import make_server
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}/invocations"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[150, 4096])
+    parser.add_argument("--features", type=int, default=227)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    model = NumpyRaceModel({
+        "fc1.weight": (rng.standard_normal((128, args.features)) * 0.1).astype(np.float32),
+        "fc1.bias": (rng.standard_normal(128) * 0.1).astype(np.float32),
+        "fc2.weight": (rng.standard_normal((1, 128)) * 0.1).astype(np.float32),
+        "fc2.bias": np.zeros(1, dtype=np.float32)
+    })
+    url = serve(create_app(model))
+    client = UpstreamClient("benchmark", pool_size=1, read_timeout=60.0)
+
+    results = {}
+    for n_rows in args.rows:
+        rows = rng.random((n_rows, args.features), dtype=np.float32)
+        predictions = model.predict(rows).reshape(-1)
+        results[n_rows] = {}
+        for mode in ("json", "npy"):
+            transport = InvocationsTransport(mode)
+            body, headers = transport.encode(rows)
+            response = client.post(url, data=body, headers=headers)
+            response.raise_for_status()
+            scores = transport.decode(response)
+            if mode == "json":
+                decode_request = lambda: np.asarray(json.loads(body)["instances"], dtype=np.float32)  # noqa: E731
+                encode_response = lambda: json.dumps({"predictions": predictions.tolist()})  # noqa: E731
+            else:
+                decode_request = lambda: decode_npy(body)  # noqa: E731
+                encode_response = lambda: encode_npy(predictions)  # noqa: E731
+            results[n_rows][mode] = {
+                "request_bytes": len(body),
+                "response_bytes": len(response.content),
+                "encode_ms": timed(lambda: transport.encode(rows), args.repeat),
+                "server_decode_ms": timed(decode_request, args.repeat),
+                "server_encode_ms": timed(encode_response, args.repeat),
+                "decode_ms": timed(lambda: transport.decode(response), args.repeat),
+                "round_trip_ms": timed(lambda: transport.decode(client.post(url, data=body, headers=headers)), args.repeat),
+                "max_difference": float(np.max(np.abs(scores - predictions)))
+            }
+
+    print(f"{'rows':>6} {'format':6} {'request':>10} {'response':>10} {'encode':>8} {'srv dec':>8} "
+          f"{'srv enc':>8} {'decode':>8} {'round trip':>11}")
+    for n_rows, modes in results.items():
+        for mode, r in modes.items():
+            print(
+                f"{n_rows:6} {mode:6} {r['request_bytes'] / 1024:8.1f}KB {r['response_bytes'] / 1024:8.1f}KB "
+                f"{r['encode_ms']:6.2f}ms {r['server_decode_ms']:6.2f}ms {r['server_encode_ms']:6.2f}ms "
+                f"{r['decode_ms']:6.2f}ms {r['round_trip_ms']:9.2f}ms"
+            )
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import sys
+
+import numpy as np
+
+from feature_store import RaggedRaces, format_padding_report, padding_report, save_feature_store
+
+PAD_NAME = "PAD"
+
+
+def infer_race_width(X):
+    # The race block is the leading columns identical for every rider of every race
+    X = np.asarray(X)
+    constant = np.all(X == X[:, :1, :], axis=(0, 1))
+    return len(constant) if constant.all() else int(np.argmin(constant))
+
+
+def ragged_from_padded(X, mask, race_width=0):
+    """
+    Drops the padding from a (races, max_riders, features) matrix; mask
+    marks the real riders. With race_width, the leading race_width columns
+    (tiled per race) are stored once per race.
+    """
+    X = np.asarray(X)
+    mask = np.asarray(mask, dtype=bool)
+    offsets = np.concatenate(([0], np.cumsum(mask.sum(axis=1))))
+    if not race_width:
+        return RaggedRaces(X[mask], offsets)
+    return RaggedRaces(X[mask][:, race_width:], offsets, X[:, 0, :race_width])
+
+
+def convert_feature_store(X_path, rider_names_path, root, split="test", factorize=False):
+    """
+    Writes a padded X_test.npy / rider_names_test.npy pair from before the
+    feature store to the ragged layout, optionally storing the tiled race
+    features once per race.
+    """
+    X = np.load(X_path, allow_pickle=True)
+    rider_names = np.load(rider_names_path, allow_pickle=True)
+    mask = rider_names != PAD_NAME
+    race_width = infer_race_width(X) if factorize else 0
+    races = ragged_from_padded(X, mask, race_width)
+    names = [race[race_mask] for race, race_mask in zip(rider_names, mask)]
+    build_dir = save_feature_store(root, split, races, names)
+    return build_dir, padding_report(races.lengths, X.shape[1], race_width, X.shape[2] - race_width)
+
+
+if __name__ == "__main__":
+    # python convert_feature_store.py X_test.npy rider_names_test.npy feature_store [split] [--factorize]
+    factorize = "--factorize" in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg != "--factorize"]
+    if len(args) not in (3, 4):
+        print("Usage: python convert_feature_store.py <X.npy> <rider_names.npy> <root> [split] [--factorize]", file=sys.stderr)
+        sys.exit(1)
+    build_dir, report = convert_feature_store(*args, factorize=factorize)
+    print(f"Feature store written to {build_dir}")
+    print(format_padding_report(report))
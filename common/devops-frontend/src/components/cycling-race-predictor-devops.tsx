@@ -25,6 +25,7 @@ export default function CyclingRacePredictor() {
   const [selectedStage, setSelectedStage] = useState<string>('Stage 1')
   const [stages, setStages] = useState<string[]>([])
   const [topCyclists, setTopCyclists] = useState<Cyclist[]>([])
+  const [stagePredictions, setStagePredictions] = useState<Record<number, Cyclist[]>>({})
   const [isOpen, setIsOpen] = useState(false)
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState<string | null>(null)
@@ -70,7 +71,7 @@ export default function CyclingRacePredictor() {
 
         const stage1Race = raceStages.find(r => r.stage === 'Stage 1')
         if (stage1Race) {
-          await fetchPredictions(stage1Race.index)
+          await fetchStagePredictions(race.name, stage1Race.index)
         } else {
           console.error('Could not find Stage 1 for race:', race.name)
         }
@@ -86,7 +87,45 @@ export default function CyclingRacePredictor() {
     
     const raceStage = races.find(r => r.name === selectedRace?.name && r.stage === stage)
     if (raceStage) {
-      fetchPredictions(raceStage.index)
+      const cached = stagePredictions[raceStage.index]
+      if (cached) {
+        setTopCyclists(cached)
+      } else {
+        fetchPredictions(raceStage.index)
+      }
+    }
+  }
+
+  const toCyclists = (predictionData: { name: string, image_url: string, prediction: number }[]): Cyclist[] =>
+    predictionData.map((cyclist, i) => ({
+      id: i + 1,
+      name: cyclist.name,
+      winPercentage: (cyclist.prediction * 100).toFixed(2),
+      // 40px avatars only need the thumbnail, not the full-size photo
+      imageUrl: `${cyclist.image_url}?variant=thumb`
+    }))
+
+  // Loads every stage of a race in one request so switching stages needs no round trip
+  const fetchStagePredictions = async (raceName: string, raceIndex: number) => {
+    setLoading(true)
+    setError(null)
+
+    try {
+      const response = await axios.post('http://seito.lavbic.net:15000/predict/batch', { race: raceName })
+
+      const byIndex: Record<number, Cyclist[]> = {}
+      for (const entry of response.data.predictions) {
+        byIndex[entry.index] = toCyclists(entry.prediction)
+      }
+
+      setStagePredictions(byIndex)
+      setTopCyclists(byIndex[raceIndex] ?? [])
+    } catch (err) {
+      console.error('Error fetching stage predictions:', err)
+      setError('Failed to fetch predictions. Please try again.')
+      setTopCyclists([])
+    } finally {
+      setLoading(false)
     }
   }
 
@@ -95,18 +134,10 @@ export default function CyclingRacePredictor() {
     setError(null)
     
     try {
-      const response = await axios.post('http://seito.lavbic.net:15000/predict', { index: raceIndex })
+      // GET so the browser can revalidate with the ETag instead of re-downloading
+      const response = await axios.get('http://seito.lavbic.net:15000/predict', { params: { index: raceIndex } })
       
-      const predictionData = response.data.prediction
-
-      const cyclists = predictionData.map((cyclist: { name: string, image_url: string, prediction: number }, i: number) => ({
-        id: i + 1,
-        name: cyclist.name,
-        winPercentage: (cyclist.prediction * 100).toFixed(2),
-        imageUrl: cyclist.image_url
-      }))
-
-      setTopCyclists(cyclists)
+      setTopCyclists(toCyclists(response.data.prediction))
     } catch (err) {
       console.error('Error fetching predictions:', err)
       setError('Failed to fetch predictions. Please try again.')
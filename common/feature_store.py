@@ -0,0 +1,263 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from collections import namedtuple
+
+import numpy as np
+
+RACE_FEATURES_FILE = "race_features.npy"
+RIDER_ROWS_FILE = "rider_rows.npy"
+OFFSETS_FILE = "offsets.npy"
+RIDER_IDS_FILE = "rider_ids.npy"
+RIDER_VOCAB_FILE = "rider_vocab.json"
+MANIFEST_FILE = "manifest.json"
+RAGGED_LAYOUT = "ragged"
+
+# Features and rider ids are read-only memory maps, so every worker process
+# shares the same page-cache copy instead of holding its own.
+FeatureStore = namedtuple("FeatureStore", ["path", "version", "features", "rider_ids", "rider_vocab"])
+
+
+class RaggedRaces:
+    """
+    Races without padding: the riders of every race concatenated into one
+    matrix, race i being rider_rows[offsets[i]:offsets[i + 1]], so no PAD row
+    is ever stored or scored.
+
+    With race_features, rider_rows hold only the rider columns and each
+    race's own features are stored once per race instead of being tiled into
+    every rider row; the model's fc1 is split to match (predict_ragged).
+
+    Indexing with an int gives the dense (riders, features) matrix of one
+    race; indexing with a slice, list or array gives another RaggedRaces.
+    """
+
+    def __init__(self, rider_rows, offsets, race_features=None):
+        offsets = np.asarray(offsets, dtype=np.int64)
+        if len(offsets) == 0 or offsets[0] != 0 or offsets[-1] != len(rider_rows) or np.any(np.diff(offsets) < 0):
+            raise ValueError("offsets must rise from 0 to the number of rider rows")
+        if race_features is not None and len(race_features) != len(offsets) - 1:
+            raise ValueError("race_features must have one row per race")
+        self.rider_rows = rider_rows
+        self.offsets = offsets
+        self.race_features = race_features
+
+    @property
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    @property
+    def race_width(self):
+        return 0 if self.race_features is None else self.race_features.shape[1]
+
+    @property
+    def width(self):
+        return self.race_width + self.rider_rows.shape[1]
+
+    @property
+    def nbytes(self):
+        race_bytes = 0 if self.race_features is None else self.race_features.nbytes
+        return self.rider_rows.nbytes + self.offsets.nbytes + race_bytes
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        offsets = self.offsets
+        if isinstance(index, (int, np.integer)):
+            index = range(len(self))[index]
+            rows = self.rider_rows[offsets[index]:offsets[index + 1]]
+            if self.race_features is None:
+                return rows
+            race = np.broadcast_to(self.race_features[index], (len(rows), self.race_width))
+            return np.concatenate((race, rows), axis=1)
+
+        if isinstance(index, slice) and index.step in (None, 1):
+            # Contiguous races stay views into the (memory-mapped) arrays
+            start, stop, _ = index.indices(len(self))
+            stop = max(start, stop)
+            return RaggedRaces(
+                self.rider_rows[offsets[start]:offsets[stop]],
+                offsets[start:stop + 1] - offsets[start],
+                None if self.race_features is None else self.race_features[start:stop]
+            )
+
+        indices = np.arange(len(self))[index]
+        rows = [self.rider_rows[offsets[i]:offsets[i + 1]] for i in indices]
+        return RaggedRaces(
+            np.concatenate(rows) if rows else self.rider_rows[:0],
+            np.concatenate(([0], np.cumsum(self.lengths[indices]))),
+            None if self.race_features is None else self.race_features[indices]
+        )
+
+    def race_index(self):
+        # The race each rider row belongs to
+        return np.repeat(np.arange(len(self)), self.lengths)
+
+    def flat_rows(self):
+        # Full (riders, race_width + rider_width) rows for models that need them
+        if self.race_features is None:
+            return self.rider_rows
+        race = np.repeat(self.race_features, self.lengths, axis=0)
+        return np.concatenate((race, self.rider_rows), axis=1)
+
+
+def padding_report(lengths, max_riders, race_width, rider_width, hidden_size=128):
+    """
+    Storage and fc1 work of the padded, tiled layout versus the ragged one
+    (race features stored once per race when race_width is non-zero).
+    """
+    lengths = np.asarray(lengths)
+    races, rows = len(lengths), int(lengths.sum())
+    width = race_width + rider_width
+    padded_bytes = races * max_riders * width * 4
+    ragged_bytes = (rows * rider_width + races * race_width) * 4 + (races + 1) * 8
+    padded_macs = races * max_riders * width * hidden_size
+    ragged_macs = (rows * rider_width + races * race_width) * hidden_size
+    return {
+        "races": races,
+        "rider_rows": rows,
+        "padded_rows": races * max_riders,
+        "pad_fraction": 1 - rows / max(races * max_riders, 1),
+        "padded_bytes": padded_bytes,
+        "ragged_bytes": ragged_bytes,
+        "memory_saved": 1 - ragged_bytes / max(padded_bytes, 1),
+        "padded_fc1_macs": padded_macs,
+        "ragged_fc1_macs": ragged_macs,
+        "compute_saved": 1 - ragged_macs / max(padded_macs, 1)
+    }
+
+
+def format_padding_report(report):
+    return (
+        f"{report['races']} races, {report['rider_rows']} riders in {report['padded_rows']} padded rows "
+        f"({report['pad_fraction']:.1%} padding)\n"
+        f"features: {report['padded_bytes'] / 1e6:.1f} MB padded, {report['ragged_bytes'] / 1e6:.1f} MB ragged "
+        f"({report['memory_saved']:.1%} saved)\n"
+        f"fc1 work: {report['padded_fc1_macs'] / 1e6:.0f}M MACs padded, {report['ragged_fc1_macs'] / 1e6:.0f}M ragged "
+        f"({report['compute_saved']:.1%} saved)"
+    )
+
+
+def _digest(path, chunk_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=8)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def encode_rider_names(rider_names):
+    # rider_names holds one sequence of names per race; the ids are flat
+    vocab = sorted({str(name) for race in rider_names for name in race})
+    lookup = {name: i for i, name in enumerate(vocab)}
+    rider_ids = np.array([lookup[str(name)] for race in rider_names for name in race], dtype=np.int32)
+    return rider_ids, vocab
+
+
+def decode_rider_names(rider_ids, rider_vocab, offsets):
+    # One array of names per race
+    names = np.array(list(rider_vocab), dtype=object)[np.asarray(rider_ids)]
+    races = np.empty(len(offsets) - 1, dtype=object)
+    for i in range(len(races)):
+        races[i] = names[offsets[i]:offsets[i + 1]]
+    return races
+
+
+def save_feature_store(root, split, X, rider_names, keep=2):
+    """
+    Writes the ragged races X and each race's rider names as a pickle-free
+    build directory and then atomically points the `<root>/<split>` symlink
+    at it.
+    """
+    if len(rider_names) != len(X) or sum(len(race) for race in rider_names) != len(X.rider_rows):
+        raise ValueError("rider_names must have one name per rider row")
+
+    os.makedirs(root, exist_ok=True)
+    build_dir = os.path.join(root, f"{split}-{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}")
+    os.makedirs(build_dir)
+
+    rider_ids, vocab = encode_rider_names(rider_names)
+    feature_files = [RIDER_ROWS_FILE, OFFSETS_FILE]
+    np.save(os.path.join(build_dir, RIDER_ROWS_FILE), np.ascontiguousarray(X.rider_rows, dtype=np.float32))
+    np.save(os.path.join(build_dir, OFFSETS_FILE), X.offsets)
+    if X.race_features is not None:
+        feature_files.append(RACE_FEATURES_FILE)
+        np.save(os.path.join(build_dir, RACE_FEATURES_FILE), np.ascontiguousarray(X.race_features, dtype=np.float32))
+    np.save(os.path.join(build_dir, RIDER_IDS_FILE), rider_ids)
+    with open(os.path.join(build_dir, RIDER_VOCAB_FILE), 'w', encoding='utf-8') as f:
+        json.dump(vocab, f, ensure_ascii=False)
+
+    version = hashlib.blake2b(
+        "".join(_digest(os.path.join(build_dir, name)) for name in feature_files + [RIDER_IDS_FILE, RIDER_VOCAB_FILE]).encode(),
+        digest_size=8
+    ).hexdigest()
+    manifest = {
+        "version": version,
+        "layout": RAGGED_LAYOUT,
+        "races": len(X),
+        "rows": len(X.rider_rows),
+        "width": X.width,
+        "race_width": X.race_width,
+        "riders": len(vocab)
+    }
+    with open(os.path.join(build_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f)
+
+    link = os.path.join(root, split)
+    tmp_link = link + ".tmp"
+    if os.path.lexists(tmp_link):
+        os.remove(tmp_link)
+    os.symlink(os.path.basename(build_dir), tmp_link)
+    os.replace(tmp_link, link)
+
+    # Keep the previous build around for workers that are still switching over
+    builds = sorted(
+        (entry for entry in os.listdir(root) if entry.startswith(f"{split}-")),
+        key=lambda entry: os.path.getmtime(os.path.join(root, entry))
+    )
+    for entry in builds[:-keep]:
+        shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+
+    return build_dir
+
+
+def resolve_feature_store(root, split):
+    link = os.path.join(root, split)
+    if not os.path.exists(link):
+        raise FileNotFoundError(f"Feature store not found: {link}")
+    return os.path.realpath(link)
+
+
+def open_feature_store(build_dir):
+    with open(os.path.join(build_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    with open(os.path.join(build_dir, RIDER_VOCAB_FILE), encoding='utf-8') as f:
+        rider_vocab = json.load(f)
+
+    if manifest.get("layout") != RAGGED_LAYOUT:
+        raise ValueError(f"Feature store at {build_dir} is padded; rebuild it with convert_feature_store.py")
+
+    race_features = None
+    if manifest["race_width"]:
+        race_features = np.load(os.path.join(build_dir, RACE_FEATURES_FILE), mmap_mode='r')
+    features = RaggedRaces(
+        np.load(os.path.join(build_dir, RIDER_ROWS_FILE), mmap_mode='r'),
+        np.load(os.path.join(build_dir, OFFSETS_FILE)),
+        race_features
+    )
+    rider_ids = np.load(os.path.join(build_dir, RIDER_IDS_FILE), mmap_mode='r')
+    if (len(features), len(features.rider_rows), features.width) != (manifest["races"], manifest["rows"], manifest["width"]) \
+            or len(rider_ids) != len(features.rider_rows):
+        raise ValueError(f"Feature store at {build_dir} is inconsistent with its manifest")
+
+    return FeatureStore(
+        path=build_dir,
+        version=manifest["version"],
+        features=features,
+        rider_ids=rider_ids,
+        rider_vocab=rider_vocab
+    )
+
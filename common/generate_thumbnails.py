@@ -0,0 +1,47 @@
+import os
+import sys
+
+from PIL import Image, ImageOps
+
+# The frontends show riders as 40x40 avatars; 80x80 keeps them sharp on HiDPI screens
+THUMBNAIL_SIZE = (80, 80)
+THUMBNAIL_DIR = "thumbs"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def generate_thumbnails(image_dir, size=THUMBNAIL_SIZE, force=False):
+    """
+    Writes a square thumbnail for every image in image_dir to
+    image_dir/thumbs, skipping thumbnails that are already up to date.
+    """
+    thumbnail_dir = os.path.join(image_dir, THUMBNAIL_DIR)
+    os.makedirs(thumbnail_dir, exist_ok=True)
+
+    written = 0
+    for entry in os.scandir(image_dir):
+        if not entry.is_file() or not entry.name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        target = os.path.join(thumbnail_dir, entry.name)
+        if not force and os.path.exists(target) and os.path.getmtime(target) >= entry.stat().st_mtime:
+            continue
+
+        try:
+            with Image.open(entry.path) as image:
+                thumbnail = ImageOps.fit(ImageOps.exif_transpose(image), size, Image.LANCZOS)
+                if entry.name.lower().endswith((".jpg", ".jpeg")):
+                    thumbnail = thumbnail.convert("RGB")
+                # Write next to the target and rename so the servers never read a partial file
+                tmp_target = os.path.join(thumbnail_dir, f".{entry.name}.tmp")
+                thumbnail.save(tmp_target, format=image.format, quality=85, optimize=True)
+            os.replace(tmp_target, target)
+            written += 1
+        except Exception as e:
+            print(f"Skipping {entry.name}: {e}", file=sys.stderr)
+
+    return written
+
+
+if __name__ == "__main__":
+    image_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), "images")
+    force = "--force" in sys.argv[2:]
+    print(f"Generated {generate_thumbnails(image_dir, force=force)} thumbnails in {os.path.join(image_dir, THUMBNAIL_DIR)}")
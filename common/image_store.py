@@ -0,0 +1,125 @@
+import hashlib
+import logging
+import mimetypes
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from prometheus_client import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN_IMAGE = "unknown.jpg"
+THUMBNAIL_DIR = "thumbs"
+
+CachedImage = namedtuple("CachedImage", ["body", "etag", "last_modified", "mimetype", "fallback"])
+
+
+def scan_images(directory):
+    if not os.path.isdir(directory):
+        return {}
+    with os.scandir(directory) as entries:
+        return {entry.name: entry.path for entry in entries if entry.is_file()}
+
+
+class ImageStore:
+    """
+    Serves rider images from a manifest of IMAGE_DIR built at startup and a
+    byte-bounded LRU, so a results page costs no stat or open per rider.
+    Thumbnails are looked up in IMAGE_DIR/thumbs (see
+    common/generate_thumbnails.py) and fall back to the full-size image.
+    Metrics are prefixed with namespace ("devops" or "mlops").
+    """
+
+    def __init__(self, namespace, image_dir, max_bytes=64 * 1024 * 1024, refresh_interval=60.0):
+        self.cache_lookups = Counter(
+            f"{namespace}_image_cache_lookups_total",
+            "Rider image lookups served from memory or disk",
+            ["result"]
+        )
+        self.cache_bytes = Gauge(
+            f"{namespace}_image_cache_bytes",
+            "Bytes of rider images held in the in-memory LRU"
+        )
+        self.image_dir = image_dir
+        self.max_bytes = max_bytes
+        self.refresh_interval = refresh_interval
+
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._cached_bytes = 0
+        self._manifest = {}
+        self._thumbnails = {}
+        self._dir_mtimes = None
+        self._last_refresh = 0.0
+        self._refresh()
+
+    def _refresh(self):
+        thumbnail_dir = os.path.join(self.image_dir, THUMBNAIL_DIR)
+        dir_mtimes = tuple(
+            os.stat(path).st_mtime_ns if os.path.isdir(path) else None
+            for path in (self.image_dir, thumbnail_dir)
+        )
+        self._last_refresh = time.monotonic()
+        if dir_mtimes == self._dir_mtimes:
+            return
+
+        self._manifest = scan_images(self.image_dir)
+        self._thumbnails = scan_images(thumbnail_dir)
+        self._dir_mtimes = dir_mtimes
+        with self._lock:
+            self._cache.clear()
+            self._cached_bytes = 0
+            self.cache_bytes.set(0)
+        logger.info(f"Image manifest built: {len(self._manifest)} images, {len(self._thumbnails)} thumbnails")
+
+    def resolve(self, filename, variant=None):
+        if time.monotonic() - self._last_refresh > self.refresh_interval:
+            self._refresh()
+
+        if filename not in self._manifest:
+            filename = UNKNOWN_IMAGE
+            fallback = True
+        else:
+            fallback = False
+
+        if variant == "thumb" and filename in self._thumbnails:
+            return self._thumbnails[filename], fallback
+        return self._manifest.get(filename), fallback
+
+    def get(self, filename, variant=None):
+        path, fallback = self.resolve(filename, variant)
+        if path is None:
+            raise FileNotFoundError(f"Image not found: {filename}")
+
+        with self._lock:
+            image = self._cache.get(path)
+            if image is not None:
+                self._cache.move_to_end(path)
+        if image is not None:
+            self.cache_lookups.labels(result="hit").inc()
+            return image._replace(fallback=fallback)
+
+        self.cache_lookups.labels(result="miss").inc()
+        with open(path, 'rb') as f:
+            body = f.read()
+            last_modified = os.fstat(f.fileno()).st_mtime
+        image = CachedImage(
+            body=body,
+            etag=hashlib.blake2b(body, digest_size=16).hexdigest(),
+            last_modified=last_modified,
+            mimetype=mimetypes.guess_type(path)[0] or "application/octet-stream",
+            fallback=fallback
+        )
+
+        if len(body) <= self.max_bytes:
+            with self._lock:
+                if path not in self._cache:
+                    self._cache[path] = image
+                    self._cached_bytes += len(body)
+                while self._cached_bytes > self.max_bytes:
+                    _, evicted = self._cache.popitem(last=False)
+                    self._cached_bytes -= len(evicted.body)
+                self.cache_bytes.set(self._cached_bytes)
+        return image
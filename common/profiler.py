@@ -0,0 +1,229 @@
+import hmac
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import Response, jsonify, request
+
+logger = logging.getLogger(__name__)
+
+
+class SamplingProfiler:
+    """
+    Opt-in wall-clock sampling profiler for a live server. While a profile
+    runs, a background thread snapshots the stacks of the worker's threads
+    every interval seconds (sys._current_frames) and counts identical stacks,
+    across however many requests it sees. When it is off there is no thread
+    and each request costs one attribute check.
+
+    Two modes:
+      start(seconds)           samples every thread for seconds
+      start(seconds, every=n)  samples only the threads serving every nth
+                               request that starts during those seconds
+
+    collapsed() renders the counts in the collapsed-stack format read by
+    flamegraph.pl and speedscope ("root;caller;callee count" per line).
+    Finished profiles are also written to output_dir, one file per worker.
+
+    Profiles are per process: under gunicorn each worker samples only itself.
+    """
+
+    def __init__(self, output_dir=None, interval=0.005):
+        self.output_dir = output_dir
+        self.interval = interval
+
+        self._lock = threading.Lock()
+        self._stacks = Counter()
+        self._labels = {}
+        self._thread = None
+        self._every = 0
+        self._requests = 0
+        self._request_threads = set()
+        self._profile = {"status": "idle"}
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self, seconds, every=0, interval=None):
+        with self._lock:
+            if self._thread is not None:
+                raise RuntimeError("A profile is already running")
+            self._stacks = Counter()
+            self._requests = 0
+            self._request_threads = set()
+            self._every = int(every)
+            self._profile = {
+                "status": "running",
+                "pid": os.getpid(),
+                "seconds": seconds,
+                "every": self._every,
+                "interval": interval or self.interval,
+                "started_at": time.time(),
+                "samples": 0
+            }
+            self._thread = threading.Thread(
+                target=self._run, args=(seconds, interval or self.interval), name="sampling-profiler", daemon=True
+            )
+            self._thread.start()
+        logger.info(f"Sampling profiler started: {self._profile}")
+        return dict(self._profile)
+
+    def status(self):
+        return dict(self._profile)
+
+    def begin_request(self):
+        # Request mode only: mark this thread if it serves an nth request
+        if not self._every:
+            return
+        with self._lock:
+            self._requests += 1
+            if self._every and self._requests % self._every == 0:
+                self._request_threads.add(threading.get_ident())
+
+    def end_request(self):
+        if self._request_threads:
+            self._request_threads.discard(threading.get_ident())
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def _sample(self, own_ident):
+        frames = sys._current_frames()
+        threads = None if not self._every else set(self._request_threads)
+        for ident, frame in frames.items():
+            if ident == own_ident or (threads is not None and ident not in threads):
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            self._stacks[";".join(reversed(stack))] += 1
+        self._profile["samples"] += 1
+
+    def _run(self, seconds, interval):
+        own_ident = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        try:
+            while time.monotonic() < deadline:
+                self._sample(own_ident)
+                time.sleep(interval)
+        except Exception as e:
+            logger.error(f"Sampling profiler failed: {e}")
+        finally:
+            with self._lock:
+                self._every = 0
+                self._request_threads = set()
+                self._profile.update(status="finished", finished_at=time.time(), requests=self._requests)
+                self._thread = None
+            self._write()
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self._stacks.items()))
+
+    def _write(self):
+        if not self.output_dir:
+            return
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            started = time.strftime("%Y%m%d-%H%M%S", time.localtime(self._profile["started_at"]))
+            path = os.path.join(self.output_dir, f"profile-{started}-{os.getpid()}.folded")
+            with open(path, "w") as f:
+                f.write(self.collapsed())
+            self._profile["path"] = path
+            logger.info(f"Sampling profile written to {path}")
+        except OSError as e:
+            logger.error(f"Failed to write the sampling profile: {e}")
+
+    def install_signal(self, signum=signal.SIGUSR2, seconds=30):
+        """
+        Starts a seconds-long profile on signum. Signal gunicorn's workers,
+        not the master, which uses SIGUSR2 to re-exec itself:
+            pkill -USR2 -P <master pid>
+        Only the main thread can install handlers, so elsewhere this is a no-op.
+        """
+        try:
+            read_fd, write_fd = os.pipe()
+            os.set_blocking(write_fd, False)
+        except OSError as e:
+            logger.warning(f"Profiler signal handler not installed: {e}")
+            return
+
+        def handler(signum, frame):
+            # Only writes to a pipe: the handler runs on the main thread
+            # between bytecodes, possibly while it holds self._lock or a
+            # logging lock, so starting the profile is left to a thread
+            try:
+                os.write(write_fd, b"\0")
+            except BlockingIOError:
+                pass
+
+        try:
+            signal.signal(signum, handler)
+        except ValueError:
+            logger.warning("Profiler signal handler not installed: not in the main thread")
+            os.close(read_fd)
+            os.close(write_fd)
+            return
+        threading.Thread(
+            target=self._wait_for_signal, args=(read_fd, seconds), name="profiler-signal", daemon=True
+        ).start()
+
+    def _wait_for_signal(self, read_fd, seconds):
+        while os.read(read_fd, 64):
+            try:
+                self.start(seconds)
+            except RuntimeError as e:
+                logger.warning(f"Ignoring profiler signal: {e}")
+
+    def init_app(self, app, admin_token, url="/admin/profile"):
+        """
+        Hooks the profiler into a Flask app's requests and adds the admin
+        endpoint, which needs "Authorization: Bearer <admin_token>" and is
+        only registered when admin_token is set:
+
+            POST url  {"seconds": 30, "every": 0, "interval_ms": 5} -> 202
+            GET  url  collapsed stacks of the running or last profile
+                      (?status=1 for the status as JSON)
+        """
+        app.before_request(self.begin_request)
+        app.teardown_request(lambda exc: self.end_request())
+        if not admin_token:
+            return
+
+        def authorized():
+            supplied = request.headers.get("Authorization", "")
+            return hmac.compare_digest(supplied.encode(), f"Bearer {admin_token}".encode())
+
+        def profile():
+            if not authorized():
+                return jsonify({"error": "Unauthorized"}), 401
+            if request.method == "GET":
+                if request.args.get("status"):
+                    return jsonify(self.status()), 200
+                response = Response(self.collapsed(), mimetype="text/plain")
+                response.headers["X-Profile-Status"] = self._profile["status"]
+                return response
+
+            data = request.get_json(silent=True) or {}
+            seconds, every, interval_ms = data.get("seconds", 30), data.get("every", 0), data.get("interval_ms")
+            if not isinstance(seconds, (int, float)) or isinstance(seconds, bool) or not 0 < seconds <= 600:
+                return jsonify({"error": "'seconds' must be a number in (0, 600]."}), 400
+            if not isinstance(every, int) or isinstance(every, bool) or every < 0:
+                return jsonify({"error": "'every' must be an integer >= 0."}), 400
+            if interval_ms is not None and (not isinstance(interval_ms, (int, float)) or not 1 <= interval_ms <= 1000):
+                return jsonify({"error": "'interval_ms' must be a number in [1, 1000]."}), 400
+            try:
+                status = self.start(seconds, every, interval_ms and interval_ms / 1000)
+            except RuntimeError as e:
+                return jsonify({"error": str(e)}), 409
+            return jsonify(status), 202
+
+        app.add_url_rule(url, "admin_profile", profile, methods=["GET", "POST"])
@@ -0,0 +1,43 @@
+import numpy as np
+
+# An int8 model passes its guardrail if, on the test set, its MAE is at most
+# MAX_MAE_INCREASE (relative) above the float model's and its top-3 riders
+# agree with the float model's on average at least MIN_TOP3_AGREEMENT of the time
+MAX_MAE_INCREASE = 0.02
+MIN_TOP3_AGREEMENT = 0.95
+
+
+def top_k_agreement(reference, candidate, offsets, k=3):
+    # Mean overlap of the two models' top-k riders per race
+    overlaps = []
+    for start, end in zip(offsets[:-1], offsets[1:]):
+        n = min(k, end - start)
+        if n == 0:
+            continue
+        top_reference = set(np.argsort(-reference[start:end], kind='stable')[:n])
+        top_candidate = set(np.argsort(-candidate[start:end], kind='stable')[:n])
+        overlaps.append(len(top_reference & top_candidate) / n)
+    return float(np.mean(overlaps)) if overlaps else 1.0
+
+
+def quantization_guardrail(reference, candidate, y, offsets,
+                           max_mae_increase=MAX_MAE_INCREASE, min_top3_agreement=MIN_TOP3_AGREEMENT):
+    """
+    Compares the float model's predictions (reference) with the int8 model's
+    (candidate), one per rider row of the ragged races split by offsets.
+    """
+    reference = np.asarray(reference, dtype=np.float32).reshape(-1)
+    candidate = np.asarray(candidate, dtype=np.float32).reshape(-1)
+    y = np.asarray(y, dtype=np.float32).reshape(-1)
+
+    float_mae = float(np.mean(np.abs(reference - y)))
+    int8_mae = float(np.mean(np.abs(candidate - y)))
+    agreement = top_k_agreement(reference, candidate, offsets)
+    return {
+        "float_mae": float_mae,
+        "int8_mae": int8_mae,
+        "mae_increase": int8_mae / float_mae - 1 if float_mae else 0.0,
+        "top3_agreement": agreement,
+        "max_prediction_difference": float(np.max(np.abs(reference - candidate))) if len(y) else 0.0,
+        "passed": int8_mae <= float_mae * (1 + max_mae_increase) and agreement >= min_top3_agreement
+    }
@@ -0,0 +1,62 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+Catalogue = namedtuple("Catalogue", ["key", "races", "body", "etag"])
+
+
+def build_race_catalogue(race_names_path, length):
+    # pandas is only needed here, so importing it doesn't slow down startup
+    import pandas as pd
+
+    race_names = pd.read_csv(race_names_path, usecols=['name', 'stage']).tail(length)
+    race_names['name'] = race_names['name'].str.replace('-', ' ').str.title()
+    race_names['stage'] = race_names['stage'].str.replace('-', ' ').str.title()
+
+    # The index of a race is the position of its first occurrence when all
+    # races are sorted by (name, stage)
+    sorted_races = race_names.sort_values(['name', 'stage']).reset_index(drop=True)
+    first_index = (
+        sorted_races.reset_index()
+        .groupby(['name', 'stage'], sort=False, dropna=False)['index'].min()
+        .reset_index()
+    )
+    catalogue = race_names.merge(first_index, on=['name', 'stage'], how='left')
+    return catalogue.to_dict(orient='records')
+
+
+class RaceCatalogue:
+    """
+    The /races payload, built once per (test data version, race_names.csv)
+    and kept pre-serialized together with a strong ETag.
+    """
+
+    def __init__(self, race_names_path):
+        self.race_names_path = race_names_path
+        self._lock = threading.Lock()
+        self._catalogue = None
+
+    def get(self, data_version, length):
+        st = os.stat(self.race_names_path)
+        key = (data_version, length, st.st_ino, st.st_size, st.st_mtime_ns)
+
+        catalogue = self._catalogue
+        if catalogue is not None and catalogue.key == key:
+            return catalogue
+
+        with self._lock:
+            catalogue = self._catalogue
+            if catalogue is not None and catalogue.key == key:
+                return catalogue
+
+            logger.info(f"Building race catalogue for data version {data_version}")
+            races = build_race_catalogue(self.race_names_path, length)
+            body = json.dumps(races, separators=(',', ':')).encode()
+            etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+            self._catalogue = Catalogue(key=key, races=races, body=body, etag=etag)
+            return self._catalogue
@@ -0,0 +1,71 @@
+import json
+import logging
+import os
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# "orjson" or "json"; orjson is used when installed unless overridden
+JSON_BACKEND = os.getenv("JSON_BACKEND", "orjson" if orjson is not None else "json")
+if JSON_BACKEND == "orjson" and orjson is None:
+    logger.warning("JSON_BACKEND=orjson but orjson is not installed, falling back to json")
+    JSON_BACKEND = "json"
+
+
+def dumps(obj):
+    if JSON_BACKEND == "orjson":
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, separators=(',', ':')).encode()
+
+
+class RiderEncoder:
+    """
+    Encodes ranked riders straight from NumPy arrays into JSON fragments.
+
+    Everything about a rider except its prediction (the escaped name and the
+    image URL) is encoded once and kept in a per-rider table, so a response is
+    a join of cached bytes and one float repr per rider instead of a dict per
+    rider going through the JSON encoder.
+    """
+
+    def __init__(self, image_url_template):
+        self.image_url_template = image_url_template
+        self._fragments = {}
+
+    def _rider(self, name):
+        fragments = self._fragments.get(name)
+        if fragments is None:
+            fragments = (
+                b'{"name":' + dumps(name) + b',"prediction":',
+                b',"image_url":' + dumps(self.image_url_template.format(name=name)) + b'}'
+            )
+            self._fragments[name] = fragments
+        return fragments
+
+    def encode(self, names, scores):
+        # float32 -> float64 -> repr gives exactly what json.dumps(float(pred)) did;
+        # json.dumps is only needed to spell NaN/Infinity the way it used to
+        scores = np.asarray(scores, dtype=np.float64)
+        format_score = repr if np.isfinite(scores).all() else json.dumps
+        rows = []
+        for name, score in zip(names, scores.tolist()):
+            head, tail = self._rider(name)
+            rows.append(head + format_score(score).encode() + tail)
+        return rows
+
+
+def prediction_body(rows):
+    return b'{"prediction":[' + b','.join(rows) + b']}'
+
+
+def batch_body(results):
+    return b'{"predictions":[' + b','.join(
+        b'{"index":%d,"prediction":[' % index + b','.join(rows) + b']}'
+        for index, rows in results
+    ) + b']}'
@@ -0,0 +1,135 @@
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app, request
+from prometheus_client import Gauge, Histogram
+
+# Most stages take well under a millisecond, so the buckets start lower than
+# Prometheus' defaults
+STAGE_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+PAYLOAD_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+UNKNOWN_VERSION = "unknown"
+
+
+class Tracer:
+    """
+    Per-stage latency of the work a server does for one request (or one
+    background task such as a prediction table build).
+
+        with tracer.span("forward"):
+            ...
+
+    Spans are collected per thread by the trace they run in and observed
+    together when it ends, so they can be labelled with the model version the
+    request was served with even though that is only known midway
+    (set_model_version). A span outside any trace is observed straight away
+    under the "background" endpoint. Opening a span costs two perf_counter()
+    calls and a list append.
+    """
+
+    def __init__(self, namespace):
+        self.stage_latency = Histogram(
+            f"{namespace}_stage_latency_seconds",
+            "Time spent in each stage of a request or background task",
+            ["endpoint", "stage", "model_version"],
+            buckets=STAGE_BUCKETS
+        )
+        self.in_flight = Gauge(
+            f"{namespace}_requests_in_flight",
+            "Requests currently being served",
+            ["endpoint"]
+        )
+        self.request_bytes = Histogram(
+            f"{namespace}_request_bytes",
+            "Size of request bodies received, or sent to upstream services",
+            ["endpoint"],
+            buckets=PAYLOAD_BUCKETS
+        )
+        self.response_bytes = Histogram(
+            f"{namespace}_response_bytes",
+            "Size of response bodies sent, or received from upstream services",
+            ["endpoint"],
+            buckets=PAYLOAD_BUCKETS
+        )
+        self._local = threading.local()
+        # labels() costs a lock and a tuple hash per call, so the labelled
+        # histograms are looked up once per (endpoint, stage, version)
+        self._stages = {}
+
+    @contextmanager
+    def trace(self, endpoint, model_version=None):
+        # Traces nest: an inner trace collects its own spans and the outer one
+        # resumes afterwards
+        outer = getattr(self._local, "trace", None)
+        trace = self._local.trace = {"endpoint": endpoint, "model_version": model_version, "spans": []}
+        started = time.perf_counter()
+        try:
+            yield trace
+        finally:
+            trace["spans"].append(("total", time.perf_counter() - started))
+            self._local.trace = outer
+            self._observe(trace)
+
+    def _stage(self, endpoint, stage, model_version):
+        key = (endpoint, stage, model_version)
+        histogram = self._stages.get(key)
+        if histogram is None:
+            histogram = self._stages[key] = self.stage_latency.labels(*key)
+        return histogram
+
+    def _observe(self, trace):
+        version = trace["model_version"] or UNKNOWN_VERSION
+        for stage, seconds in trace["spans"]:
+            self._stage(trace["endpoint"], stage, version).observe(seconds)
+
+    def set_model_version(self, model_version):
+        trace = getattr(self._local, "trace", None)
+        if trace is not None:
+            trace["model_version"] = model_version
+
+    @contextmanager
+    def span(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            trace = getattr(self._local, "trace", None)
+            if trace is None:
+                self._stage("background", stage, UNKNOWN_VERSION).observe(seconds)
+            else:
+                trace["spans"].append((stage, seconds))
+
+    def record_payload(self, endpoint, sent, received):
+        # Bodies exchanged with an upstream service (e.g. a model server)
+        self.request_bytes.labels(endpoint).observe(sent)
+        self.response_bytes.labels(endpoint).observe(received)
+
+    def track(self, endpoint):
+        """
+        Decorator for a Flask view: traces it, counts it in flight and records
+        its request and response body sizes. Returns a Response object, so
+        callers see the real status code even when the view returns a tuple.
+        """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                in_flight = self.in_flight.labels(endpoint)
+                in_flight.inc()
+                try:
+                    with self.trace(endpoint):
+                        self.request_bytes.labels(endpoint).observe(request.content_length or 0)
+                        response = current_app.make_response(func(*args, **kwargs))
+                        length = response.calculate_content_length()
+                        if length is not None:
+                            self.response_bytes.labels(endpoint).observe(length)
+                        return response
+                finally:
+                    in_flight.dec()
+            return wrapper
+        return decorator
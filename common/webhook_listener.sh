@@ -43,6 +43,16 @@ redeploy_mlops_backend() {
     pkill -f "model_deploy_zero_downtime.sh" || true
     sleep 5
 
+    if [ ! -e "$MLOPS_DIR/feature_store/test" ] && [ -f "$MLOPS_DIR/X_test.npy" ]; then
+        log_message "Converting MLOps test data to the feature store..."
+        python "$COMMON_DIR/convert_feature_store.py" X_test.npy rider_names_test.npy feature_store \
+            || log_message "Failed to build the MLOps feature store"
+    fi
+
+    log_message "Generating the MLOps Swagger specification..."
+    python swagger_spec.py static/swagger.json 5010 \
+        || log_message "Failed to generate the MLOps Swagger specification"
+
     log_message "Starting MLOps services..."
     nohup ./model_deploy_zero_downtime.sh > deployment_output.log 2>&1 &
     sleep 10
@@ -117,6 +127,11 @@ if has_changes "common"; then
         log_message "Failed to restart myservice."
     fi
 
+    # Rider avatars are served from pre-generated thumbnails
+    log_message "Generating rider image thumbnails..."
+    python "$COMMON_DIR/generate_thumbnails.py" "$COMMON_DIR/images" \
+        || log_message "Failed to generate rider image thumbnails"
+
     # 2) Stop existing frontends
     log_message "Stopping existing frontend services..."
     pm2 delete mlops 2>/dev/null || true
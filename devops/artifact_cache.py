@@ -0,0 +1,131 @@
+import logging
+import os
+import sys
+import threading
+import time
+from collections import namedtuple
+
+from prometheus_client import Counter
+# Modules shared by the DevOps and MLOps stacks live in common/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from feature_store import decode_rider_names, open_feature_store, resolve_feature_store
+
+logger = logging.getLogger(__name__)
+
+CACHE_HITS = Counter(
+    "devops_artifact_cache_hits_total",
+    "Requests served from the resident model/data cache"
+)
+CACHE_MISSES = Counter(
+    "devops_artifact_cache_misses_total",
+    "Requests that found the model/data cache empty or stale"
+)
+CACHE_RELOADS = Counter(
+    "devops_artifact_cache_reloads_total",
+    "Model/data reloads performed by the resident cache",
+    ["status"]
+)
+
+# One immutable, fully loaded set of artifacts. Requests grab a reference once
+# and keep using it even if a newer snapshot is swapped in mid-request.
+Snapshot = namedtuple(
+    "Snapshot",
+    ["model", "X_test", "rider_names", "model_version", "data_version", "loaded_at"]
+)
+
+
+def file_fingerprint(path):
+    st = os.stat(path)
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class ArtifactCache:
+    """
+    Keeps the model and test data resident in the worker and reloads them when
+    redeploy_model.sh or model_retraining.py replaces the files on disk.
+    model_loader(model_path) returns (model, model_version), where model has
+    a predict() method.
+    """
+
+    def __init__(self, model_path, feature_store_root, model_loader, split="test", check_interval=1.0):
+        self.model_path = model_path
+        self.model_loader = model_loader
+        self.feature_store_root = feature_store_root
+        self.split = split
+        self.check_interval = check_interval
+
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._fingerprints = None
+        self._last_check = 0.0
+
+    def _current_fingerprints(self):
+        # The feature store is republished by swapping a symlink, so its
+        # resolved path changes on every preprocessing run
+        return (
+            file_fingerprint(self.model_path),
+            resolve_feature_store(self.feature_store_root, self.split)
+        )
+
+    def _load(self):
+        before = self._current_fingerprints()
+
+        logger.info(f"Loading model: {self.model_path}")
+        model, model_version = self.model_loader(self.model_path)
+
+        logger.info(f"Opening feature store: {before[1]}")
+        store = open_feature_store(before[1])
+
+        # A writer touched the model while we were reading it; don't publish
+        # a mix of old and new artifacts.
+        if self._current_fingerprints()[0] != before[0]:
+            raise RuntimeError("Artifacts changed on disk while loading")
+
+        snapshot = Snapshot(
+            model=model,
+            X_test=store.features,
+            rider_names=decode_rider_names(store.rider_ids, store.rider_vocab, store.features.offsets),
+            model_version=model_version,
+            data_version=store.version,
+            loaded_at=time.time()
+        )
+        return snapshot, before
+
+    def get(self):
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._last_check < self.check_interval:
+            CACHE_HITS.inc()
+            return snapshot
+
+        # Only one thread checks/reloads at a time. Everyone else keeps serving
+        # the current snapshot instead of queueing behind a slow reload.
+        if not self._lock.acquire(blocking=snapshot is None):
+            CACHE_HITS.inc()
+            return snapshot
+
+        try:
+            snapshot = self._snapshot
+            self._last_check = time.monotonic()
+            try:
+                if snapshot is not None and self._current_fingerprints() == self._fingerprints:
+                    CACHE_HITS.inc()
+                    return snapshot
+
+                CACHE_MISSES.inc()
+                new_snapshot, fingerprints = self._load()
+            except Exception as e:
+                CACHE_RELOADS.labels(status="failed").inc()
+                if snapshot is None:
+                    raise
+                logger.error(f"Artifact reload failed, keeping previous version: {e}")
+                return snapshot
+
+            self._snapshot = new_snapshot
+            self._fingerprints = fingerprints
+            CACHE_RELOADS.labels(status="success").inc()
+            logger.info(
+                f"Artifacts loaded (model {new_snapshot.model_version}, data {new_snapshot.data_version})"
+            )
+            return new_snapshot
+        finally:
+            self._lock.release()
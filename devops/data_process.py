@@ -1,8 +1,14 @@
+import os
+import sys
+
 import numpy as np
 import pandas as pd
 from sklearn.impute import SimpleImputer
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import MinMaxScaler, OneHotEncoder, OrdinalEncoder
+# Modules shared by the DevOps and MLOps stacks live in common/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from feature_store import RaggedRaces, format_padding_report, padding_report, save_feature_store
 
 merged_data = pd.read_csv('/Users/feliks/Documents/Faks/Diplomska/App/common/final_data.csv')
 
@@ -42,11 +48,6 @@ def preprocess_data(index):
 
     train_data, test_data = split_test_train_data(index)
 
-    # Determine the maximum number of riders across all races in both training and testing data
-    max_riders_train = train_data.groupby(['name', 'year']).size().max()
-    max_riders_test = test_data.groupby(['name', 'year']).size().max()
-    max_riders = max(max_riders_train, max_riders_test)
-
     # Create preprocessing pipelines
     race_numeric_pipeline = Pipeline([
         ('imputer', SimpleImputer(strategy='mean')),
@@ -87,6 +88,7 @@ def preprocess_data(index):
     rider_categorical_high_pipeline.fit(train_data[rider_categorical_high])
 
     # Initialize lists for training data
+    race_features_train = []
     races_train = []
     targets_train = []
     rider_names_train = []
@@ -113,48 +115,26 @@ def preprocess_data(index):
             race_features = np.hstack((race_num_processed, race_cat_processed))
             rider_features = np.hstack((rider_num_processed, rider_cat_low_processed, rider_cat_high_processed))
 
-            # Pad or truncate rider_features to max_riders
-            n_riders = rider_features.shape[0]
-            if n_riders < max_riders:
-                pad_width = max_riders - n_riders
-                padded_rider_features = np.pad(
-                    rider_features,
-                    ((0, pad_width), (0, 0)),
-                    mode='constant',
-                    constant_values=0
-                )
-            else:
-                padded_rider_features = rider_features[:max_riders, :]
-
-            # Create feature matrix by repeating race_features and concatenating with rider_features
-            feature_matrix = np.hstack((
-                np.tile(race_features, (max_riders, 1)),
-                padded_rider_features
-            ))
-
-            # Calculate probabilities for first 3 riders and pad or truncate to max_riders
+            # Calculate probabilities for the first 3 riders
             ranks = group['rank'].values
-            padded_probabilities = np.zeros(max_riders)
-            probabilities = np.array([np.exp(-ranks[:3]) / np.sum(np.exp(-ranks[:3]))])
-            padded_probabilities[0:3] = probabilities
+            probabilities = np.zeros(len(ranks))
+            probabilities[0:3] = np.exp(-ranks[:3]) / np.sum(np.exp(-ranks[:3]))
 
-            # Collect rider names and pad or truncate to max_riders
             riders = group['rider_name'].tolist()
-            if n_riders < max_riders:
-                padded_riders = riders + ['PAD'] * (max_riders - n_riders)
-            else:
-                padded_riders = riders[:max_riders]
 
-            # Append data to lists
-            races_train.append(feature_matrix)
-            targets_train.append(padded_probabilities)
-            rider_names_train.append(padded_riders)
+            # Append data to lists; races are not padded to max_riders and race
+            # features are kept once per race instead of tiled into every rider row
+            race_features_train.append(race_features[0])
+            races_train.append(rider_features)
+            targets_train.append(probabilities)
+            rider_names_train.append(riders)
 
         except Exception as e:
             print(f"Error processing race {race_name} {year}: {e}")
             continue
 
     # Initialize lists for test data
+    race_features_test = []
     races_test = []
     targets_test = []
     rider_names_test = []
@@ -181,68 +161,60 @@ def preprocess_data(index):
             race_features = np.hstack((race_num_processed, race_cat_processed))
             rider_features = np.hstack((rider_num_processed, rider_cat_low_processed, rider_cat_high_processed))
 
-            # Pad or truncate rider_features to max_riders
-            n_riders = rider_features.shape[0]
-            if n_riders < max_riders:
-                pad_width = max_riders - n_riders
-                padded_rider_features = np.pad(
-                    rider_features,
-                    ((0, pad_width), (0, 0)),
-                    mode='constant',
-                    constant_values=0
-                )
-            else:
-                padded_rider_features = rider_features[:max_riders, :]
-
-            # Create feature matrix by repeating race_features and concatenating with rider_features
-            feature_matrix = np.hstack((
-                np.tile(race_features, (max_riders, 1)),
-                padded_rider_features
-            ))
-
-            # Calculate probabilities for first 3 riders and pad or truncate to max_riders
+            # Calculate probabilities for the first 3 riders
             ranks = group['rank'].values
-            padded_probabilities = np.zeros(max_riders)
-            probabilities = np.array([np.exp(-ranks[:3]) / np.sum(np.exp(-ranks[:3]))])
-            padded_probabilities[0:3] = probabilities
+            probabilities = np.zeros(len(ranks))
+            probabilities[0:3] = np.exp(-ranks[:3]) / np.sum(np.exp(-ranks[:3]))
 
-            # Collect rider names and pad or truncate to max_riders
             riders = group['rider_name'].tolist()
-            if n_riders < max_riders:
-                padded_riders = riders + ['PAD'] * (max_riders - n_riders)
-            else:
-                padded_riders = riders[:max_riders]
 
-            # Append data to lists
-            races_test.append(feature_matrix)
-            targets_test.append(padded_probabilities)
-            rider_names_test.append(padded_riders)
+            # Append data to lists; races are not padded to max_riders and race
+            # features are kept once per race instead of tiled into every rider row
+            race_features_test.append(race_features[0])
+            races_test.append(rider_features)
+            targets_test.append(probabilities)
+            rider_names_test.append(riders)
 
         except Exception as e:
             print(f"Error processing race {race_name} {year}: {e}")
             continue
-    # Find maximum number of riders across all data
+    # Find maximum number of riders across all data (what every race used to be padded to)
     max_riders = max(
         max(len(riders) for riders in rider_names_train),
         max(len(riders) for riders in rider_names_test)
     )
 
-    # Convert lists to NumPy arrays
-    X_train = np.array(races_train)
-    y_train = np.array(targets_train)
-    rider_names_train = np.array(rider_names_train, dtype=object)
+    # Concatenate the riders of all races; race i is rows offsets[i]:offsets[i + 1]
+    def ragged(race_features, rider_features):
+        offsets = np.concatenate(([0], np.cumsum([len(rows) for rows in rider_features])))
+        return RaggedRaces(np.concatenate(rider_features), offsets, np.array(race_features))
+
+    X_train = ragged(race_features_train, races_train)
+    y_train = np.concatenate(targets_train)
+    rider_names_train = np.array([name for riders in rider_names_train for name in riders], dtype=object)
 
-    X_test = np.array(races_test)
-    y_test = np.array(targets_test)
-    rider_names_test = np.array(rider_names_test, dtype=object)
+    X_test = ragged(race_features_test, races_test)
+    y_test = np.concatenate(targets_test)
+    rider_names_test_flat = np.array([name for riders in rider_names_test for name in riders], dtype=object)
 
     # Save the data
-    np.save('/Users/feliks/Documents/Faks/Diplomska/App/devops/X_train.npy', X_train)
+    np.save('/Users/feliks/Documents/Faks/Diplomska/App/devops/X_train_race.npy', X_train.race_features)
+    np.save('/Users/feliks/Documents/Faks/Diplomska/App/devops/X_train_rider.npy', X_train.rider_rows)
+    np.save('/Users/feliks/Documents/Faks/Diplomska/App/devops/X_train_offsets.npy', X_train.offsets)
     np.save('/Users/feliks/Documents/Faks/Diplomska/App/devops/y_train.npy', y_train)
-    np.save('/Users/feliks/Documents/Faks/Diplomska/App/devops/rider_names_train.npy', rider_names_train)
+    np.save('/Users/feliks/Documents/Faks/Diplomska/App/devops/rider_names_train_rows.npy', rider_names_train)
 
-    np.save('/Users/feliks/Documents/Faks/Diplomska/App/devops/X_test.npy', X_test)
+    np.save('/Users/feliks/Documents/Faks/Diplomska/App/devops/X_test_race.npy', X_test.race_features)
+    np.save('/Users/feliks/Documents/Faks/Diplomska/App/devops/X_test_rider.npy', X_test.rider_rows)
+    np.save('/Users/feliks/Documents/Faks/Diplomska/App/devops/X_test_offsets.npy', X_test.offsets)
     np.save('/Users/feliks/Documents/Faks/Diplomska/App/devops/y_test.npy', y_test)
-    np.save('/Users/feliks/Documents/Faks/Diplomska/App/devops/rider_names_test.npy', rider_names_test)
+    np.save('/Users/feliks/Documents/Faks/Diplomska/App/devops/rider_names_test_rows.npy', rider_names_test_flat)
+
+    # Pickle-free, memory-mappable copy of the test set used by model_server.py
+    save_feature_store('/Users/feliks/Documents/Faks/Diplomska/App/devops/feature_store', 'test', X_test, rider_names_test)
+
+    for split, X in (("train", X_train), ("test", X_test)):
+        report = padding_report(X.lengths, max_riders, X.race_width, X.rider_rows.shape[1])
+        print(f"Ragged {split} set versus padding to {max_riders} riders:\n{format_padding_report(report)}")
 
     print("Data preprocessing completed and saved.")
\ No newline at end of file
@@ -0,0 +1,99 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from prometheus_client import Histogram
+
+logger = logging.getLogger(__name__)
+
+BATCH_QUEUE_DEPTH = Histogram(
+    "devops_predict_batch_queue_depth",
+    "Requests already waiting in the micro-batching queue when a request arrives",
+    buckets=(0, 1, 2, 4, 8, 16, 32, 64, 128)
+)
+BATCH_SIZE = Histogram(
+    "devops_predict_batch_size",
+    "Requests scored together in one micro-batched forward pass",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+BATCH_WAIT = Histogram(
+    "devops_predict_batch_wait_seconds",
+    "Time a request spent queued before its micro-batch was scored",
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+)
+
+
+class MicroBatcher:
+    """
+    Collects concurrent requests for up to max_wait seconds (or max_batch_size
+    requests) and scores them with a single call to
+    batch_fn(group, items) -> [result per item].
+
+    Only requests submitted with the same group are batched together, so a
+    batch never mixes two model/data snapshots.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=32, max_wait=0.002):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def submit(self, group, item, timeout=None):
+        future = Future()
+        with self._condition:
+            if self._thread is None:
+                # Started lazily so gunicorn's forked workers each get their own
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            BATCH_QUEUE_DEPTH.observe(len(self._queue))
+            self._queue.append((group, item, future, time.monotonic()))
+            self._condition.notify()
+        return future.result(timeout)
+
+    def _next_batch(self):
+        with self._condition:
+            while not self._queue:
+                self._condition.wait()
+
+            group = self._queue[0][0]
+            deadline = self._queue[0][3] + self.max_wait
+            while True:
+                same_group = sum(1 for entry in self._queue if entry[0] is group)
+                remaining = deadline - time.monotonic()
+                if same_group >= self.max_batch_size or remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            batch, rest = [], deque()
+            for entry in self._queue:
+                if entry[0] is group and len(batch) < self.max_batch_size:
+                    batch.append(entry)
+                else:
+                    rest.append(entry)
+            self._queue = rest
+            return group, batch
+
+    def _run(self):
+        while True:
+            group, batch = self._next_batch()
+            started = time.monotonic()
+            BATCH_SIZE.observe(len(batch))
+            for _, _, _, enqueued_at in batch:
+                BATCH_WAIT.observe(started - enqueued_at)
+
+            try:
+                results = self.batch_fn(group, [item for _, item, _, _ in batch])
+            except Exception as e:
+                logger.error(f"Micro-batch of {len(batch)} requests failed: {e}")
+                for _, _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, _, future, _), result in zip(batch, results):
+                future.set_result(result)
@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import struct
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+# File layout: MAGIC, little-endian uint32 manifest length, manifest JSON,
+# zero padding up to ALIGNMENT, then one flat blob holding every tensor.
+MAGIC = b"RRMW"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+ARCHITECTURE = "RaceRegressionModel"
+TENSOR_NAMES = ("fc1.weight", "fc1.bias", "fc2.weight", "fc2.bias")
+# Weight decay leaves many weights around 1e-38. Their products with the
+# inputs are subnormal floats, which make CPU matmuls ~100x slower while
+# contributing nothing measurable, so they are stored as exact zeros.
+FLUSH_BELOW = 1e-30
+# Optional int8 variant: fc1/fc2 weights as int8 with one float32 scale per
+# output unit (symmetric, per channel); biases stay float32
+INT8 = "int8"
+QUANTIZED_TENSORS = ("fc1.weight", "fc2.weight")
+
+ModelArtifact = namedtuple("ModelArtifact", ["path", "version", "manifest", "weights"])
+
+
+def _align(n):
+    return -(-n // ALIGNMENT) * ALIGNMENT
+
+
+def tensor_shapes(input_size, hidden_size, quantization=None):
+    shapes = {
+        "fc1.weight": (hidden_size, input_size),
+        "fc1.bias": (hidden_size,),
+        "fc2.weight": (1, hidden_size),
+        "fc2.bias": (1,)
+    }
+    if quantization == INT8:
+        shapes.update({f"{name}.scale": shapes[name][:1] for name in QUANTIZED_TENSORS})
+    return shapes
+
+
+def tensor_dtypes(quantization=None):
+    dtypes = dict.fromkeys(tensor_shapes(1, 1, quantization), '<f4')
+    if quantization == INT8:
+        dtypes.update(dict.fromkeys(QUANTIZED_TENSORS, '|i1'))
+    return dtypes
+
+
+def quantize_weights(weights):
+    """
+    Symmetric per-output-unit int8 copy of float weights, in the layout
+    save_model_artifact(..., quantization="int8") expects.
+    """
+    quantized = {name: np.asarray(weights[name], dtype=np.float32) for name in TENSOR_NAMES}
+    for name in QUANTIZED_TENSORS:
+        weight = quantized[name]
+        scale = np.abs(weight).max(axis=1) / 127
+        scale[scale == 0] = 1
+        quantized[name] = np.clip(np.rint(weight / scale[:, None]), -127, 127).astype(np.int8)
+        quantized[f"{name}.scale"] = scale.astype(np.float32)
+    return quantized
+
+
+def save_model_artifact(path, weights, hyperparameters, metadata=None, quantization=None):
+    """
+    Writes the weights as a single versioned file and atomically moves it to
+    path, so a running server never sees a partially written model. With
+    quantization="int8", weights come from quantize_weights().
+    """
+    expected = tensor_shapes(hyperparameters["input_size"], hyperparameters["hidden_size"], quantization)
+    dtypes = tensor_dtypes(quantization)
+    tensors, blob, offset, flushed = [], [], 0, 0
+    for name in expected:
+        tensor = np.array(weights[name], dtype=dtypes[name], order='C')
+        if tensor.shape != expected[name]:
+            raise ValueError(f"{name} has shape {tensor.shape}, expected {expected[name]}")
+        if tensor.dtype.kind == 'f':
+            tiny = (tensor != 0) & (np.abs(tensor) < FLUSH_BELOW)
+            tensor[tiny] = 0
+            flushed += int(tiny.sum())
+        padded = _align(tensor.nbytes)
+        tensors.append({"name": name, "shape": list(tensor.shape), "dtype": dtypes[name], "offset": offset})
+        blob.append(tensor.tobytes() + b"\0" * (padded - tensor.nbytes))
+        offset += padded
+    blob = b"".join(blob)
+    checksum = hashlib.blake2b(blob, digest_size=16).hexdigest()
+
+    manifest = json.dumps({
+        "format_version": FORMAT_VERSION,
+        "architecture": ARCHITECTURE,
+        "model_version": checksum[:16],
+        "hyperparameters": hyperparameters,
+        "dtype": "<f4",
+        "quantization": quantization,
+        "tensors": tensors,
+        "blob_bytes": len(blob),
+        "checksum": checksum,
+        "flushed_below": FLUSH_BELOW,
+        "flushed_weights": flushed,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "metadata": metadata or {}
+    }).encode()
+    header = MAGIC + struct.pack("<I", len(manifest)) + manifest
+    header += b"\0" * (_align(len(header)) - len(header))
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        f.write(blob)
+    os.replace(tmp_path, path)
+    return checksum[:16]
+
+
+def export_model_artifact(model, path, metadata=None):
+    state = model.state_dict()
+    weights = {name: state[name].detach().cpu().numpy() for name in TENSOR_NAMES}
+    hyperparameters = {"input_size": model.fc1.in_features, "hidden_size": model.fc1.out_features}
+    return save_model_artifact(path, weights, hyperparameters, metadata)
+
+
+def open_model_artifact(path, verify_checksum=True):
+    """
+    Memory-maps a model artifact and validates it. The weights are read-only
+    views into the mapping, so workers share one page-cache copy and loading
+    costs a header parse plus (optionally) one hash of the blob.
+    """
+    with open(path, 'rb') as f:
+        prefix = f.read(8)
+        if len(prefix) != 8 or prefix[:4] != MAGIC:
+            raise ValueError(f"{path} is not a model artifact")
+        manifest_length = struct.unpack("<I", prefix[4:])[0]
+        manifest = json.loads(f.read(manifest_length))
+
+    if manifest.get("format_version") != FORMAT_VERSION or manifest.get("architecture") != ARCHITECTURE:
+        raise ValueError(
+            f"Unsupported model artifact {manifest.get('architecture')} v{manifest.get('format_version')}"
+        )
+    data_offset = _align(8 + manifest_length)
+    if os.path.getsize(path) != data_offset + manifest["blob_bytes"]:
+        raise ValueError(f"Model artifact {path} is truncated or has trailing data")
+
+    blob = np.memmap(path, dtype=np.uint8, mode='r', offset=data_offset, shape=(manifest["blob_bytes"],))
+    if verify_checksum and hashlib.blake2b(blob, digest_size=16).hexdigest() != manifest["checksum"]:
+        raise ValueError(f"Checksum mismatch in model artifact {path}")
+
+    hyperparameters = manifest["hyperparameters"]
+    quantization = manifest.get("quantization")
+    expected = tensor_shapes(hyperparameters["input_size"], hyperparameters["hidden_size"], quantization)
+    dtypes = tensor_dtypes(quantization)
+    weights = {}
+    for tensor in manifest["tensors"]:
+        shape, dtype = tuple(tensor["shape"]), tensor.get("dtype", manifest["dtype"])
+        if shape != expected.get(tensor["name"]) or dtype != dtypes[tensor["name"]]:
+            raise ValueError(f"Unexpected tensor {tensor['name']} {shape} {dtype} in model artifact {path}")
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        weights[tensor["name"]] = blob[tensor["offset"]:tensor["offset"] + size].view(dtype).reshape(shape)
+    if weights.keys() != expected.keys():
+        raise ValueError(f"Model artifact {path} is missing tensors")
+
+    return ModelArtifact(path=path, version=manifest["model_version"], manifest=manifest, weights=weights)
+
+
+def torch_model_from_artifact(artifact):
+    # Only the torch backend and training need torch and model_def
+    import torch
+    from model_def import RaceRegressionModel
+
+    if artifact.manifest.get("quantization"):
+        raise ValueError(f"{artifact.path} holds {artifact.manifest['quantization']} weights, which only the NumPy engine serves")
+    hyperparameters = artifact.manifest["hyperparameters"]
+    model = RaceRegressionModel(hyperparameters["input_size"], hyperparameters["hidden_size"])
+    model.load_state_dict({name: torch.tensor(np.array(weights)) for name, weights in artifact.weights.items()})
+    model.eval()
+    return model
+
+
+if __name__ == "__main__":
+    # Convert a legacy pickled model (needs torch and model_def):
+    # python model_artifact.py model/model.pkl model/model.weights
+    if len(sys.argv) != 3:
+        print("Usage: python model_artifact.py <model.pkl> <model.weights>", file=sys.stderr)
+        sys.exit(1)
+    import pickle
+    from numpy_model import NumpyRaceModel, verify_against_torch
+
+    with open(sys.argv[1], 'rb') as f:
+        model = pickle.load(f)
+    version = export_model_artifact(model, sys.argv[2], {"source": os.path.basename(sys.argv[1])})
+
+    artifact = open_model_artifact(sys.argv[2])
+    X = np.random.default_rng(0).standard_normal((1024, artifact.manifest["hyperparameters"]["input_size"]))
+    max_diff = verify_against_torch(model, NumpyRaceModel(artifact.weights), X.astype(np.float32))
+    print(f"Model artifact {version} written to {sys.argv[2]} (max difference from torch: {max_diff:.3g})")
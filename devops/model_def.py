@@ -14,8 +14,38 @@ class RaceRegressionModel(nn.Module):
         out = self.fc2(out)
         return out.squeeze()
     
+    def forward_factorized(self, race, rider):
+        # fc1 on [race, rider] split as W_race @ race + W_rider @ rider, with
+        # race and rider holding the two column blocks of the same rows
+        race_width = race.shape[-1]
+        out = nn.functional.linear(race, self.fc1.weight[:, :race_width], self.fc1.bias)
+        out = out + nn.functional.linear(rider, self.fc1.weight[:, race_width:])
+        out = self.relu(out)
+        out = self.fc2(out)
+        return out.squeeze(-1)
+
+    def forward_ragged(self, race, rider, race_index):
+        # Ragged races: race holds one row per race and rider the concatenated
+        # rider rows, race_index[i] being the race of rider row i. The race
+        # part of fc1 is computed once per race and gathered per rider
+        race_width = race.shape[-1]
+        race_hidden = nn.functional.linear(race, self.fc1.weight[:, :race_width], self.fc1.bias)
+        out = nn.functional.linear(rider, self.fc1.weight[:, race_width:]) + race_hidden[race_index]
+        out = self.relu(out)
+        out = self.fc2(out)
+        return out.squeeze(-1)
+
     def predict(self, X):
         self.eval()
         with torch.no_grad():
             X = torch.tensor(X, dtype=torch.float32)
-            return self.forward(X).numpy()
\ No newline at end of file
+            return self.forward(X).numpy()
+
+    def predict_ragged(self, race_features, rider_rows, offsets):
+        self.eval()
+        with torch.no_grad():
+            race = torch.tensor(race_features, dtype=torch.float32)
+            rider = torch.tensor(rider_rows, dtype=torch.float32)
+            lengths = torch.tensor(offsets[1:] - offsets[:-1])
+            race_index = torch.repeat_interleave(torch.arange(len(race)), lengths)
+            return self.forward_ragged(race, rider, race_index).numpy()
\ No newline at end of file
@@ -1,39 +1,56 @@
 import os
+import sys
 import torch
 import torch.nn as nn
 import torch.optim as optim
 from torch.utils.data import DataLoader
 from sklearn.metrics import mean_absolute_error
 import numpy as np
-import pickle
+import shutil
+import tempfile
 import optuna
+# Modules shared by the DevOps and MLOps stacks live in common/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
 import data_process
 from model_def import RaceRegressionModel
+from feature_store import RaggedRaces
+from model_artifact import export_model_artifact, open_model_artifact, torch_model_from_artifact
+from numpy_model import NumpyRaceModel, verify_against_torch
+from quantization import export_quantized_artifact
 
 # Ensure model directory exists
 os.makedirs("model", exist_ok=True)
 
+# Trial models are written as weight artifacts into a private directory
+trial_dir = tempfile.mkdtemp(prefix="model_trials_")
+
 class RaceRegressionDataset(torch.utils.data.Dataset):
+    # One sample per real rider (races are ragged, there are no PAD rows); the
+    # race features are stored once per race and looked up through the row's
+    # race index instead of being tiled
     def __init__(self, X, y):
-        self.X = torch.tensor(X, dtype=torch.float32)
+        self.race = torch.tensor(X.race_features, dtype=torch.float32)
+        self.rider = torch.tensor(X.rider_rows, dtype=torch.float32)
+        self.race_index = torch.tensor(X.race_index())
         self.y = torch.tensor(y, dtype=torch.float32)
 
     def __len__(self):
-        return len(self.X)
+        return len(self.rider)
 
     def __getitem__(self, idx):
-        X = self.X[idx]
+        race = self.race[self.race_index[idx]]
+        rider = self.rider[idx]
         y = self.y[idx]
-        return X, y
+        return race, rider, y
 
 # Training function
 def train_model(model, train_loader, optimizer, criterion, device):
     model.train()
-    for X_batch, y_batch in train_loader:
-        X_batch, y_batch = X_batch.to(device), y_batch.to(device)
+    for race_batch, rider_batch, y_batch in train_loader:
+        race_batch, rider_batch, y_batch = race_batch.to(device), rider_batch.to(device), y_batch.to(device)
 
         optimizer.zero_grad()
-        outputs = model(X_batch)
+        outputs = model.forward_factorized(race_batch, rider_batch)
         loss = criterion(outputs, y_batch)
         loss.backward()
         optimizer.step()
@@ -43,9 +60,9 @@ def evaluate_model(model, test_loader, device):
     model.eval()
     y_true, y_pred = [], []
     with torch.no_grad():
-        for X_batch, y_batch in test_loader:
-            X_batch, y_batch = X_batch.to(device), y_batch.to(device)
-            outputs = model(X_batch)
+        for race_batch, rider_batch, y_batch in test_loader:
+            race_batch, rider_batch, y_batch = race_batch.to(device), rider_batch.to(device), y_batch.to(device)
+            outputs = model.forward_factorized(race_batch, rider_batch)
             y_true.extend(y_batch.cpu().numpy())
             y_pred.extend(outputs.cpu().numpy())
     mae = mean_absolute_error(y_true, y_pred)
@@ -65,7 +82,7 @@ def objective(trial):
     test_loader = DataLoader(test_dataset, batch_size=batch_size, shuffle=False, num_workers=0)
 
     device = "cuda" if torch.cuda.is_available() else "cpu"
-    input_size = X_train_flat.shape[1]
+    input_size = X_train.width
 
     # Model, criterion, optimizer
     model = RaceRegressionModel(input_size, hidden_size).to(device)
@@ -80,9 +97,8 @@ def objective(trial):
     mae = evaluate_model(model, test_loader, device)
 
     # Save the model for each trial
-    model_path = f"/tmp/model_trial_{trial.number}.pkl"
-    with open(model_path, "wb") as f:
-        pickle.dump(model, f)
+    model_path = os.path.join(trial_dir, f"model_trial_{trial.number}.weights")
+    export_model_artifact(model.cpu(), model_path, {"trial": trial.number, "params": trial.params, "mae": mae})
 
     # Save the trial's best model path
     trial.set_user_attr("model_path", model_path)
@@ -128,22 +144,22 @@ def objective(trial):
 """
 data_process.preprocess_data(0)
 
-X_train = np.load('/Users/feliks/Documents/Faks/Diplomska/App/devops/X_train.npy', allow_pickle=True)
+X_train = RaggedRaces(
+    np.load('/Users/feliks/Documents/Faks/Diplomska/App/devops/X_train_rider.npy'),
+    np.load('/Users/feliks/Documents/Faks/Diplomska/App/devops/X_train_offsets.npy'),
+    np.load('/Users/feliks/Documents/Faks/Diplomska/App/devops/X_train_race.npy')
+)
 y_train = np.load('/Users/feliks/Documents/Faks/Diplomska/App/devops/y_train.npy', allow_pickle=True)
-X_test = np.load('/Users/feliks/Documents/Faks/Diplomska/App/devops/X_test.npy', allow_pickle=True)
+X_test = RaggedRaces(
+    np.load('/Users/feliks/Documents/Faks/Diplomska/App/devops/X_test_rider.npy'),
+    np.load('/Users/feliks/Documents/Faks/Diplomska/App/devops/X_test_offsets.npy'),
+    np.load('/Users/feliks/Documents/Faks/Diplomska/App/devops/X_test_race.npy')
+)
 y_test = np.load('/Users/feliks/Documents/Faks/Diplomska/App/devops/y_test.npy', allow_pickle=True)
 
-# Flatten the data for PyTorch
-X_train_flat = X_train.reshape(-1, X_train.shape[2])
-X_test_flat = X_test.reshape(-1, X_test.shape[2])
-
-# Flatten the targets
-y_train_flat = y_train.flatten()
-y_test_flat = y_test.flatten()
-
 # Prepare datasets
-train_dataset = RaceRegressionDataset(X_train_flat, y_train_flat)
-test_dataset = RaceRegressionDataset(X_test_flat, y_test_flat)
+train_dataset = RaceRegressionDataset(X_train, y_train)
+test_dataset = RaceRegressionDataset(X_test, y_test)
 
 # Optimize hyperparameters
 study = optuna.create_study(direction="minimize")
@@ -153,25 +169,40 @@ study.optimize(objective, n_trials=20)
 best_trial = study.best_trial
 best_model_path = best_trial.user_attrs["model_path"]
 
-# Load the best model and save it as model.pkl
-with open(best_model_path, "rb") as f:
-    best_model = pickle.load(f)
-
-final_model_path = "model/model.pkl"
-with open(final_model_path, "wb") as f:
-    pickle.dump(best_model, f)
-
-# Delete all temporary models except the best one
+# Check that the served NumPy engine's ragged path reproduces the best model
+# on the full test rows
+best_artifact = open_model_artifact(best_model_path)
+max_diff = verify_against_torch(
+    torch_model_from_artifact(best_artifact),
+    NumpyRaceModel(best_artifact.weights),
+    X_test
+)
+
+# int8 variant for QUANTIZED=1 serving, checked against the float model on the
+# test set. It is written before the float model so a server reloading the new
+# model never pairs it with the previous int8 file
+quantized_version, guardrail = export_quantized_artifact(best_model_path, "model/model.int8.weights", X_test, y_test)
+
+# Copy to a temporary file and rename it into place so a running server never
+# picks up a partially written model
+final_model_path = "model/model.weights"
+tmp_model_path = final_model_path + ".tmp"
+shutil.copyfile(best_model_path, tmp_model_path)
+os.replace(tmp_model_path, final_model_path)
+
+# Delete all temporary models
 for trial in study.trials:
     tmp_path = trial.user_attrs.get("model_path")
-    if tmp_path and tmp_path != best_model_path:
+    if tmp_path:
         try:
             os.remove(tmp_path)
             print(f"Deleted temporary file: {tmp_path}")
         except Exception as e:
             print(f"Failed to delete {tmp_path}: {e}")
+os.rmdir(trial_dir)
 
 # Print the results
 print("Best hyperparameters:", best_trial.params)
 print("Best MAE:", best_trial.value)
-print(f"Best model saved to {final_model_path}")
\ No newline at end of file
+print(f"Best model saved to {final_model_path} (NumPy engine max difference from torch: {max_diff:.3g})")
+print(f"int8 model {quantized_version} {'passed' if guardrail['passed'] else 'FAILED'} its guardrail: {guardrail}")
\ No newline at end of file
@@ -1,27 +1,67 @@
-import os
 import time
-import json
+
+# Start of the startup breakdown exported by /health and devops_startup_seconds
+STARTUP_BEGAN = time.perf_counter()
+
+import os
+import sys
+import hashlib
 import logging
-import pickle
 from functools import wraps
 import numpy as np
-import pandas as pd
-from flask import Flask, request, jsonify, send_from_directory, Response
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 from flask_swagger_ui import get_swaggerui_blueprint
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
-from tenacity import retry, stop_after_attempt, wait_fixed, RetryError
+from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+# Modules shared by the DevOps and MLOps stacks live in common/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from artifact_cache import ArtifactCache
+from image_store import ImageStore
+from micro_batcher import MicroBatcher
+from model_artifact import open_model_artifact, torch_model_from_artifact
+from numpy_model import NumpyRaceModel, QuantizedNumpyRaceModel
+from quantization import usable_quantized_artifact
+from serialization import RiderEncoder, batch_body, prediction_body
+from tracing import Tracer
+from prediction_store import PredictionStore
+from profiler import SamplingProfiler
+from race_catalogue import RaceCatalogue
 
-MODEL_PATH = os.getenv("MODEL_PATH", "/home/bsc/MLOps_diploma_app/devops/model/model.pkl")
-RIDER_NAMES_PATH = os.getenv("RIDER_NAMES_PATH", "/home/bsc/MLOps_diploma_app/devops/rider_names_test.npy")
-DATA_PATH = os.getenv("DATA_PATH", "/home/bsc/MLOps_diploma_app/devops/X_test.npy")
+MODEL_PATH = os.getenv("MODEL_PATH", "/home/bsc/MLOps_diploma_app/devops/model/model.weights")
+# "numpy" serves the model without importing torch; "torch" rebuilds RaceRegressionModel from the same weights
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "numpy")
+# QUANTIZED=1 serves QUANTIZED_MODEL_PATH instead, if it was built from the current model and passed its guardrail
+QUANTIZED = os.getenv("QUANTIZED", "0") == "1"
+QUANTIZED_MODEL_PATH = os.getenv("QUANTIZED_MODEL_PATH", "/home/bsc/MLOps_diploma_app/devops/model/model.int8.weights")
+FEATURE_STORE_DIR = os.getenv("FEATURE_STORE_DIR", "/home/bsc/MLOps_diploma_app/devops/feature_store")
 IMAGE_DIR = os.getenv("IMAGE_DIR", "/home/bsc/MLOps_diploma_app/common/images")
 RACE_NAMES_PATH = os.getenv("RACE_NAMES_PATH", "/home/bsc/MLOps_diploma_app/common/race_names.csv")
 APP_PORT = int(os.getenv("APP_PORT", 15000))
+ARTIFACT_CHECK_INTERVAL = float(os.getenv("ARTIFACT_CHECK_INTERVAL", 1.0))
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", 200))
+PREDICT_CACHE_CONTROL = os.getenv("PREDICT_CACHE_CONTROL", "no-cache")
+IMAGE_CACHE_BYTES = int(os.getenv("IMAGE_CACHE_BYTES", 64 * 1024 * 1024))
+IMAGE_CACHE_MAX_AGE = int(os.getenv("IMAGE_CACHE_MAX_AGE", 86400))
+PREDICT_BATCH_MAX_SIZE = int(os.getenv("PREDICT_BATCH_MAX_SIZE", 32))
+PREDICT_BATCH_WINDOW = float(os.getenv("PREDICT_BATCH_WINDOW_MS", 2)) / 1000
+WARM_UP = os.getenv("WARM_UP", "1") == "1"
+# /admin/profile is only served when ADMIN_TOKEN is set; SIGUSR2 to a worker
+# profiles it for PROFILE_SIGNAL_SECONDS. Profiles are written to PROFILE_DIR
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/home/bsc/MLOps_diploma_app/devops/profiles")
+PROFILE_SIGNAL_SECONDS = float(os.getenv("PROFILE_SIGNAL_SECONDS", 30))
+
+STARTUP_SECONDS = Gauge(
+    "devops_startup_seconds",
+    "Time spent in each phase of worker startup",
+    ["phase"]
+)
+startup_phases = {"imports": time.perf_counter() - STARTUP_BEGAN}
 
 # Swagger configuration
 SWAGGER_URL = '/documentation'
 API_URL = '/static/swagger.json'
+SWAGGER_FILE = os.path.join('static', 'swagger.json')
 
 swagger_ui_blueprint = get_swaggerui_blueprint(
     SWAGGER_URL,
@@ -37,235 +77,21 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Create static folder if it doesn't exist
-if not os.path.exists('static'):
-    os.makedirs('static')
-
+phase_started = time.perf_counter()
 app = Flask(__name__)
 app.register_blueprint(swagger_ui_blueprint, url_prefix=SWAGGER_URL)
 CORS(app, resources={r"/*": {"origins": ["http://localhost:3000", "http://seito.lavbic.net:3002"]}})
 
-# Swagger specification
-swagger_spec = {
-    "openapi": "3.0.0",
-    "info": {
-        "title": "DevOps API",
-        "version": "1.0.0",
-        "description": "API for DevOps predictions and race information"
-    },
-    "servers": [
-        {
-            "url": f"http://seito.lavbic.net:{APP_PORT}",
-            "description": "Production server"
-        }
-    ],
-    "paths": {
-        "/predict": {
-            "post": {
-                "summary": "Make predictions for a specific race",
-                "description": "Predict race outcomes using the trained model",
-                "requestBody": {
-                    "required": True,
-                    "content": {
-                        "application/json": {
-                            "schema": {
-                                "type": "object",
-                                "properties": {
-                                    "index": {
-                                        "type": "integer",
-                                        "description": "Race index for prediction"
-                                    }
-                                },
-                                "required": ["index"]
-                            }
-                        }
-                    }
-                },
-                "responses": {
-                    "200": {
-                        "description": "Successful prediction",
-                        "content": {
-                            "application/json": {
-                                "schema": {
-                                    "type": "object",
-                                    "properties": {
-                                        "prediction": {
-                                            "type": "array",
-                                            "items": {
-                                                "type": "object",
-                                                "properties": {
-                                                    "name": {
-                                                        "type": "string",
-                                                        "description": "Rider name"
-                                                    },
-                                                    "prediction": {
-                                                        "type": "number",
-                                                        "description": "Prediction score"
-                                                    },
-                                                    "image_url": {
-                                                        "type": "string",
-                                                        "description": "URL to rider's image"
-                                                    }
-                                                }
-                                            }
-                                        }
-                                    }
-                                }
-                            }
-                        }
-                    },
-                    "400": {
-                        "description": "Invalid input",
-                        "content": {
-                            "application/json": {
-                                "schema": {
-                                    "type": "object",
-                                    "properties": {
-                                        "error": {
-                                            "type": "string"
-                                        }
-                                    }
-                                }
-                            }
-                        }
-                    },
-                    "500": {
-                        "description": "Server error",
-                        "content": {
-                            "application/json": {
-                                "schema": {
-                                    "type": "object",
-                                    "properties": {
-                                        "error": {
-                                            "type": "string"
-                                        }
-                                    }
-                                }
-                            }
-                        }
-                    }
-                }
-            }
-        },
-        "/races": {
-            "get": {
-                "summary": "Get race information",
-                "description": "Retrieve information about all races",
-                "responses": {
-                    "200": {
-                        "description": "List of races",
-                        "content": {
-                            "application/json": {
-                                "schema": {
-                                    "type": "array",
-                                    "items": {
-                                        "type": "object",
-                                        "properties": {
-                                            "name": {
-                                                "type": "string",
-                                                "description": "Race name"
-                                            },
-                                            "stage": {
-                                                "type": "string",
-                                                "description": "Race stage"
-                                            },
-                                            "index": {
-                                                "type": "integer",
-                                                "description": "Race index"
-                                            }
-                                        }
-                                    }
-                                }
-                            }
-                        }
-                    },
-                    "500": {
-                        "description": "Server error",
-                        "content": {
-                            "application/json": {
-                                "schema": {
-                                    "type": "object",
-                                    "properties": {
-                                        "error": {
-                                            "type": "string"
-                                        }
-                                    }
-                                }
-                            }
-                        }
-                    }
-                }
-            }
-        },
-        "/images/{filename}": {
-            "get": {
-                "summary": "Get rider image",
-                "description": "Retrieve a rider's image by filename",
-                "parameters": [
-                    {
-                        "name": "filename",
-                        "in": "path",
-                        "required": True,
-                        "schema": {
-                            "type": "string"
-                        },
-                        "description": "Image filename"
-                    }
-                ],
-                "responses": {
-                    "200": {
-                        "description": "Image file",
-                        "content": {
-                            "image/*": {
-                                "schema": {
-                                    "type": "string",
-                                    "format": "binary"
-                                }
-                            }
-                        }
-                    },
-                    "500": {
-                        "description": "Server error",
-                        "content": {
-                            "application/json": {
-                                "schema": {
-                                    "type": "object",
-                                    "properties": {
-                                        "error": {
-                                            "type": "string"
-                                        }
-                                    }
-                                }
-                            }
-                        }
-                    }
-                }
-            }
-        },
-        "/metrics": {
-            "get": {
-                "summary": "Get Prometheus metrics",
-                "description": "Retrieve Prometheus metrics for monitoring",
-                "responses": {
-                    "200": {
-                        "description": "Prometheus metrics",
-                        "content": {
-                            "text/plain": {
-                                "schema": {
-                                    "type": "string"
-                                }
-                            }
-                        }
-                    }
-                }
-            }
-        }
-    }
-}
+# The spec is generated at deploy time by redeploy_model.sh; only build it
+# here when the server is started some other way
+if not os.path.exists(SWAGGER_FILE):
+    from swagger_spec import write_swagger_spec
+    write_swagger_spec(SWAGGER_FILE, APP_PORT)
 
-# Write Swagger specification to file
-with open('static/swagger.json', 'w') as f:
-    json.dump(swagger_spec, f)
+profiler = SamplingProfiler(PROFILE_DIR)
+profiler.init_app(app, ADMIN_TOKEN)
+profiler.install_signal(seconds=PROFILE_SIGNAL_SECONDS)
+startup_phases["app"] = time.perf_counter() - phase_started
 
 # Prometheus metrics
 REQUEST_COUNT = Counter(
@@ -278,15 +104,21 @@ REQUEST_LATENCY = Histogram(
     "Request latency for DevOps API",
     ["endpoint"]
 )
+# Per-stage latency (devops_stage_latency_seconds), requests in flight and
+# payload sizes
+tracer = Tracer("devops")
 
 def track_metrics(endpoint_name):
     def decorator(func):
+        traced = tracer.track(endpoint_name)(func)
+
         @wraps(func)
         def wrapper(*args, **kwargs):
             start_time = time.time()
             try:
-                response = func(*args, **kwargs)
-                status_code = getattr(response, "status_code", 200)
+                # A Response, so views returning (body, status) are counted with their status
+                response = traced(*args, **kwargs)
+                status_code = response.status_code
                 REQUEST_COUNT.labels(endpoint=endpoint_name, method=request.method, status=status_code).inc()
                 return response
             except Exception as e:
@@ -298,81 +130,338 @@ def track_metrics(endpoint_name):
         return wrapper
     return decorator
 
-@retry(stop=stop_after_attempt(5), wait=wait_fixed(2))
-def load_file_with_retries(filepath, loader_fn):
-    if not os.path.exists(filepath):
-        raise FileNotFoundError(f"File not found: {filepath}")
-    logger.info(f"Loading file: {filepath}")
-    return loader_fn(filepath)
+def prediction_etag(snapshot, *parts):
+    # Predictions only change when the model or the test data does, so the
+    # artifact hashes plus the request parameters identify a response
+    key = ":".join([snapshot.model_version, snapshot.data_version, *map(str, parts)])
+    return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+def not_modified(etag):
+    # Honoured for POST as well as GET so repeat API callers can skip the body
+    if etag in request.if_none_match:
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = PREDICT_CACHE_CONTROL
+        return response
+    return None
+
+def prediction_response(body, etag):
+    response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = PREDICT_CACHE_CONTROL
+    return response
+
+def is_index(value):
+    # JSON true/false are ints to isinstance, but not race indices
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def parse_page(params):
+    # Optional top_k/offset from the query string or the JSON body
+    page = []
+    for name, default, minimum in (("top_k", None, 1), ("offset", 0, 0)):
+        value = params.get(name, default)
+        if isinstance(value, str) and value.isdigit():
+            value = int(value)
+        if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value < minimum):
+            raise ValueError(f"'{name}' must be an integer >= {minimum}.")
+        page.append(value)
+    return tuple(page)
+
+def page_riders(rider_prediction, top_k=None, offset=0):
+    return rider_prediction[offset:None if top_k is None else offset + top_k]
+
+# Rider names and image URLs are JSON-encoded once per rider, not per response
+rider_encoder = RiderEncoder("http://seito.lavbic.net:15000/images/{name}.jpg")
+
+def rank_riders(race_rider_names, prediction, top_k=None, offset=0):
+    # Only the requested page is selected (argpartition, then a sort of just
+    # those scores) before anything is encoded
+    race_rider_names = np.asarray(race_rider_names)
+    scores = np.asarray(prediction).reshape(-1)
+
+    end = len(scores) if top_k is None else min(offset + top_k, len(scores))
+    if offset >= end:
+        return []
+    if end < len(scores):
+        # Widen to every rider tied with the cut-off score so ties resolve
+        # the same way on every page
+        threshold = scores[np.argpartition(-scores, end - 1)[end - 1]]
+        candidates = np.flatnonzero(scores >= threshold)
+    else:
+        candidates = np.arange(len(scores))
+    # Ties keep rider order, as the stable list sort this replaced did
+    order = candidates[np.lexsort((candidates, -scores[candidates]))][offset:end]
+
+    return rider_encoder.encode(race_rider_names[order], scores[order])
+
+def score_races(model, races, race_rider_names, pages=None):
+    # races are ragged (no PAD rows), so all their riders go through a single
+    # forward pass and the output is split back per race by the offsets
+    with tracer.span("forward"):
+        if races.race_features is None:
+            predictions = np.asarray(model.predict(races.rider_rows.astype(np.float32, copy=False))).reshape(-1)
+        else:
+            # Race features go through fc1 once per race instead of once per rider
+            predictions = model.predict_ragged(races.race_features, races.rider_rows, races.offsets)
+    offsets = races.offsets
+    pages = pages or [(None, 0)] * len(races)
+    with tracer.span("rank"):
+        return [
+            rank_riders(race_rider_names[i], predictions[offsets[i]:offsets[i + 1]], *pages[i])
+            for i in range(len(races))
+        ]
+
+def build_prediction_table(snapshot):
+    with tracer.trace("prediction_table", snapshot.model_version):
+        return score_races(snapshot.model, snapshot.X_test, snapshot.rider_names)
+
+def score_race_batch(snapshot, items):
+    race_indices = [race_index for race_index, _ in items]
+    pages = [page for _, page in items]
+    with tracer.trace("predict_batcher", snapshot.model_version):
+        with tracer.span("gather"):
+            races, race_rider_names = snapshot.X_test[race_indices], snapshot.rider_names[race_indices]
+        return score_races(snapshot.model, races, race_rider_names, pages)
+
+# Model and test data stay resident per worker and are swapped atomically on redeploy
+def load_model(path):
+    artifact = open_model_artifact(path)
+    if QUANTIZED:
+        quantized, reason = usable_quantized_artifact(QUANTIZED_MODEL_PATH, artifact.version)
+        if INFERENCE_BACKEND != "numpy":
+            reason = f"the int8 model needs the numpy backend, not {INFERENCE_BACKEND}"
+        elif quantized is not None:
+            return QuantizedNumpyRaceModel(quantized.weights), quantized.version
+        logger.warning(f"QUANTIZED=1, but serving the float32 model: {reason}")
+    if INFERENCE_BACKEND == "torch":
+        return torch_model_from_artifact(artifact), artifact.version
+    return NumpyRaceModel(artifact.weights), artifact.version
+
+artifacts = ArtifactCache(MODEL_PATH, FEATURE_STORE_DIR, load_model, check_interval=ARTIFACT_CHECK_INTERVAL)
+prediction_store = PredictionStore(build_prediction_table)
+race_catalogue = RaceCatalogue(RACE_NAMES_PATH)
+image_store = ImageStore("devops", IMAGE_DIR, max_bytes=IMAGE_CACHE_BYTES)
+# Concurrent single-race requests that miss the table share one forward pass
+predict_batcher = MicroBatcher(score_race_batch, max_batch_size=PREDICT_BATCH_MAX_SIZE, max_wait=PREDICT_BATCH_WINDOW)
+
+ready = False
+
+def warm_up():
+    """
+    Loads the model and test data and scores the first race once, so model
+    loading (including torch's import on the torch backend) and first-call
+    initialisation are paid before the worker reports ready instead of by
+    the first /predict.
+    """
+    global ready
+    phase_started = time.perf_counter()
+    snapshot = artifacts.get()
+    startup_phases["artifacts"] = time.perf_counter() - phase_started
+
+    phase_started = time.perf_counter()
+    with tracer.trace("warm_up", snapshot.model_version):
+        score_races(snapshot.model, snapshot.X_test[:1], snapshot.rider_names[:1])
+    startup_phases["forward_pass"] = time.perf_counter() - phase_started
+
+    # The full prediction table is built in the background from here on
+    prediction_store.schedule_build((snapshot.model_version, snapshot.data_version), snapshot)
+
+    startup_phases["total"] = time.perf_counter() - STARTUP_BEGAN
+    for phase, seconds in startup_phases.items():
+        STARTUP_SECONDS.labels(phase=phase).set(seconds)
+    logger.info("Startup: " + ", ".join(f"{phase} {seconds:.3f}s" for phase, seconds in startup_phases.items()))
+    ready = True
+    return snapshot
+
+if WARM_UP:
+    try:
+        warm_up()
+    except Exception as e:
+        # Keep starting: /health reports not ready and retries the warm-up
+        logger.error(f"Warm-up failed: {e}")
+
+@app.route("/health", methods=["GET"])
+def health():
+    try:
+        snapshot = warm_up() if not ready else artifacts.get()
+    except Exception as e:
+        logger.error(f"Health check failed: {e}")
+        return jsonify({"status": "unavailable", "error": str(e)}), 503
+    return jsonify({
+        "status": "ready",
+        "inference_backend": INFERENCE_BACKEND,
+        "inference_precision": getattr(snapshot.model, "precision", "float32"),
+        "model_version": snapshot.model_version,
+        "data_version": snapshot.data_version,
+        "startup_seconds": startup_phases
+    }), 200
 
 @app.route("/metrics", methods=["GET"])
 def metrics():
     return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST), 200
 
-@app.route('/predict', methods=['POST'])
+@app.route('/predict', methods=['GET', 'POST'])
 @track_metrics("predict")
 def predict():
     try:
-        data = request.get_json(force=True)
-        race_index = data.get('index')
-        if race_index is None or not isinstance(race_index, int):
+        if request.method == 'GET':
+            data = request.args
+            race_index = request.args.get('index', type=int)
+        else:
+            data = request.get_json(force=True, silent=True)
+            if not isinstance(data, dict):
+                return jsonify({"error": "The request body must be a JSON object."}), 400
+            race_index = data.get('index')
+        if not is_index(race_index):
             return jsonify({"error": "Invalid or missing 'index'. It must be an integer."}), 400
+        try:
+            top_k, offset = parse_page(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
-        # Load data
-        rider_names = load_file_with_retries(RIDER_NAMES_PATH, lambda f: np.load(f, allow_pickle=True))
-        X_test = load_file_with_retries(DATA_PATH, lambda f: np.load(f, allow_pickle=True))
-        if race_index < 0 or race_index >= len(X_test):
-            return jsonify({"error": "Index out of bounds."}), 400
-
-        race_data = X_test[race_index].astype(np.float32)
-
-        # Load model
+        # Load model and data (served from the resident cache)
         try:
-            with open(MODEL_PATH, 'rb') as f:
-                loaded_model = pickle.load(f)
+            with tracer.span("artifacts"):
+                snapshot = artifacts.get()
+        except FileNotFoundError:
+            raise
         except Exception as e:
             logger.error(f"Error loading model: {e}")
             return jsonify({"error": "Failed to load the prediction model."}), 500
+        tracer.set_model_version(snapshot.model_version)
+
+        X_test = snapshot.X_test
+        if race_index < 0 or race_index >= len(X_test):
+            return jsonify({"error": "Index out of bounds."}), 400
+
+        etag = prediction_etag(snapshot, race_index, top_k, offset)
+        response = not_modified(etag)
+        if response is not None:
+            return response
 
-        # Predict
+        # Served from the precomputed table once it has been built for this version
+        version = (snapshot.model_version, snapshot.data_version)
+        with tracer.span("lookup"):
+            rider_prediction = prediction_store.lookup(version, snapshot, race_index)
+        if rider_prediction is not None:
+            with tracer.span("serialize"):
+                return prediction_response(prediction_body(page_riders(rider_prediction, top_k, offset)), etag)
+
+        # Predict (queueing and the shared forward pass; the batch itself is
+        # traced under the predict_batcher endpoint)
         try:
-            prediction = loaded_model.predict(race_data)
+            with tracer.span("micro_batch"):
+                rider_prediction = predict_batcher.submit(snapshot, (race_index, (top_k, offset)))
         except Exception as e:
             logger.error(f"Prediction error: {e}")
             return jsonify({"error": "Prediction failed due to model issues."}), 500
 
-        race_rider_names = rider_names[race_index]
-        rider_prediction = [
-            {
-                "name": name,
-                "prediction": float(pred),
-                "image_url": os.path.join(f"http://seito.lavbic.net:15000/images/{name}.jpg")
+        with tracer.span("serialize"):
+            return prediction_response(prediction_body(rider_prediction), etag)
+
+    except FileNotFoundError as e:
+        logger.error(f"File not found: {e}")
+        return jsonify({"error": str(e)}), 500
+    except Exception as e:
+        logger.error(f"Unexpected error in /predict: {e}")
+        return jsonify({"error": "An unexpected error occurred: " + str(e)}), 500
+
+@app.route('/predict/batch', methods=['POST'])
+@track_metrics("predict_batch")
+def predict_batch():
+    try:
+        data = request.get_json(force=True, silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"error": "The request body must be a JSON object."}), 400
+        indices = data.get('indices')
+        race_name = data.get('race')
+        if indices is None and race_name is None:
+            return jsonify({"error": "Provide either 'indices' or 'race'."}), 400
+        if indices is not None and (
+            not isinstance(indices, list) or not all(is_index(i) for i in indices)
+        ):
+            return jsonify({"error": "'indices' must be a list of integers."}), 400
+        try:
+            top_k, offset = parse_page(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # Load model and data (served from the resident cache)
+        try:
+            with tracer.span("artifacts"):
+                snapshot = artifacts.get()
+        except FileNotFoundError:
+            raise
+        except Exception as e:
+            logger.error(f"Error loading model: {e}")
+            return jsonify({"error": "Failed to load the prediction model."}), 500
+        tracer.set_model_version(snapshot.model_version)
+
+        X_test = snapshot.X_test
+        if indices is None:
+            # All stages of a race, using the names and indices served by /races
+            catalogue = race_catalogue.get(snapshot.data_version, len(X_test) - 1)
+            indices = [race['index'] for race in catalogue.races if race['name'] == race_name]
+            if not indices:
+                return jsonify({"error": f"Unknown race: {race_name}"}), 400
+
+        indices = list(dict.fromkeys(indices))
+        if len(indices) > MAX_BATCH_SIZE:
+            return jsonify({"error": f"At most {MAX_BATCH_SIZE} races can be predicted at once."}), 400
+        if any(i < 0 or i >= len(X_test) for i in indices):
+            return jsonify({"error": "Index out of bounds."}), 400
+
+        etag = prediction_etag(snapshot, top_k, offset, *indices)
+        response = not_modified(etag)
+        if response is not None:
+            return response
+
+        version = (snapshot.model_version, snapshot.data_version)
+        with tracer.span("lookup"):
+            results = {i: prediction_store.lookup(version, snapshot, i) for i in indices}
+            results = {
+                i: None if rider_prediction is None else page_riders(rider_prediction, top_k, offset)
+                for i, rider_prediction in results.items()
             }
-            for name, pred in zip(race_rider_names, prediction) if name != "PAD"
-        ]
-        rider_prediction.sort(key=lambda x: x["prediction"], reverse=True)
 
-        return jsonify({"prediction": rider_prediction}), 200
+        # Races missing from the precomputed table are scored together
+        missing = [i for i, rider_prediction in results.items() if rider_prediction is None]
+        if missing:
+            try:
+                scored = score_races(
+                    snapshot.model, X_test[missing], snapshot.rider_names[missing], [(top_k, offset)] * len(missing)
+                )
+            except Exception as e:
+                logger.error(f"Prediction error: {e}")
+                return jsonify({"error": "Prediction failed due to model issues."}), 500
+            results.update(zip(missing, scored))
+
+        with tracer.span("serialize"):
+            return prediction_response(batch_body((i, results[i]) for i in indices), etag)
 
     except FileNotFoundError as e:
         logger.error(f"File not found: {e}")
         return jsonify({"error": str(e)}), 500
-    except RetryError as e:
-        logger.error(f"Retries exceeded: {e}")
-        return jsonify({"error": "Failed to load a required file after multiple retries."}), 500
     except Exception as e:
-        logger.error(f"Unexpected error in /predict: {e}")
+        logger.error(f"Unexpected error in /predict/batch: {e}")
         return jsonify({"error": "An unexpected error occurred: " + str(e)}), 500
 
 @app.route('/images/<filename>')
 @track_metrics("images")
 def get_image(filename):
     try:
-        filepath = os.path.join(IMAGE_DIR, filename)
-        if not os.path.exists(filepath):
+        with tracer.span("image_store"):
+            image = image_store.get(filename, request.args.get('variant'))
+        response = Response(image.body, mimetype=image.mimetype)
+        response.set_etag(image.etag)
+        response.last_modified = image.last_modified
+        if image.fallback:
+            # The rider may get a picture later, so only cache the placeholder until revalidation
             logger.warning(f"Image not found: {filename}")
-            filepath = os.path.join(IMAGE_DIR, "unknown.jpg")
-        return send_from_directory(IMAGE_DIR, os.path.basename(filepath))
+            response.headers["Cache-Control"] = "no-cache"
+        else:
+            response.headers["Cache-Control"] = f"public, max-age={IMAGE_CACHE_MAX_AGE}"
+        return response.make_conditional(request)
     except Exception as e:
         logger.error(f"Error in /images endpoint: {e}")
         return jsonify({"error": "Failed to retrieve the requested image."}), 500
@@ -381,36 +470,27 @@ def get_image(filename):
 @track_metrics("races")
 def get_races():
     try:
-        race_names = load_file_with_retries(RACE_NAMES_PATH, pd.read_csv)
-        X_test = load_file_with_retries(DATA_PATH, lambda f: np.load(f, allow_pickle=True))
-        length = len(X_test) - 1
-        logger.info(f"Length of X_test: {length}")
-
-        race_names = race_names.tail(length)
-        race_names['name'] = race_names['name'].str.replace('-', ' ').str.title()
-        race_names['stage'] = race_names['stage'].str.replace('-', ' ').str.title()
-
-        original_order = race_names.copy()
-        sorted_races = race_names.sort_values(['name', 'stage']).reset_index(drop=True)
-        original_order['index'] = original_order.apply(
-            lambda row: sorted_races[
-                (sorted_races['name'] == row['name']) &
-                (sorted_races['stage'] == row['stage'])
-            ].index[0],
-            axis=1
-        )
-        return jsonify(original_order.to_dict(orient='records')), 200
+        with tracer.span("artifacts"):
+            snapshot = artifacts.get()
+        tracer.set_model_version(snapshot.model_version)
+        length = len(snapshot.X_test) - 1
+
+        # Built once per data version and served pre-serialized; repeat loads
+        # with a matching If-None-Match get a 304
+        with tracer.span("catalogue"):
+            catalogue = race_catalogue.get(snapshot.data_version, length)
+        response = Response(catalogue.body, mimetype="application/json")
+        response.set_etag(catalogue.etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
 
     except FileNotFoundError as e:
         logger.error(f"File not found: {e}")
         return jsonify({"error": str(e)}), 500
-    except RetryError as e:
-        logger.error(f"Retries exceeded: {e}")
-        return jsonify({"error": "Failed to load a required file after multiple retries."}), 500
     except Exception as e:
         logger.error(f"Unexpected error in /races: {e}")
         return jsonify({"error": "An unexpected error occurred: " + str(e)}), 500
 
 if __name__ == "__main__":
-    logger.info(f"Starting DevOps API on port {APP_PORT}")
+    logger.info(f"Starting DevOps API on port {APP_PORT} ({INFERENCE_BACKEND} backend)")
     app.run(host="0.0.0.0", port=APP_PORT, debug=False)
\ No newline at end of file
@@ -0,0 +1,178 @@
+import threading
+
+import numpy as np
+
+
+class NumpyRaceModel:
+    """
+    RaceRegressionModel's forward pass (fc1 -> ReLU -> fc2) in NumPy, so the
+    server can predict without importing torch. Hidden and output buffers are
+    kept per thread and reused across calls.
+
+    weights are torch-layout (out, in) float32 arrays, typically read-only
+    views into a memory-mapped model artifact; they are used as transposed
+    views, which BLAS handles without copying.
+    """
+
+    precision = "float32"
+
+    def __init__(self, weights):
+        self.fc1_weight = weights["fc1.weight"].T
+        self.fc1_bias = weights["fc1.bias"]
+        self.fc2_weight = weights["fc2.weight"].T
+        self.fc2_bias = weights["fc2.bias"]
+        self.input_size, self.hidden_size = self.fc1_weight.shape
+        self._buffers = threading.local()
+
+    def _get_buffers(self, n_rows):
+        buffers = getattr(self._buffers, "arrays", None)
+        if buffers is None or len(buffers[0]) < n_rows:
+            buffers = (
+                np.empty((n_rows, self.hidden_size), dtype=np.float32),
+                np.empty((n_rows, 1), dtype=np.float32)
+            )
+            self._buffers.arrays = buffers
+        return buffers
+
+    def predict(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        rows = X.reshape(-1, self.input_size)
+        hidden, out = self._get_buffers(len(rows))
+        hidden, out = hidden[:len(rows)], out[:len(rows)]
+
+        np.matmul(rows, self.fc1_weight, out=hidden)
+        hidden += self.fc1_bias
+        np.maximum(hidden, 0, out=hidden)
+        np.matmul(hidden, self.fc2_weight, out=out)
+        out += self.fc2_bias
+
+        # Same shape as the torch model's out.squeeze()
+        return out.reshape(X.shape[:-1] + (1,)).squeeze().copy()
+
+    def predict_ragged(self, race_features, rider_rows, offsets):
+        """
+        Same as predict() on the full [race, rider] rows of ragged races (see
+        feature_store.RaggedRaces), with fc1 split as
+        W_race @ race + W_rider @ rider: the race part is computed once per
+        race and added to that race's riders. Returns one score per rider row.
+        """
+        race_features = np.ascontiguousarray(race_features, dtype=np.float32)
+        rows = np.ascontiguousarray(rider_rows, dtype=np.float32)
+        race_width = race_features.shape[1]
+
+        race_hidden = race_features @ self.fc1_weight[:race_width]
+        race_hidden += self.fc1_bias
+
+        hidden, out = self._get_buffers(len(rows))
+        hidden, out = hidden[:len(rows)], out[:len(rows)]
+
+        np.matmul(rows, self.fc1_weight[race_width:], out=hidden)
+        for i in range(len(race_hidden)):
+            hidden[offsets[i]:offsets[i + 1]] += race_hidden[i]
+        np.maximum(hidden, 0, out=hidden)
+        np.matmul(hidden, self.fc2_weight, out=out)
+        out += self.fc2_bias
+        return out.reshape(-1).copy()
+
+
+def quantize_rows(x, out=None):
+    # Symmetric int8 quantization with one scale per row; the values stay
+    # float32 but are integers in [-127, 127]. out=x quantizes in place
+    scale = np.maximum(x.max(axis=1, initial=0), -x.min(axis=1, initial=0))[:, None] / 127
+    scale[scale == 0] = 1
+    out = np.divide(x, scale, out=out)
+    return np.rint(out, out=out), scale
+
+
+class QuantizedNumpyRaceModel(NumpyRaceModel):
+    """
+    Dynamic int8 variant of NumpyRaceModel for an int8 model artifact: fc1
+    and fc2 weights are int8 with one scale per output unit, and every input
+    row (and hidden row) is quantized to int8 on the fly.
+
+    The int8 products are summed by float32 BLAS on integer-valued operands,
+    which is exact while inputs * 127 * 127 < 2**24, so results equal an int8
+    GEMM with int32 accumulation. The server only uses it with QUANTIZED=1;
+    without a native int8 GEMM the weights are widened to float32 once, here,
+    rather than on every call.
+    """
+
+    precision = "int8"
+    max_exact_inputs = 2 ** 24 // (127 * 127)
+
+    def __init__(self, weights):
+        super().__init__(weights)
+        self.fc1_weight = self.fc1_weight.astype(np.float32)
+        self.fc2_weight = self.fc2_weight.astype(np.float32)
+        self.fc1_scale = weights["fc1.weight.scale"]
+        self.fc2_scale = weights["fc2.weight.scale"]
+        if max(self.input_size, self.hidden_size) > self.max_exact_inputs:
+            raise ValueError(f"Layers wider than {self.max_exact_inputs} inputs are not exact in float32")
+
+    def _fc1(self, x, weight, out):
+        x_q, x_scale = quantize_rows(np.asarray(x, dtype=np.float32))
+        np.matmul(x_q, weight, out=out)
+        out *= x_scale
+        out *= self.fc1_scale
+        return out
+
+    def _fc2(self, hidden, out):
+        np.maximum(hidden, 0, out=hidden)
+        hidden_q, hidden_scale = quantize_rows(hidden, out=hidden)
+        np.matmul(hidden_q, self.fc2_weight, out=out)
+        out *= hidden_scale
+        out *= self.fc2_scale
+        out += self.fc2_bias
+        return out
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        rows = X.reshape(-1, self.input_size)
+        hidden, out = self._get_buffers(len(rows))
+        hidden, out = hidden[:len(rows)], out[:len(rows)]
+
+        self._fc1(rows, self.fc1_weight, hidden)
+        hidden += self.fc1_bias
+        self._fc2(hidden, out)
+
+        # Same shape as the torch model's out.squeeze()
+        return out.reshape(X.shape[:-1] + (1,)).squeeze().copy()
+
+    def predict_ragged(self, race_features, rider_rows, offsets):
+        # Race and rider columns are quantized as separate blocks, so the race
+        # part is still computed once per race
+        race_width = race_features.shape[1]
+        race_hidden = np.empty((len(race_features), self.hidden_size), dtype=np.float32)
+        self._fc1(race_features, self.fc1_weight[:race_width], race_hidden)
+        race_hidden += self.fc1_bias
+
+        hidden, out = self._get_buffers(len(rider_rows))
+        hidden, out = hidden[:len(rider_rows)], out[:len(rider_rows)]
+        self._fc1(rider_rows, self.fc1_weight[race_width:], hidden)
+        for i in range(len(race_hidden)):
+            hidden[offsets[i]:offsets[i + 1]] += race_hidden[i]
+        return self._fc2(hidden, out).reshape(-1).copy()
+
+
+def verify_against_torch(model, numpy_model, X, atol=1e-5):
+    """
+    Largest absolute difference between the two backends on X; raises above
+    atol. For ragged races (see feature_store.RaggedRaces) torch runs on the
+    full rows and NumPy on the split-fc1 path.
+    """
+    if hasattr(X, "offsets"):
+        expected = np.asarray(model.predict(X.flat_rows())).reshape(-1)
+        if X.race_features is None:
+            actual = numpy_model.predict(X.rider_rows).reshape(-1)
+        else:
+            actual = numpy_model.predict_ragged(X.race_features, X.rider_rows, X.offsets)
+    else:
+        expected = np.asarray(model.predict(X))
+        actual = numpy_model.predict(X)
+    if expected.shape != actual.shape:
+        raise ValueError(f"Shape mismatch: torch {expected.shape}, numpy {actual.shape}")
+    max_diff = float(np.max(np.abs(expected - actual))) if expected.size else 0.0
+    if max_diff > atol:
+        raise ValueError(f"NumPy backend differs from torch by {max_diff:.3g} (tolerance {atol:.3g})")
+    return max_diff
+
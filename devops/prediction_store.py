@@ -0,0 +1,102 @@
+import logging
+import threading
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+STORE_LOOKUPS = Counter(
+    "devops_prediction_store_lookups_total",
+    "Prediction table lookups",
+    ["result"]
+)
+STORE_BUILD_TIME = Histogram(
+    "devops_prediction_store_build_seconds",
+    "Time taken to score every race and rebuild the prediction table"
+)
+STORE_BUILDS = Counter(
+    "devops_prediction_store_builds_total",
+    "Prediction table rebuilds",
+    ["status"]
+)
+STORE_RACES = Gauge(
+    "devops_prediction_store_races",
+    "Number of races in the active prediction table"
+)
+STORE_ROWS = Gauge(
+    "devops_prediction_store_rows",
+    "Number of rider predictions in the active prediction table"
+)
+
+
+class PredictionStore:
+    """
+    Ranked predictions for every race, built in one pass for a given
+    (model version, data version) key. Lookups for any other key return None
+    and kick off a background rebuild; callers compute the answer live until
+    the new table is published.
+    """
+
+    def __init__(self, build_fn, retry_interval=30.0):
+        self._build_fn = build_fn
+        self.retry_interval = retry_interval
+
+        self._lock = threading.Lock()
+        self._current = None  # (key, table), swapped as a single reference
+        self._building = None
+        self._failed = (None, 0.0)
+
+    def lookup(self, key, source, index):
+        current = self._current
+        if current is not None and current[0] == key:
+            STORE_LOOKUPS.labels(result="hit").inc()
+            return current[1][index]
+
+        STORE_LOOKUPS.labels(result="miss").inc()
+        self.schedule_build(key, source)
+        return None
+
+    def schedule_build(self, key, source):
+        with self._lock:
+            if self._building == key:
+                return
+            current = self._current
+            if current is not None and current[0] == key:
+                return
+            failed_key, failed_at = self._failed
+            if failed_key == key and time.monotonic() - failed_at < self.retry_interval:
+                return
+            self._building = key
+
+        threading.Thread(target=self._build, args=(key, source), daemon=True).start()
+
+    def _build(self, key, source):
+        start_time = time.time()
+        try:
+            logger.info(f"Building prediction table for {key}")
+            table = self._build_fn(source)
+        except Exception as e:
+            logger.error(f"Failed to build prediction table for {key}: {e}")
+            STORE_BUILDS.labels(status="failed").inc()
+            with self._lock:
+                if self._building == key:
+                    self._building = None
+                self._failed = (key, time.monotonic())
+            return
+
+        build_time = time.time() - start_time
+        STORE_BUILD_TIME.observe(build_time)
+        STORE_BUILDS.labels(status="success").inc()
+
+        with self._lock:
+            # A newer version may have been scheduled while this one was building
+            if self._building not in (None, key):
+                logger.info(f"Discarding prediction table for superseded {key}")
+                return
+            self._current = (key, table)
+            self._building = None
+
+        STORE_RACES.set(len(table))
+        STORE_ROWS.set(sum(len(rows) for rows in table))
+        logger.info(f"Prediction table for {key} ready: {len(table)} races in {build_time:.2f}s")
@@ -0,0 +1,76 @@
+import os
+import sys
+
+import numpy as np
+
+# Modules shared by the DevOps and MLOps stacks live in common/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+
+from model_artifact import INT8, open_model_artifact, quantize_weights, save_model_artifact
+from numpy_model import NumpyRaceModel, QuantizedNumpyRaceModel
+from quantization_guardrail import quantization_guardrail
+
+
+def predict_races(model, races):
+    # One score per rider row of the ragged races
+    if races.race_features is None:
+        return np.asarray(model.predict(races.rider_rows)).reshape(-1)
+    return model.predict_ragged(races.race_features, races.rider_rows, races.offsets)
+
+
+def check_quantized_model(float_model, quantized_model, races, y, **thresholds):
+    # The guardrail shared with the MLOps retrain, on the NumPy engines
+    return quantization_guardrail(
+        predict_races(float_model, races), predict_races(quantized_model, races), y, races.offsets, **thresholds
+    )
+
+
+def export_quantized_artifact(model_path, path, races, y, **thresholds):
+    """
+    Writes the int8 variant of the float artifact at model_path to path,
+    recording the guardrail result and the float model's version in its
+    metadata; the server only serves it (QUANTIZED=1) when both check out.
+    """
+    artifact = open_model_artifact(model_path)
+    weights = quantize_weights(artifact.weights)
+    guardrail = check_quantized_model(
+        NumpyRaceModel(artifact.weights), QuantizedNumpyRaceModel(weights), races, y, **thresholds
+    )
+    version = save_model_artifact(
+        path,
+        weights,
+        artifact.manifest["hyperparameters"],
+        {"source_version": artifact.version, "guardrail": guardrail},
+        quantization=INT8
+    )
+    return version, guardrail
+
+
+def usable_quantized_artifact(path, source_version):
+    """
+    Opens the int8 artifact at path if it was derived from the float model
+    source_version and passed its guardrail; otherwise returns None and why.
+    """
+    if not os.path.exists(path):
+        return None, f"{path} does not exist"
+    artifact = open_model_artifact(path)
+    metadata = artifact.manifest.get("metadata", {})
+    if artifact.manifest.get("quantization") != INT8:
+        return None, f"{path} is not an int8 artifact"
+    if metadata.get("source_version") != source_version:
+        return None, f"{path} was built from model {metadata.get('source_version')}, not {source_version}"
+    if not metadata.get("guardrail", {}).get("passed"):
+        return None, f"{path} failed its accuracy guardrail: {metadata.get('guardrail')}"
+    return artifact, None
+
+
+if __name__ == "__main__":
+    # python quantization.py model/model.weights model/model.int8.weights <feature store root> <y_test.npy>
+    if len(sys.argv) != 5:
+        print("Usage: python quantization.py <model.weights> <model.int8.weights> <feature_store> <y_test.npy>", file=sys.stderr)
+        sys.exit(1)
+    from feature_store import open_feature_store, resolve_feature_store
+
+    store = open_feature_store(resolve_feature_store(sys.argv[3], "test"))
+    version, guardrail = export_quantized_artifact(sys.argv[1], sys.argv[2], store.features, np.load(sys.argv[4]))
+    print(f"int8 model artifact {version} written to {sys.argv[2]}: {guardrail}")
@@ -4,6 +4,13 @@
 PORT=15000
 APP="model_server:app"
 LOG_FILE="/home/bsc/MLOps_diploma_app/devops/server.log"
+APP_DIR="/home/bsc/MLOps_diploma_app/devops"
+COMMON_DIR="/home/bsc/MLOps_diploma_app/common"
+# Threads let concurrent /predict requests share micro-batched forward passes
+THREADS=${GUNICORN_THREADS:-8}
+STARTUP_TIMEOUT=${STARTUP_TIMEOUT:-60}
+LEGACY_MODEL_FILE="$APP_DIR/model/model.pkl"
+MODEL_FILE="$APP_DIR/model/model.weights"
 
 # Function to stop existing Gunicorn process
 stop_server() {
@@ -24,18 +31,52 @@ stop_server() {
     fi
 }
 
+# Function to build the memory-mapped feature store from the legacy .npy files
+ensure_feature_store() {
+    if [ ! -e "$APP_DIR/feature_store/test" ] && [ -f "$APP_DIR/X_test.npy" ]; then
+        echo "Converting X_test.npy and rider_names_test.npy to the feature store..."
+        python "$COMMON_DIR/convert_feature_store.py" "$APP_DIR/X_test.npy" "$APP_DIR/rider_names_test.npy" "$APP_DIR/feature_store" test --factorize \
+            || echo "Failed to build the feature store."
+    fi
+}
+
+# Function to convert a legacy pickled model to the weight artifact the server loads
+ensure_model_artifact() {
+    if [ ! -f "$MODEL_FILE" ] && [ -f "$LEGACY_MODEL_FILE" ]; then
+        echo "Converting model.pkl to the model weight artifact..."
+        (cd "$APP_DIR" && python model_artifact.py "$LEGACY_MODEL_FILE" "$MODEL_FILE") \
+            || echo "Failed to convert model.pkl."
+    fi
+}
+
+# Function to generate the Swagger specification once per deploy instead of on every import
+build_swagger_spec() {
+    python "$APP_DIR/swagger_spec.py" "$APP_DIR/static/swagger.json" "$PORT" \
+        || echo "Failed to generate the Swagger specification."
+}
+
 # Function to start Gunicorn server
 start_server() {
     echo "Starting Gunicorn server on port $PORT..."
-    nohup gunicorn -w 1 -b 0.0.0.0:$PORT --chdir /home/bsc/MLOps_diploma_app/devops $APP > "$LOG_FILE" 2>&1 &
-    sleep 2
-    if nc -z localhost $PORT; then
-        echo "Server started successfully. Logs are being written to $LOG_FILE"
-    else
-        echo "Failed to start the server."
-    fi
+    nohup gunicorn -w 1 -b 0.0.0.0:$PORT --threads $THREADS --chdir $APP_DIR $APP > "$LOG_FILE" 2>&1 &
+
+    # The port is bound before the worker has loaded the model, so wait for
+    # /health instead of the socket
+    for ((i = 0; i < STARTUP_TIMEOUT; i++)); do
+        if health=$(curl -sf "http://localhost:$PORT/health"); then
+            echo "Server started successfully. Logs are being written to $LOG_FILE"
+            echo "$health"
+            return 0
+        fi
+        sleep 1
+    done
+    echo "Server did not become ready within $STARTUP_TIMEOUT seconds."
+    return 1
 }
 
 # Main script logic
 stop_server
+ensure_feature_store
+ensure_model_artifact
+build_swagger_spec
 start_server
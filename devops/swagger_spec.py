@@ -0,0 +1,487 @@
+import json
+import os
+import sys
+
+
+def build_swagger_spec(port):
+    return {
+        "openapi": "3.0.0",
+        "info": {
+            "title": "DevOps API",
+            "version": "1.0.0",
+            "description": "API for DevOps predictions and race information"
+        },
+        "servers": [
+            {
+                "url": f"http://seito.lavbic.net:{port}",
+                "description": "Production server"
+            }
+        ],
+        "paths": {
+            "/predict": {
+                "get": {
+                    "summary": "Make predictions for a specific race (cacheable)",
+                    "description": "Same as POST /predict with the race index as a query parameter, so browsers and proxies can cache and revalidate the response",
+                    "parameters": [
+                        {
+                            "name": "index",
+                            "in": "query",
+                            "required": True,
+                            "schema": {
+                                "type": "integer"
+                            },
+                            "description": "Race index for prediction"
+                        },
+                        {
+                            "name": "top_k",
+                            "in": "query",
+                            "required": False,
+                            "schema": {
+                                "type": "integer",
+                                "minimum": 1
+                            },
+                            "description": "Return only this many riders, highest predictions first"
+                        },
+                        {
+                            "name": "offset",
+                            "in": "query",
+                            "required": False,
+                            "schema": {
+                                "type": "integer",
+                                "minimum": 0,
+                                "default": 0
+                            },
+                            "description": "Number of top-ranked riders to skip"
+                        }
+                    ],
+                    "responses": {
+                        "200": {
+                            "description": "Successful prediction, same body as POST /predict"
+                        },
+                        "304": {
+                            "description": "Prediction unchanged since the ETag sent in If-None-Match"
+                        },
+                        "400": {
+                            "description": "Invalid input"
+                        },
+                        "500": {
+                            "description": "Server error"
+                        }
+                    }
+                },
+                "post": {
+                    "summary": "Make predictions for a specific race",
+                    "description": "Predict race outcomes using the trained model",
+                    "requestBody": {
+                        "required": True,
+                        "content": {
+                            "application/json": {
+                                "schema": {
+                                    "type": "object",
+                                    "properties": {
+                                        "index": {
+                                            "type": "integer",
+                                            "description": "Race index for prediction"
+                                        },
+                                        "top_k": {
+                                            "type": "integer",
+                                            "minimum": 1,
+                                            "description": "Return only this many riders, highest predictions first"
+                                        },
+                                        "offset": {
+                                            "type": "integer",
+                                            "minimum": 0,
+                                            "default": 0,
+                                            "description": "Number of top-ranked riders to skip"
+                                        }
+                                    },
+                                    "required": ["index"]
+                                }
+                            }
+                        }
+                    },
+                    "responses": {
+                        "200": {
+                            "description": "Successful prediction",
+                            "content": {
+                                "application/json": {
+                                    "schema": {
+                                        "type": "object",
+                                        "properties": {
+                                            "prediction": {
+                                                "type": "array",
+                                                "items": {
+                                                    "type": "object",
+                                                    "properties": {
+                                                        "name": {
+                                                            "type": "string",
+                                                            "description": "Rider name"
+                                                        },
+                                                        "prediction": {
+                                                            "type": "number",
+                                                            "description": "Prediction score"
+                                                        },
+                                                        "image_url": {
+                                                            "type": "string",
+                                                            "description": "URL to rider's image"
+                                                        }
+                                                    }
+                                                }
+                                            }
+                                        }
+                                    }
+                                }
+                            }
+                        },
+                        "304": {
+                            "description": "Prediction unchanged since the ETag sent in If-None-Match"
+                        },
+                        "400": {
+                            "description": "Invalid input",
+                            "content": {
+                                "application/json": {
+                                    "schema": {
+                                        "type": "object",
+                                        "properties": {
+                                            "error": {
+                                                "type": "string"
+                                            }
+                                        }
+                                    }
+                                }
+                            }
+                        },
+                        "500": {
+                            "description": "Server error",
+                            "content": {
+                                "application/json": {
+                                    "schema": {
+                                        "type": "object",
+                                        "properties": {
+                                            "error": {
+                                                "type": "string"
+                                            }
+                                        }
+                                    }
+                                }
+                            }
+                        }
+                    }
+                }
+            },
+            "/predict/batch": {
+                "post": {
+                    "summary": "Make predictions for several races at once",
+                    "description": "Predict race outcomes for a list of race indices, or for all stages of a race, with a single model invocation",
+                    "requestBody": {
+                        "required": True,
+                        "content": {
+                            "application/json": {
+                                "schema": {
+                                    "type": "object",
+                                    "properties": {
+                                        "indices": {
+                                            "type": "array",
+                                            "items": {
+                                                "type": "integer"
+                                            },
+                                            "description": "Race indices for prediction"
+                                        },
+                                        "race": {
+                                            "type": "string",
+                                            "description": "Race name as returned by /races; predicts all of its stages"
+                                        },
+                                        "top_k": {
+                                            "type": "integer",
+                                            "minimum": 1,
+                                            "description": "Return only this many riders per race, highest predictions first"
+                                        },
+                                        "offset": {
+                                            "type": "integer",
+                                            "minimum": 0,
+                                            "default": 0,
+                                            "description": "Number of top-ranked riders to skip"
+                                        }
+                                    }
+                                }
+                            }
+                        }
+                    },
+                    "responses": {
+                        "200": {
+                            "description": "Successful prediction",
+                            "content": {
+                                "application/json": {
+                                    "schema": {
+                                        "type": "object",
+                                        "properties": {
+                                            "predictions": {
+                                                "type": "array",
+                                                "items": {
+                                                    "type": "object",
+                                                    "properties": {
+                                                        "index": {
+                                                            "type": "integer",
+                                                            "description": "Race index"
+                                                        },
+                                                        "prediction": {
+                                                            "type": "array",
+                                                            "items": {
+                                                                "type": "object",
+                                                                "properties": {
+                                                                    "name": {
+                                                                        "type": "string",
+                                                                        "description": "Rider name"
+                                                                    },
+                                                                    "prediction": {
+                                                                        "type": "number",
+                                                                        "description": "Prediction score"
+                                                                    },
+                                                                    "image_url": {
+                                                                        "type": "string",
+                                                                        "description": "URL to rider's image"
+                                                                    }
+                                                                }
+                                                            }
+                                                        }
+                                                    }
+                                                }
+                                            }
+                                        }
+                                    }
+                                }
+                            }
+                        },
+                        "304": {
+                            "description": "Prediction unchanged since the ETag sent in If-None-Match"
+                        },
+                        "400": {
+                            "description": "Invalid input",
+                            "content": {
+                                "application/json": {
+                                    "schema": {
+                                        "type": "object",
+                                        "properties": {
+                                            "error": {
+                                                "type": "string"
+                                            }
+                                        }
+                                    }
+                                }
+                            }
+                        },
+                        "500": {
+                            "description": "Server error",
+                            "content": {
+                                "application/json": {
+                                    "schema": {
+                                        "type": "object",
+                                        "properties": {
+                                            "error": {
+                                                "type": "string"
+                                            }
+                                        }
+                                    }
+                                }
+                            }
+                        }
+                    }
+                }
+            },
+            "/races": {
+                "get": {
+                    "summary": "Get race information",
+                    "description": "Retrieve information about all races",
+                    "responses": {
+                        "200": {
+                            "description": "List of races",
+                            "content": {
+                                "application/json": {
+                                    "schema": {
+                                        "type": "array",
+                                        "items": {
+                                            "type": "object",
+                                            "properties": {
+                                                "name": {
+                                                    "type": "string",
+                                                    "description": "Race name"
+                                                },
+                                                "stage": {
+                                                    "type": "string",
+                                                    "description": "Race stage"
+                                                },
+                                                "index": {
+                                                    "type": "integer",
+                                                    "description": "Race index"
+                                                }
+                                            }
+                                        }
+                                    }
+                                }
+                            }
+                        },
+                        "304": {
+                            "description": "Race list unchanged since the ETag sent in If-None-Match"
+                        },
+                        "500": {
+                            "description": "Server error",
+                            "content": {
+                                "application/json": {
+                                    "schema": {
+                                        "type": "object",
+                                        "properties": {
+                                            "error": {
+                                                "type": "string"
+                                            }
+                                        }
+                                    }
+                                }
+                            }
+                        }
+                    }
+                }
+            },
+            "/images/{filename}": {
+                "get": {
+                    "summary": "Get rider image",
+                    "description": "Retrieve a rider's image by filename",
+                    "parameters": [
+                        {
+                            "name": "filename",
+                            "in": "path",
+                            "required": True,
+                            "schema": {
+                                "type": "string"
+                            },
+                            "description": "Image filename"
+                        },
+                        {
+                            "name": "variant",
+                            "in": "query",
+                            "required": False,
+                            "schema": {
+                                "type": "string",
+                                "enum": ["thumb"]
+                            },
+                            "description": "Request the pre-generated thumbnail instead of the full-size image"
+                        }
+                    ],
+                    "responses": {
+                        "200": {
+                            "description": "Image file",
+                            "content": {
+                                "image/*": {
+                                    "schema": {
+                                        "type": "string",
+                                        "format": "binary"
+                                    }
+                                }
+                            }
+                        },
+                        "304": {
+                            "description": "Image unchanged since the ETag or date sent by the client"
+                        },
+                        "500": {
+                            "description": "Server error",
+                            "content": {
+                                "application/json": {
+                                    "schema": {
+                                        "type": "object",
+                                        "properties": {
+                                            "error": {
+                                                "type": "string"
+                                            }
+                                        }
+                                    }
+                                }
+                            }
+                        }
+                    }
+                }
+            },
+            "/health": {
+                "get": {
+                    "summary": "Readiness check",
+                    "description": "Reports ready once the model and test data are loaded and a warm-up forward pass has run, together with the startup time breakdown",
+                    "responses": {
+                        "200": {
+                            "description": "Worker is ready",
+                            "content": {
+                                "application/json": {
+                                    "schema": {
+                                        "type": "object",
+                                        "properties": {
+                                            "status": {
+                                                "type": "string"
+                                            },
+                                            "inference_backend": {
+                                                "type": "string",
+                                                "enum": ["torch", "numpy"]
+                                            },
+                                            "inference_precision": {
+                                                "type": "string",
+                                                "enum": ["float32", "int8"],
+                                                "description": "int8 only when QUANTIZED=1 and the quantized model passed its accuracy guardrail"
+                                            },
+                                            "model_version": {
+                                                "type": "string"
+                                            },
+                                            "data_version": {
+                                                "type": "string"
+                                            },
+                                            "startup_seconds": {
+                                                "type": "object",
+                                                "additionalProperties": {
+                                                    "type": "number"
+                                                }
+                                            }
+                                        }
+                                    }
+                                }
+                            }
+                        },
+                        "503": {
+                            "description": "Model or test data could not be loaded yet"
+                        }
+                    }
+                }
+            },
+            "/metrics": {
+                "get": {
+                    "summary": "Get Prometheus metrics",
+                    "description": "Retrieve Prometheus metrics for monitoring",
+                    "responses": {
+                        "200": {
+                            "description": "Prometheus metrics",
+                            "content": {
+                                "text/plain": {
+                                    "schema": {
+                                        "type": "string"
+                                    }
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    }
+
+
+def write_swagger_spec(path, port):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(build_swagger_spec(port), f)
+    os.replace(tmp_path, path)
+
+
+if __name__ == "__main__":
+    # Generated at deploy time by redeploy_model.sh:
+    # python swagger_spec.py static/swagger.json [port]
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python swagger_spec.py <output.json> [port]", file=sys.stderr)
+        sys.exit(1)
+    port = int(sys.argv[2]) if len(sys.argv) == 3 else int(os.getenv("APP_PORT", 15000))
+    write_swagger_spec(sys.argv[1], port)
+    print(f"Swagger specification written to {sys.argv[1]}")
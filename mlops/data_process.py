@@ -1,8 +1,14 @@
+import os
+import sys
+
 import numpy as np
 import pandas as pd
 from sklearn.impute import SimpleImputer
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import MinMaxScaler, OneHotEncoder, OrdinalEncoder
+# Modules shared by the DevOps and MLOps stacks live in common/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from feature_store import RaggedRaces, format_padding_report, padding_report, save_feature_store
 
 merged_data = pd.read_csv('/home/bsc/MLOps_diploma_app/common/final_data.csv')
 
@@ -78,39 +84,35 @@ def preprocess_data(index):
             race_features = np.hstack((race_num_processed, race_cat_processed))
             rider_features = np.hstack((rider_num_processed, rider_cat_low_processed, rider_cat_high_processed))
 
-            # Pad rider features
-            n_riders = rider_features.shape[0]
-            if n_riders < max_riders:
-                padded_rider_features = np.pad(
-                    rider_features,
-                    ((0, max_riders - n_riders), (0, 0)),
-                    mode='constant',
-                    constant_values=0
-                )
-            else:
-                padded_rider_features = rider_features[:max_riders, :]
-
-            # Create feature matrix
+            # Full [race, rider] rows for the race's own riders only (no padding);
+            # the MLflow model behind /invocations takes full rows
             feature_matrix = np.hstack((
-                np.tile(race_features, (max_riders, 1)),
-                padded_rider_features
+                np.tile(race_features, (len(rider_features), 1)),
+                rider_features
             ))
 
-            # Process rider names
-            riders = group['rider_name'].tolist()
-            padded_riders = (riders + ['PAD'] * (max_riders - n_riders)) if n_riders < max_riders else riders[:max_riders]
-
             races_test.append(feature_matrix)
-            rider_names_test.append(padded_riders)
+            rider_names_test.append(group['rider_name'].tolist())
 
         except Exception as e:
             print(f"Error processing race {race_name} {year}: {e}")
             continue
 
-    X_test = np.array(races_test)
-    rider_names_test = np.array(rider_names_test, dtype=object)
-
-    np.save('/home/bsc/MLOps_diploma_app/mlops/X_test.npy', X_test)
-    np.save('/home/bsc/MLOps_diploma_app/mlops/rider_names_test.npy', rider_names_test)
+    # Concatenate the riders of all races; race i is rows offsets[i]:offsets[i + 1]
+    offsets = np.concatenate(([0], np.cumsum([len(riders) for riders in rider_names_test])))
+    X_test = RaggedRaces(np.concatenate(races_test), offsets)
+
+    # X_test.npy / rider_names_test.npy keep meaning the padded layout that
+    # common/convert_feature_store.py converts, so the ragged copies get their own names
+    np.save('/home/bsc/MLOps_diploma_app/mlops/X_test_rows.npy', X_test.rider_rows)
+    np.save('/home/bsc/MLOps_diploma_app/mlops/X_test_offsets.npy', X_test.offsets)
+    np.save(
+        '/home/bsc/MLOps_diploma_app/mlops/rider_names_test_rows.npy',
+        np.array([name for riders in rider_names_test for name in riders], dtype=object)
+    )
+
+    # Pickle-free, memory-mappable copy of the test set used by model_server.py
+    save_feature_store('/home/bsc/MLOps_diploma_app/mlops/feature_store', 'test', X_test, rider_names_test)
+    print(format_padding_report(padding_report(X_test.lengths, max_riders, 0, X_test.width)))
     
     return "Data preprocessing completed and saved."
\ No newline at end of file
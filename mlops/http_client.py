@@ -0,0 +1,233 @@
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError, wait
+
+import requests
+from prometheus_client import Counter, Gauge
+from requests.adapters import HTTPAdapter
+
+from resilience import (
+    DEADLINE_HEADER, UPSTREAM_HEDGES, UPSTREAM_RETRIES, CircuitOpenError, DeadlineExceeded, failed_to_connect, remaining
+)
+
+UPSTREAM_REQUESTS = Counter(
+    "mlops_upstream_requests_total",
+    "Calls to upstream services, by outcome (HTTP status or exception)",
+    ["upstream", "outcome"]
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    "mlops_upstream_requests_in_flight",
+    "Upstream calls currently holding a pooled connection",
+    ["upstream"]
+)
+UPSTREAM_CONNECTIONS = Counter(
+    "mlops_upstream_connections_opened_total",
+    "TCP connections opened to upstream services; flat while keep-alive connections are reused",
+    ["upstream"]
+)
+UPSTREAM_IDLE = Gauge(
+    "mlops_upstream_pool_idle_connections",
+    "Open keep-alive connections waiting in the pool",
+    ["upstream"]
+)
+
+# Statuses that mean the upstream didn't handle the call and it can be resent
+RETRY_STATUSES = (429, 502, 503, 504)
+# For calls that aren't idempotent, only those where the upstream says so
+REJECTED_STATUSES = (429, 503)
+
+
+class UpstreamClient:
+    """
+    Keep-alive HTTP client for one upstream service: a requests.Session with
+    a connection pool of pool_size per host, so repeated calls reuse TCP
+    connections instead of opening one each. Every call gets a
+    (connect_timeout, read_timeout) timeout unless it passes its own.
+
+    The session is created lazily per process, so gunicorn's forked workers
+    never share sockets; within a worker it is shared by all threads.
+
+    Optionally, calls go through a resilience.CircuitBreaker (failing fast
+    with CircuitOpenError while it is open) and are retried per a
+    resilience.RetryPolicy. Timeouts are cut to the calling thread's
+    deadline, which is also forwarded in the X-Request-Timeout header. With
+    hedge_after, an idempotent call that has had no answer that many seconds
+    after it started is sent a second time and the first answer wins. Hedges
+    are capped at max_hedge_ratio of the hedgeable calls in flight (at least
+    one), so a slow upstream doesn't get twice the load.
+    """
+
+    def __init__(self, name, pool_size=10, connect_timeout=2.0, read_timeout=30.0,
+                 breaker=None, retry=None, hedge_after=None, max_hedge_ratio=0.1):
+        self.name = name
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = breaker
+        self.retry = retry
+        self.hedge_after = hedge_after
+        self.max_hedge_ratio = max_hedge_ratio
+
+        self._lock = threading.Lock()
+        self._session = None
+        self._adapter = None
+        self._executor = None
+        self._pid = None
+        self._connections = 0
+        self._calls_in_flight = 0
+        self._hedges_in_flight = 0
+
+    def _get_session(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                    session = requests.Session()
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self._session, self._adapter, self._connections = session, adapter, 0
+                    if self.hedge_after is not None:
+                        # First attempts of up to pool_size calls plus their hedges
+                        self._executor = ThreadPoolExecutor(2 * self.pool_size, thread_name_prefix=f"{self.name}-hedge")
+                    self._pid = os.getpid()
+        return self._session
+
+    def _update_pool_metrics(self):
+        pools = self._adapter.poolmanager.pools
+        pools = [pool for pool in (pools.get(key) for key in pools.keys()) if pool is not None]
+        connections = sum(pool.num_connections for pool in pools)
+        with self._lock:
+            opened, self._connections = connections - self._connections, connections
+        if opened > 0:
+            UPSTREAM_CONNECTIONS.labels(self.name).inc(opened)
+        UPSTREAM_IDLE.labels(self.name).set(sum(1 for pool in pools for conn in list(pool.pool.queue) if conn is not None))
+
+    def request(self, method, url, idempotent=False, **kwargs):
+        started = time.monotonic()
+        attempt = 1
+        while True:
+            try:
+                response = self._attempt(method, url, idempotent, kwargs)
+            except (CircuitOpenError, DeadlineExceeded):
+                raise
+            except requests.exceptions.RequestException as e:
+                # Calls that aren't idempotent are only resent if they never
+                # reached the upstream: after a read timeout or a dropped
+                # connection it may already be working on them
+                if idempotent:
+                    retryable = isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+                else:
+                    retryable = failed_to_connect(e)
+                if not retryable:
+                    raise
+                reason, error = type(e).__name__, e
+            else:
+                if response.status_code not in (RETRY_STATUSES if idempotent else REJECTED_STATUSES):
+                    return response
+                reason, error = str(response.status_code), None
+
+            delay = None if self.retry is None else self.retry.backoff(attempt, started)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+            UPSTREAM_RETRIES.labels(self.name, reason).inc()
+            time.sleep(delay)
+            attempt += 1
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def _attempt(self, method, url, idempotent, kwargs):
+        kwargs = dict(kwargs)
+        timeout = kwargs.pop("timeout", self.timeout)
+        left = remaining()
+        if left is not None:
+            if left <= 0:
+                UPSTREAM_REQUESTS.labels(self.name, "DeadlineExceeded").inc()
+                raise DeadlineExceeded(f"Deadline passed before calling {self.name}")
+            timeout = tuple(min(t, left) for t in timeout) if isinstance(timeout, tuple) else min(timeout, left)
+            kwargs["headers"] = dict(kwargs.get("headers") or {}, **{DEADLINE_HEADER: f"{left:.3f}"})
+        kwargs["timeout"] = timeout
+
+        if self.hedge_after is None or not idempotent:
+            return self._send(method, url, **kwargs)
+
+        self._get_session()
+        with self._lock:
+            self._calls_in_flight += 1
+        try:
+            return self._hedged(method, url, kwargs)
+        finally:
+            with self._lock:
+                self._calls_in_flight -= 1
+
+    def _hedged(self, method, url, kwargs):
+        started = threading.Event()
+        first = self._executor.submit(self._send, method, url, started, **kwargs)
+        # Time spent queued for an executor thread doesn't count: under load
+        # that would hedge calls that haven't even been sent yet
+        started.wait()
+        try:
+            return first.result(timeout=self.hedge_after)
+        except TimeoutError:
+            pass
+
+        with self._lock:
+            hedge_allowed = self._hedges_in_flight < max(1, int(self.max_hedge_ratio * self._calls_in_flight))
+            if hedge_allowed:
+                self._hedges_in_flight += 1
+        if not hedge_allowed:
+            UPSTREAM_HEDGES.labels(self.name, "skipped").inc()
+            return first.result()
+
+        UPSTREAM_HEDGES.labels(self.name, "sent").inc()
+        hedge = self._executor.submit(self._send, method, url, **kwargs)
+        hedge.add_done_callback(self._hedge_done)
+        done, _ = wait([first, hedge], return_when=FIRST_COMPLETED)
+        winner = first if first in done else hedge
+        loser = hedge if winner is first else first
+        try:
+            response = winner.result()
+        except requests.exceptions.RequestException:
+            # The other one may still succeed
+            winner, loser = loser, None
+            response = winner.result()
+        if loser is not None:
+            # Dropped if still queued; if it's running, _send reads its body,
+            # so its connection goes back to the pool when it finishes
+            loser.cancel()
+        if winner is hedge:
+            UPSTREAM_HEDGES.labels(self.name, "won").inc()
+        return response
+
+    def _hedge_done(self, future):
+        with self._lock:
+            self._hedges_in_flight -= 1
+
+    def _send(self, method, url, started=None, **kwargs):
+        if started is not None:
+            started.set()
+        if self.breaker is not None and not self.breaker.allow():
+            UPSTREAM_REQUESTS.labels(self.name, "CircuitOpenError").inc()
+            raise CircuitOpenError(f"Circuit for {self.name} is open")
+        success = False
+        try:
+            session = self._get_session()
+            with UPSTREAM_IN_FLIGHT.labels(self.name).track_inprogress():
+                response = session.request(method, url, **kwargs)
+                # Read the body here so the connection is back in the pool on return
+                response.content
+            success = response.status_code < 500
+        except requests.exceptions.RequestException as e:
+            UPSTREAM_REQUESTS.labels(self.name, type(e).__name__).inc()
+            raise
+        finally:
+            # Recorded whatever was raised, so a half-open breaker's probe
+            # is always released
+            if self.breaker is not None:
+                self.breaker.record(success)
+            if self._adapter is not None:
+                self._update_pool_metrics()
+        UPSTREAM_REQUESTS.labels(self.name, str(response.status_code)).inc()
+        return response
@@ -7,6 +7,9 @@ LOG_DIR="/tmp/mlflow_logs"
 MODEL_FILE="${LOG_DIR}/current_model.txt"
 VENV_PATH="/home/bsc/mlflow-env"
 SCRIPT_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+# "mlflow" runs mlflow models serve (JSON only); "native" runs scoring_service.py,
+# which also takes the NPY bodies model_server.py sends
+SCORING_SERVER=${SCORING_SERVER:-mlflow}
 
 export MLFLOW_TRACKING_URI="http://seito.lavbic.net:5000"
 
@@ -53,11 +56,17 @@ start_mlflow_server() {
     echo "MLflow version: $(python -c 'import mlflow; print(mlflow.__version__)')"
     
     # Start the server with worker timeout and retries
-    GUNICORN_CMD_ARGS="--timeout 120 --workers 1 --threads 4 --backlog 2048 --max-requests 1000 --max-requests-jitter 50" \
-    mlflow models serve -m "$MODEL_URI" \
-        --host "0.0.0.0" \
-        --port "$port" \
-        --no-conda > "$log_file" 2>&1 &
+    if [ "$SCORING_SERVER" = "native" ]; then
+        MODEL_URI="$MODEL_URI" \
+        gunicorn --timeout 120 --workers 1 --threads 4 --backlog 2048 --max-requests 1000 --max-requests-jitter 50 \
+            --chdir "$SCRIPT_DIR" -b "0.0.0.0:$port" "scoring_service:create_app()" > "$log_file" 2>&1 &
+    else
+        GUNICORN_CMD_ARGS="--timeout 120 --workers 1 --threads 4 --backlog 2048 --max-requests 1000 --max-requests-jitter 50" \
+        mlflow models serve -m "$MODEL_URI" \
+            --host "0.0.0.0" \
+            --port "$port" \
+            --no-conda > "$log_file" 2>&1 &
+    fi
     
     local pid=$!
     echo "Debug: Initial PID: $pid"
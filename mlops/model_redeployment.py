@@ -1,3 +1,6 @@
+import os
+import sys
+
 import mlflow
 import mlflow.pytorch
 import numpy as np
@@ -11,6 +14,10 @@ from torch.utils.data import DataLoader
 from model_def import RaceRegressionModel
 import get_data
 
+# Modules shared by the DevOps and MLOps stacks live in common/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from quantization_guardrail import quantization_guardrail
+
 # Set MLflow experiment
 mlflow.set_tracking_uri("http://seito.lavbic.net:5000")
 mlflow.set_experiment("Race_Prediction_Experiment_I")
@@ -35,17 +42,34 @@ class RaceRegressionDataset(torch.utils.data.Dataset):
 
     def __getitem__(self, idx):
         return self.X[idx], self.y[idx]
-    
+
+def quantize_model(model, X_test, y_test, offsets):
+    # Dynamic int8 copy of fc1/fc2 (CPU only), checked against the float model
+    # by the same guardrail as the DevOps int8 artifact
+    from torch.ao.quantization import quantize_dynamic
+
+    float_model = RaceRegressionModel(model.fc1.in_features, model.fc1.out_features)
+    float_model.load_state_dict({name: tensor.cpu() for name, tensor in model.state_dict().items()})
+    float_model.eval()
+    quantized_model = quantize_dynamic(float_model, {nn.Linear}, dtype=torch.qint8)
+
+    X = torch.tensor(X_test, dtype=torch.float32)
+    with torch.no_grad():
+        reference = float_model(X).numpy()
+        candidate = quantized_model(X).numpy()
+    return quantized_model, quantization_guardrail(reference, candidate, y_test, offsets)
+
 def retrain():
     # Load the data (adjust file paths as needed)
-    X_train = np.load('/Users/feliks/Documents/Faks/Diplomska/App/mlops/X_train.npy', allow_pickle=True)
+    X_train = np.load('/Users/feliks/Documents/Faks/Diplomska/App/mlops/X_train_rows.npy', allow_pickle=True)
     y_train = np.load('/Users/feliks/Documents/Faks/Diplomska/App/mlops/y_train.npy', allow_pickle=True)
-    X_test = np.load('/Users/feliks/Documents/Faks/Diplomska/App/mlops/X_test.npy', allow_pickle=True)
+    X_test = np.load('/Users/feliks/Documents/Faks/Diplomska/App/mlops/X_test_rows.npy', allow_pickle=True)
     y_test = np.load('/Users/feliks/Documents/Faks/Diplomska/App/mlops/y_test.npy', allow_pickle=True)
+    offsets_test = np.load('/Users/feliks/Documents/Faks/Diplomska/App/mlops/X_test_offsets.npy')
 
-    # Flatten the data for scikit-learn models
-    X_train_flat = X_train.reshape(-1, X_train.shape[2])
-    X_test_flat = X_test.reshape(-1, X_test.shape[2])
+    # get_data stores races ragged: one row per real rider, no PAD rows
+    X_train_flat = X_train.reshape(-1, X_train.shape[-1])
+    X_test_flat = X_test.reshape(-1, X_test.shape[-1])
 
     # Flatten the targets
     y_train_flat = y_train.flatten()
@@ -151,6 +175,23 @@ def retrain():
             input_example=input_example,
             signature=signature
         )
+
+        # int8 variant for CPU serving, logged only if it passes the guardrail
+        quantized_model, guardrail = quantize_model(model, X_test_flat, y_test_flat, offsets_test)
+        mlflow.log_metrics({
+            'int8_test_mae': guardrail['int8_mae'],
+            'int8_mae_increase': guardrail['mae_increase'],
+            'int8_top3_agreement': guardrail['top3_agreement']
+        })
+        mlflow.set_tag('int8_guardrail', 'passed' if guardrail['passed'] else 'failed')
+        print(f"int8 guardrail {'passed' if guardrail['passed'] else 'failed'}: {guardrail}")
+        if guardrail['passed']:
+            mlflow.pytorch.log_model(
+                pytorch_model=quantized_model,
+                artifact_path="model_int8",
+                input_example=input_example,
+                signature=signature
+            )
         run = mlflow.active_run()
 
     print("Training complete. Model and metrics logged to MLflow.")
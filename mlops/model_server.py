@@ -1,34 +1,89 @@
-from flask import Flask, request, jsonify, send_from_directory, Response
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 from flask_swagger_ui import get_swaggerui_blueprint
 import requests
-from tenacity import retry, stop_after_attempt, wait_fixed, retry_if_exception_type
-import data_process
-import pandas as pd
 import numpy as np
 import os
-import json
+import sys
 import time
-from threading import Thread
+import hashlib
+import math
 import logging
 from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
-
-rider_names_path = "/home/bsc/MLOps_diploma_app/mlops/rider_names_test.npy"
-data_path = "/home/bsc/MLOps_diploma_app/mlops/X_test.npy"
-image_dir = "/home/bsc/MLOps_diploma_app/common/images"
-race_names_path = "/home/bsc/MLOps_diploma_app/common/race_names.csv"
-
-url = "https://ultimate-krill-officially.ngrok-free.app/retrain"
+# Modules shared by the DevOps and MLOps stacks live in common/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from artifact_cache import ArtifactCache
+from http_client import UpstreamClient
+from image_store import ImageStore
+from model_version import ProductionModelWatcher, ServedModelMismatch
+from production_model import InProcessModel, predict as predict_in_process
+from prediction_store import PredictionStore
+from profiler import SamplingProfiler
+from race_catalogue import RaceCatalogue
+from redeploy_queue import RedeployQueue
+from resilience import DEADLINE_HEADER, CircuitBreaker, CircuitOpenError, RetryPolicy, deadline_from_header, set_deadline
+from serialization import RiderEncoder, batch_body, prediction_body
+from tensor_transport import MODEL_RUN_ID_HEADER, InvocationsTransport
+from tracing import Tracer
+
+feature_store_dir = os.getenv("FEATURE_STORE_DIR", "/home/bsc/MLOps_diploma_app/mlops/feature_store")
+image_dir = os.getenv("IMAGE_DIR", "/home/bsc/MLOps_diploma_app/common/images")
+race_names_path = os.getenv("RACE_NAMES_PATH", "/home/bsc/MLOps_diploma_app/common/race_names.csv")
+
+url = os.getenv("RETRAIN_URL", "https://ultimate-krill-officially.ngrok-free.app/retrain")
+invocations_url = os.getenv("INVOCATIONS_URL", "http://seito.lavbic.net:5005/invocations")
+mlflow_tracking_uri = os.getenv("MLFLOW_TRACKING_URI", "http://seito.lavbic.net:5000")
+# "remote" scores through /invocations; "in_process" loads the model behind the
+# 'production' alias into each worker and hot-swaps it when the alias moves
+inference_mode = os.getenv("INFERENCE_MODE", "remote")
+model_poll_interval = float(os.getenv("MODEL_POLL_INTERVAL", 20.0))
+app_port = int(os.getenv("APP_PORT", 5010))
+# Keep-alive connection pools per worker for /invocations and /retrain. Read
+# timeouts bound how long a slow upstream can hold a gunicorn worker
+invocations_pool_size = int(os.getenv("INVOCATIONS_POOL_SIZE", 10))
+invocations_connect_timeout = float(os.getenv("INVOCATIONS_CONNECT_TIMEOUT", 2.0))
+invocations_read_timeout = float(os.getenv("INVOCATIONS_READ_TIMEOUT", 30.0))
+retrain_connect_timeout = float(os.getenv("RETRAIN_CONNECT_TIMEOUT", 5.0))
+retrain_read_timeout = float(os.getenv("RETRAIN_READ_TIMEOUT", 600.0))
+# Each request's upstream calls share a deadline of REQUEST_TIMEOUT seconds
+# (less if the caller sends a shorter X-Request-Timeout). /invocations calls
+# are retried with jittered backoff within INVOCATIONS_RETRY_BUDGET seconds
+# and, with INVOCATIONS_HEDGE_AFTER set, resent if that slow to answer
+request_timeout = float(os.getenv("REQUEST_TIMEOUT", 30.0))
+invocations_attempts = int(os.getenv("INVOCATIONS_ATTEMPTS", 3))
+invocations_retry_budget = float(os.getenv("INVOCATIONS_RETRY_BUDGET", 2.0))
+invocations_hedge_after = float(os.getenv("INVOCATIONS_HEDGE_AFTER", 0)) or None
+retrain_attempts = int(os.getenv("RETRAIN_ATTEMPTS", 5))
+retrain_retry_budget = float(os.getenv("RETRAIN_RETRY_BUDGET", 60.0))
+# Consecutive failures that open an upstream's circuit, and how long it stays
+# open before a probe call is let through
+breaker_failures = int(os.getenv("BREAKER_FAILURES", 5))
+breaker_reset_timeout = float(os.getenv("BREAKER_RESET_TIMEOUT", 30.0))
+# "auto" sends float32 NPY bodies to /invocations and falls back to JSON when
+# the scoring service doesn't accept them (see tensor_transport.py)
+invocations_format = os.getenv("INVOCATIONS_FORMAT", "auto")
+
+# Rows per /invocations call when scoring every race for the prediction table
+prediction_store_batch_rows = int(os.getenv("PREDICTION_STORE_BATCH_ROWS", 4096))
+# Rebuild the prediction table as the last phase of each redeploy job
+warm_after_redeploy = os.getenv("WARM_AFTER_REDEPLOY", "true").lower() in ("1", "true", "yes")
+max_batch_size = int(os.getenv("MAX_BATCH_SIZE", 200))
+predict_cache_control = os.getenv("PREDICT_CACHE_CONTROL", "no-cache")
+image_cache_bytes = int(os.getenv("IMAGE_CACHE_BYTES", 64 * 1024 * 1024))
+image_cache_max_age = int(os.getenv("IMAGE_CACHE_MAX_AGE", 86400))
+# /admin/profile is only served when ADMIN_TOKEN is set; SIGUSR2 to a worker
+# profiles it for PROFILE_SIGNAL_SECONDS. Profiles are written to PROFILE_DIR
+admin_token = os.getenv("ADMIN_TOKEN", "")
+profile_dir = os.getenv("PROFILE_DIR", "/home/bsc/MLOps_diploma_app/mlops/profiles")
+profile_signal_seconds = float(os.getenv("PROFILE_SIGNAL_SECONDS", 30))
+# Redeploy job state, shared by all workers on the host
+redeploy_state_dir = os.getenv("REDEPLOY_STATE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "redeploy_jobs"))
 
 # Prometheus metrics
 REDEPLOY_COUNT = Counter(
     "mlops_redeploy_total",
     "Number of times a redeployment is triggered"
 )
-REDEPLOY_TIME = Histogram(
-    "mlops_redeploy_time_seconds",
-    "Time taken for the redeployment process"
-)
 PREDICT_COUNT = Counter(
     "mlops_predict_total",
     "Total predict calls to MLOps"
@@ -37,10 +92,14 @@ PREDICT_LATENCY = Histogram(
     "mlops_predict_latency_seconds",
     "Latency of predict calls in MLOps"
 )
+# Per-stage latency (mlops_stage_latency_seconds), requests in flight and
+# payload sizes, including the /invocations calls
+tracer = Tracer("mlops")
 
 # Swagger configuration
 SWAGGER_URL = '/documentation'
 API_URL = '/static/swagger.json'
+swagger_file = os.path.join('static', 'swagger.json')
 
 # Create Swagger UI Blueprint
 swagger_ui_blueprint = get_swaggerui_blueprint(
@@ -62,360 +121,510 @@ app = Flask(__name__)
 app.register_blueprint(swagger_ui_blueprint, url_prefix=SWAGGER_URL)
 CORS(app, resources={r"/*": {"origins": ["http://seito.lavbic.net:3001", "https://ultimate-krill-officially.ngrok-free.app"]}})
 
-# Create static folder if it doesn't exist
-if not os.path.exists('static'):
-    os.makedirs('static')
-
-# Swagger specification
-swagger_spec = {
-    "openapi": "3.0.0",
-    "info": {
-        "title": "MLOps API",
-        "version": "1.0.0",
-        "description": "API for MLOps deployment and predictions"
-    },
-    "servers": [
-        {
-            "url": "http://seito.lavbic.net:5010",
-            "description": "Production server"
-        }
-    ],
-    "paths": {
-        "/redeploy": {
-            "post": {
-                "summary": "Trigger model redeployment",
-                "requestBody": {
-                    "required": True,
-                    "content": {
-                        "application/json": {
-                            "schema": {
-                                "type": "object",
-                                "properties": {
-                                    "index": {
-                                        "type": "integer",
-                                        "description": "Index for redeployment"
-                                    }
-                                },
-                                "required": ["index"]
-                            }
-                        }
-                    }
-                },
-                "responses": {
-                    "200": {
-                        "description": "Successful redeployment",
-                        "content": {
-                            "application/json": {
-                                "schema": {
-                                    "type": "object"
-                                }
-                            }
-                        }
-                    },
-                    "400": {
-                        "description": "Invalid input"
-                    },
-                    "500": {
-                        "description": "Internal server error"
-                    }
-                }
-            }
-        },
-        "/predict": {
-            "post": {
-                "summary": "Make predictions",
-                "requestBody": {
-                    "required": True,
-                    "content": {
-                        "application/json": {
-                            "schema": {
-                                "type": "object",
-                                "properties": {
-                                    "index": {
-                                        "type": "integer",
-                                        "description": "Index for prediction"
-                                    }
-                                },
-                                "required": ["index"]
-                            }
-                        }
-                    }
-                },
-                "responses": {
-                    "200": {
-                        "description": "Successful prediction",
-                        "content": {
-                            "application/json": {
-                                "schema": {
-                                    "type": "object",
-                                    "properties": {
-                                        "prediction": {
-                                            "type": "array",
-                                            "items": {
-                                                "type": "object",
-                                                "properties": {
-                                                    "name": {
-                                                        "type": "string"
-                                                    },
-                                                    "prediction": {
-                                                        "type": "number"
-                                                    },
-                                                    "image_url": {
-                                                        "type": "string"
-                                                    }
-                                                }
-                                            }
-                                        }
-                                    }
-                                }
-                            }
-                        }
-                    },
-                    "400": {
-                        "description": "Invalid input"
-                    },
-                    "500": {
-                        "description": "Internal server error"
-                    }
-                }
-            }
-        },
-        "/races": {
-            "get": {
-                "summary": "Get race information",
-                "responses": {
-                    "200": {
-                        "description": "List of races",
-                        "content": {
-                            "application/json": {
-                                "schema": {
-                                    "type": "array",
-                                    "items": {
-                                        "type": "object",
-                                        "properties": {
-                                            "name": {
-                                                "type": "string"
-                                            },
-                                            "stage": {
-                                                "type": "string"
-                                            },
-                                            "index": {
-                                                "type": "integer"
-                                            }
-                                        }
-                                    }
-                                }
-                            }
-                        }
-                    }
-                }
-            }
-        },
-        "/images/{filename}": {
-            "get": {
-                "summary": "Get rider image",
-                "parameters": [
-                    {
-                        "name": "filename",
-                        "in": "path",
-                        "required": True,
-                        "schema": {
-                            "type": "string"
-                        },
-                        "description": "Image filename"
-                    }
-                ],
-                "responses": {
-                    "200": {
-                        "description": "Image file",
-                        "content": {
-                            "image/*": {
-                                "schema": {
-                                    "type": "string",
-                                    "format": "binary"
-                                }
-                            }
-                        }
-                    }
-                }
-            }
-        },
-        "/metrics": {
-            "get": {
-                "summary": "Get Prometheus metrics",
-                "responses": {
-                    "200": {
-                        "description": "Prometheus metrics",
-                        "content": {
-                            "text/plain": {
-                                "schema": {
-                                    "type": "string"
-                                }
-                            }
-                        }
-                    }
-                }
-            }
-        }
-    }
-}
+@app.before_request
+def start_deadline():
+    set_deadline(deadline_from_header(request.headers.get(DEADLINE_HEADER), request_timeout))
+
+@app.teardown_request
+def clear_deadline(exc):
+    set_deadline(None)
+
+profiler = SamplingProfiler(profile_dir)
+profiler.init_app(app, admin_token)
+profiler.install_signal(seconds=profile_signal_seconds)
+
+# The spec is generated at deploy time by common/webhook_listener.sh; only
+# build it here when the server is started some other way
+if not os.path.exists(swagger_file):
+    from swagger_spec import write_swagger_spec
+    write_swagger_spec(swagger_file, app_port)
+
+def prediction_etag(production, snapshot, *parts):
+    # Only known once the watcher has settled on the model behind /invocations
+    if production is None:
+        return None
+    key = ":".join([production['run_id'], snapshot.data_version, *map(str, parts)])
+    return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+def not_modified(etag):
+    # Honoured for POST as well as GET so repeat API callers can skip the body
+    if etag is not None and etag in request.if_none_match:
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = predict_cache_control
+        return response
+    return None
+
+def prediction_response(body, etag):
+    response = Response(body, mimetype="application/json")
+    if etag is not None:
+        response.set_etag(etag)
+    response.headers["Cache-Control"] = predict_cache_control
+    return response
 
-# Write Swagger specification to file
-with open('static/swagger.json', 'w') as f:
-    json.dump(swagger_spec, f)
+def is_index(value):
+    # JSON true/false are ints to isinstance, but not race indices
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def json_object_required():
+    logging.warning("Request body is not a JSON object.")
+    return jsonify({"error": "The request body must be a JSON object"}), 400
+
+def parse_page(params):
+    # Optional top_k/offset from the query string or the JSON body
+    page = []
+    for name, default, minimum in (("top_k", None, 1), ("offset", 0, 0)):
+        value = params.get(name, default)
+        if isinstance(value, str) and value.isdigit():
+            value = int(value)
+        if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value < minimum):
+            raise ValueError(f"'{name}' must be an integer >= {minimum}")
+        page.append(value)
+    return tuple(page)
+
+def page_riders(rider_prediction, top_k=None, offset=0):
+    return rider_prediction[offset:None if top_k is None else offset + top_k]
+
+# Rider names and image URLs are JSON-encoded once per rider, not per response
+rider_encoder = RiderEncoder("http://seito.lavbic.net:5010/images/{name}.jpg")
+
+def rank_riders(race_rider_names, prediction, top_k=None, offset=0):
+    # Only the requested page is selected (argpartition, then a sort of just
+    # those scores) before anything is encoded
+    race_rider_names = np.asarray(race_rider_names)
+    scores = np.asarray(prediction, dtype=np.float32).reshape(-1)
+
+    end = len(scores) if top_k is None else min(offset + top_k, len(scores))
+    if offset >= end:
+        return []
+    if end < len(scores):
+        # Widen to every rider tied with the cut-off score so ties resolve
+        # the same way on every page
+        threshold = scores[np.argpartition(-scores, end - 1)[end - 1]]
+        candidates = np.flatnonzero(scores >= threshold)
+    else:
+        candidates = np.arange(len(scores))
+    # Ties keep rider order, as the stable sorted() this replaced did
+    order = candidates[np.lexsort((candidates, -scores[candidates]))][offset:end]
+
+    return rider_encoder.encode(race_rider_names[order], scores[order])
+
+def current_production():
+    # Registry info of the model that scores requests; in process it also
+    # carries the loaded model under 'model'
+    if production_model is not None:
+        return production_model.current()
+    return model_watcher.current()
+
+def post_invocations(rows):
+    with tracer.span("encode"):
+        body, headers = invocations_transport.encode(rows)
+    with tracer.span("invocations"):
+        response = invocations_client.post(invocations_url, idempotent=True, headers=headers, data=body)
+    tracer.record_payload("invocations", len(body), len(response.content))
+    if invocations_transport.rejected(headers, response):
+        return post_invocations(rows)
+    run_id = response.headers.get(MODEL_RUN_ID_HEADER)
+    if run_id is not None:
+        model_watcher.report_served(run_id)
+    return response
 
-@retry(
-    stop=stop_after_attempt(5),
-    wait=wait_fixed(2),
-    retry=retry_if_exception_type(requests.exceptions.RequestException),
+def scored_by(served, production):
+    # True if every /invocations answer said production's model sent it.
+    # mlflow models serve doesn't say, and neither does a scoring service in
+    # the middle of switching models, so those scores are served but neither
+    # kept nor ETagged under production's run_id
+    return production_model is not None or served == {production['run_id']}
+
+def upstream_error(e):
+    logging.error(f"Prediction service error: {e}")
+    if isinstance(e, CircuitOpenError):
+        response = jsonify({"error": "Prediction service unavailable"})
+        response.status_code = 503
+        response.headers["Retry-After"] = str(math.ceil(invocations_client.breaker.retry_after()) or 1)
+        return response
+    if isinstance(e, requests.exceptions.Timeout):
+        return jsonify({"error": "Prediction service timed out"}), 504
+    return jsonify({"error": "Prediction service error"}), 502
+
+def score_rows(rows, production=None, served=None):
+    # served, if given, collects the run_id each /invocations answer reported
+    # (None when it didn't say)
+    if production_model is not None:
+        if production is None:
+            raise RuntimeError("The production model has not been loaded yet")
+        with tracer.span("forward"):
+            return predict_in_process(production['model'], rows)
+    response = post_invocations(rows)
+    response.raise_for_status()
+    if served is not None:
+        served.add(response.headers.get(MODEL_RUN_ID_HEADER))
+    with tracer.span("decode"):
+        return invocations_transport.decode(response)
+
+def score_races(races, race_rider_names, batch_rows=None, pages=None, production=None, served=None):
+    # races are ragged (no PAD rows): their riders are already stacked, so k
+    # races cost one /invocations call or forward pass (or one per batch_rows rows)
+    with tracer.span("gather"):
+        rows = races.flat_rows().astype(np.float32, copy=False)
+    batch_rows = batch_rows or max(len(rows), 1)
+
+    predictions = np.empty(len(rows), dtype=np.float32)
+    for start in range(0, len(rows), batch_rows):
+        predictions[start:start + batch_rows] = score_rows(rows[start:start + batch_rows], production, served)
+
+    offsets = races.offsets
+    pages = pages or [(None, 0)] * len(races)
+    with tracer.span("rank"):
+        return [
+            rank_riders(race_rider_names[i], predictions[offsets[i]:offsets[i + 1]], *pages[i])
+            for i in range(len(races))
+        ]
+
+def build_prediction_table(source):
+    # source is the (snapshot, production) the table is keyed on
+    snapshot, production = source
+    served = set()
+    with tracer.trace("prediction_table", production['run_id']):
+        table = score_races(
+            snapshot.X_test, snapshot.rider_names, prediction_store_batch_rows, production=production, served=served
+        )
+    if not scored_by(served, production):
+        others = served - {None, production['run_id']}
+        if others:
+            raise ServedModelMismatch(f"Scored by run {', '.join(sorted(others))} instead of {production['run_id']}")
+        # The scoring service didn't say which model answered: keep the table
+        # only if the alias still points at the model it is keyed on
+        model_watcher.confirm(production)
+    return table
+
+invocations_client = UpstreamClient(
+    "invocations", invocations_pool_size, invocations_connect_timeout, invocations_read_timeout,
+    breaker=CircuitBreaker("invocations", breaker_failures, breaker_reset_timeout),
+    retry=RetryPolicy(invocations_attempts, base_delay=0.05, max_delay=0.5, budget=invocations_retry_budget),
+    hedge_after=invocations_hedge_after
 )
+invocations_transport = InvocationsTransport(invocations_format)
+# Retraining runs synchronously behind /retrain, so one connection is enough.
+# Not idempotent: only retried when the call never reached it
+retrain_client = UpstreamClient(
+    "retrain", 1, retrain_connect_timeout, retrain_read_timeout,
+    breaker=CircuitBreaker("retrain", breaker_failures, breaker_reset_timeout),
+    retry=RetryPolicy(retrain_attempts, base_delay=1.0, max_delay=8.0, budget=retrain_retry_budget)
+)
+
+# Test data stays resident per worker; the prediction table is rebuilt whenever
+# the production model or the preprocessed data changes
+artifacts = ArtifactCache(feature_store_dir)
+if inference_mode == "in_process":
+    # Loaded versions switch as soon as they are warm, so no grace period
+    production_model = InProcessModel(warm_up_rows=lambda: artifacts.get().X_test[:1].flat_rows())
+    model_watcher = ProductionModelWatcher(
+        mlflow_tracking_uri, model_poll_interval, switch_grace=0, on_change=production_model.update
+    ).start()
+else:
+    production_model = None
+    model_watcher = ProductionModelWatcher(mlflow_tracking_uri, model_poll_interval).start()
+prediction_store = PredictionStore(build_prediction_table)
+race_catalogue = RaceCatalogue(race_names_path)
+image_store = ImageStore("mlops", image_dir, max_bytes=image_cache_bytes)
+
 def make_request_with_retries(index):
+    # Retried with backoff by retrain_client
     logging.info(f"Attempting to make POST request to {url} with index: {index}")
-    response = requests.post(url, json={"index": index})
+    response = retrain_client.post(url, json={"index": index})
     response.raise_for_status()
     logging.info("Request successful.")
     return response
 
+def retrain_model(index):
+    return make_request_with_retries(index).json()
+
+def preprocess_data(index):
+    # Imported here: it loads the full dataset, which the API doesn't need
+    # to serve predictions
+    import data_process
+    data_process.preprocess_data(index)
+
+def warm_predictions(index):
+    # Scores every race of the freshly preprocessed data with the current
+    # production model; other workers build theirs on their next lookup
+    production = current_production()
+    if production is None:
+        logging.info("No production model yet, skipping prediction warm-up")
+        return
+    snapshot = artifacts.get()
+    prediction_store.warm((production['run_id'], snapshot.data_version), (snapshot, production))
+
+# Retraining and preprocessing take minutes, so they run as a background job
+# shared by all workers; /redeploy only queues it
+redeploy_steps = [("retrain", retrain_model), ("preprocess", preprocess_data)]
+if warm_after_redeploy:
+    redeploy_steps.append(("warm", warm_predictions))
+# Started by the first submit() or get() in each worker, not at import
+redeploy_queue = RedeployQueue(redeploy_state_dir, redeploy_steps)
+
 @app.route('/redeploy', methods=['POST'])
+@tracer.track("redeploy")
 def redeploy():
-    start_time = time.time()
     REDEPLOY_COUNT.inc()
 
     try:
         logging.info("Received request for /redeploy endpoint.")
-        data = request.get_json(force=True)
+        data = request.get_json(force=True, silent=True)
         logging.debug(f"Request JSON payload: {data}")
+        if not isinstance(data, dict):
+            return json_object_required()
 
         index = data.get('index')
         if index is None:
             logging.warning("Index not provided in request.")
             return jsonify({"error": "Index not provided"}), 400
 
-        if not isinstance(index, int):
+        if not is_index(index):
             logging.warning(f"Invalid index type: {type(index)}. Must be an integer.")
             return jsonify({"error": "Index must be an integer"}), 400
 
-        # Define a function to do heavy lifting
-        def run_redeployment(idx, status_container):
-            try:
-                logging.info(f"Starting redeployment process for index: {idx}")
-
-                # 1) Make the external retraining request
-                response = make_request_with_retries(idx)
-
-                # 2) Preprocess the data
-                logging.info(f"Starting data preprocessing for index: {idx}")
-                data_process.preprocess_data(idx)
-                logging.info("Data preprocessing completed successfully.")
-
-                status_container['response'] = response
-                status_container['exception'] = None
-            except Exception as e:
-                logging.error(f"Redeployment failed: {e}")
-                status_container['exception'] = e
-                status_container['response'] = None
-
-        thread_status = {'response': None, 'exception': None}
-        t = Thread(target=run_redeployment, args=(index, thread_status))
-        t.start()
-        t.join()
-
-        if thread_status['exception'] is not None:
-            e = thread_status['exception']
-            return jsonify({"error": f"Redeployment failed: {str(e)}"}), 500
-
-        # Redeployment done
-        total_time = time.time() - start_time
-        REDEPLOY_TIME.observe(total_time)
-
-        return thread_status['response'].json(), thread_status['response'].status_code
+        job, coalesced = redeploy_queue.submit(index)
+        logging.info(f"Redeploy job {job['id']} {'updated' if coalesced else 'queued'} for index: {index}")
+        response = jsonify(dict(job_body(job), coalesced=coalesced))
+        response.status_code = 202
+        response.headers["Location"] = f"/redeploy/{job['id']}"
+        return response
 
     except Exception as e:
         logging.error(f"Unexpected error in /redeploy: {e}")
         return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
 
+@app.route('/redeploy/<job_id>', methods=['GET'])
+@tracer.track("redeploy_status")
+def redeploy_status(job_id):
+    job = redeploy_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown redeploy job {job_id}"}), 404
+    return jsonify(job_body(job))
+
+def job_body(job):
+    return {key: value for key, value in job.items() if key != "pid"}
+
 @app.route('/images/<filename>')
+@tracer.track("images")
 def get_image(filename):
-    if os.path.exists(os.path.join(image_dir, filename)):
-        return send_from_directory(image_dir, filename)
+    with tracer.span("image_store"):
+        image = image_store.get(filename, request.args.get('variant'))
+    response = Response(image.body, mimetype=image.mimetype)
+    response.set_etag(image.etag)
+    response.last_modified = image.last_modified
+    if image.fallback:
+        # The rider may get a picture later, so the placeholder is always revalidated
+        response.headers["Cache-Control"] = "no-cache"
     else:
-        return send_from_directory(image_dir, "unknown.jpg")
+        response.headers["Cache-Control"] = f"public, max-age={image_cache_max_age}"
+    return response.make_conditional(request)
 
 @app.route('/races')
+@tracer.track("races")
 def get_races():
-    race_names = pd.read_csv(race_names_path)
-    X_test = np.load(data_path, allow_pickle=True)
-    length = len(X_test)
-    race_names = race_names.tail(length)
-    race_names['name'] = race_names['name'].str.replace('-', ' ').str.title()
-    race_names['stage'] = race_names['stage'].str.replace('-', ' ').str.title()
-
-    original_order = race_names.copy()
-    sorted_races = race_names.sort_values(['name', 'stage']).reset_index(drop=True)
-    original_order['index'] = original_order.apply(
-        lambda row: sorted_races[
-            (sorted_races['name'] == row['name']) &
-            (sorted_races['stage'] == row['stage'])
-        ].index[0],
-        axis=1
-    )
-    return jsonify(original_order.to_dict(orient='records')), 200
-
-@app.route('/predict', methods=['POST'])
+    with tracer.span("artifacts"):
+        snapshot = artifacts.get()
+    length = len(snapshot.X_test)
+
+    # Built once per data version and served pre-serialized; repeat loads
+    # with a matching If-None-Match get a 304
+    with tracer.span("catalogue"):
+        catalogue = race_catalogue.get(snapshot.data_version, length)
+    response = Response(catalogue.body, mimetype="application/json")
+    response.set_etag(catalogue.etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+@app.route('/predict', methods=['GET', 'POST'])
+@tracer.track("predict")
 def predict():
     import time
     start_time = time.time()
     PREDICT_COUNT.inc()
 
     try:
-        X_test = np.load(data_path, allow_pickle=True)
-        rider_names = np.load(rider_names_path, allow_pickle=True)
-
-        data = request.get_json(force=True)
+        with tracer.span("artifacts"):
+            snapshot = artifacts.get()
+        X_test = snapshot.X_test
+        rider_names = snapshot.rider_names
+
+        if request.method == 'GET':
+            data = dict(request.args, index=request.args.get('index', type=int))
+        else:
+            data = request.get_json(force=True, silent=True)
         logging.debug(f"Request JSON payload: {data}")
+        if not isinstance(data, dict):
+            return json_object_required()
 
         index = data.get('index')
         if index is None:
             logging.warning("Index not provided in request.")
             return jsonify({"error": "Index not provided"}), 400
-        if not isinstance(index, int):
+        if not is_index(index):
             logging.warning(f"Invalid index type: {type(index)}. Must be an integer.")
             return jsonify({"error": "Index must be an integer"}), 400
         if index < 0 or index >= len(X_test):
             logging.warning("Index out of bounds.")
             return jsonify({"error": "Invalid index"}), 400
-
-        race_data = X_test[index].astype(np.float32)
+        try:
+            top_k, offset = parse_page(data)
+        except ValueError as e:
+            logging.warning(f"Invalid page parameters: {e}")
+            return jsonify({"error": str(e)}), 400
+
+        production = current_production()
+        if production is not None:
+            tracer.set_model_version(production['run_id'])
+        elif production_model is not None:
+            return jsonify({"error": "The production model has not been loaded yet"}), 503
+        etag = prediction_etag(production, snapshot, index, top_k, offset)
+        response = not_modified(etag)
+        if response is not None:
+            return response
+
+        if production is not None:
+            version = (production['run_id'], snapshot.data_version)
+            with tracer.span("lookup"):
+                rider_prediction = prediction_store.lookup(version, (snapshot, production), index)
+            if rider_prediction is not None:
+                with tracer.span("serialize"):
+                    return prediction_response(prediction_body(page_riders(rider_prediction, top_k, offset)), etag)
+
+        with tracer.span("gather"):
+            race_data = X_test[index].astype(np.float32)
         race_rider_names = rider_names[index]
 
-        payload = {"instances": race_data.tolist()}
+        if production_model is not None:
+            prediction = score_rows(race_data, production)
+        else:
+            try:
+                response = post_invocations(race_data)
+            except requests.exceptions.RequestException as e:
+                return upstream_error(e)
+
+            if response.status_code != 200:
+                logging.error(f"Prediction service returned error: {response.text}")
+                return jsonify({"error": "Prediction service error"}), response.status_code
+
+            with tracer.span("decode"):
+                prediction = invocations_transport.decode(response)
+            if production is not None and not scored_by({response.headers.get(MODEL_RUN_ID_HEADER)}, production):
+                production = etag = None
+        with tracer.span("rank"):
+            if production is not None:
+                # Ranked in full so any page of it can be served from the store
+                ranked = rank_riders(race_rider_names, prediction)
+                prediction_store.put(version, index, ranked)
+                rider_prediction = page_riders(ranked, top_k, offset)
+            else:
+                rider_prediction = rank_riders(race_rider_names, prediction, top_k, offset)
+
+        with tracer.span("serialize"):
+            return prediction_response(prediction_body(rider_prediction), etag)
 
-        response = requests.post(
-            "http://seito.lavbic.net:5005/invocations",
-            headers={"Content-Type": "application/json"},
-            data=json.dumps(payload),
-            timeout=600
-        )
+    except Exception as e:
+        logging.error(f"Error in /predict: {e}")
+        return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
+    finally:
+        total_latency = time.time() - start_time
+        PREDICT_LATENCY.observe(total_latency)
 
-        if response.status_code != 200:
-            logging.error(f"Prediction service returned error: {response.text}")
-            return jsonify({"error": "Prediction service error"}), response.status_code
-
-        prediction = response.json()['predictions']
-        rider_prediction = [
-            {
-                "name": name,
-                "prediction": float(pred),
-                "image_url": os.path.join(f"http://seito.lavbic.net:5010/images/{name}.jpg")
-            }
-            for name, pred in zip(race_rider_names, prediction) if name != "PAD"
-        ]
-        rider_prediction = sorted(rider_prediction, key=lambda x: x["prediction"], reverse=True)
+@app.route('/predict/batch', methods=['POST'])
+@tracer.track("predict_batch")
+def predict_batch():
+    start_time = time.time()
+    PREDICT_COUNT.inc()
 
-        return jsonify({"prediction": rider_prediction}), 200
+    try:
+        data = request.get_json(force=True, silent=True)
+        logging.debug(f"Request JSON payload: {data}")
+        if not isinstance(data, dict):
+            return json_object_required()
+
+        indices = data.get('indices')
+        race_name = data.get('race')
+        if indices is None and race_name is None:
+            logging.warning("Neither indices nor race provided in request.")
+            return jsonify({"error": "Provide either 'indices' or 'race'"}), 400
+        if indices is not None and (
+            not isinstance(indices, list) or not all(is_index(i) for i in indices)
+        ):
+            logging.warning(f"Invalid indices: {indices}. Must be a list of integers.")
+            return jsonify({"error": "'indices' must be a list of integers"}), 400
+        try:
+            top_k, offset = parse_page(data)
+        except ValueError as e:
+            logging.warning(f"Invalid page parameters: {e}")
+            return jsonify({"error": str(e)}), 400
+
+        with tracer.span("artifacts"):
+            snapshot = artifacts.get()
+        X_test = snapshot.X_test
+        if indices is None:
+            # All stages of a race, using the names and indices served by /races
+            catalogue = race_catalogue.get(snapshot.data_version, len(X_test))
+            indices = [race['index'] for race in catalogue.races if race['name'] == race_name]
+            if not indices:
+                logging.warning(f"Unknown race: {race_name}")
+                return jsonify({"error": f"Unknown race: {race_name}"}), 400
+
+        indices = list(dict.fromkeys(indices))
+        if len(indices) > max_batch_size:
+            return jsonify({"error": f"At most {max_batch_size} races can be predicted at once"}), 400
+        if any(i < 0 or i >= len(X_test) for i in indices):
+            logging.warning("Index out of bounds.")
+            return jsonify({"error": "Invalid index"}), 400
+
+        production = current_production()
+        if production is not None:
+            tracer.set_model_version(production['run_id'])
+        elif production_model is not None:
+            return jsonify({"error": "The production model has not been loaded yet"}), 503
+        etag = prediction_etag(production, snapshot, top_k, offset, *indices)
+        response = not_modified(etag)
+        if response is not None:
+            return response
+
+        results = dict.fromkeys(indices)
+        if production is not None:
+            version = (production['run_id'], snapshot.data_version)
+            with tracer.span("lookup"):
+                results = {i: prediction_store.lookup(version, (snapshot, production), i) for i in indices}
+                results = {
+                    i: None if rider_prediction is None else page_riders(rider_prediction, top_k, offset)
+                    for i, rider_prediction in results.items()
+                }
+
+        # Races missing from the precomputed table go out in one /invocations call
+        missing = [i for i, rider_prediction in results.items() if rider_prediction is None]
+        if missing:
+            # Ranked in full for the store when the model version is known
+            page = (top_k, offset) if production is None else (None, 0)
+            served = set()
+            try:
+                scored = score_races(
+                    X_test[missing], snapshot.rider_names[missing], pages=[page] * len(missing),
+                    production=production, served=served
+                )
+            except requests.exceptions.RequestException as e:
+                return upstream_error(e)
+            if production is not None:
+                if scored_by(served, production):
+                    for i, ranked in zip(missing, scored):
+                        prediction_store.put(version, i, ranked)
+                else:
+                    etag = None
+                scored = [page_riders(ranked, top_k, offset) for ranked in scored]
+            results.update(zip(missing, scored))
+
+        with tracer.span("serialize"):
+            return prediction_response(batch_body((i, results[i]) for i in indices), etag)
 
     except Exception as e:
-        logging.error(f"Error in /predict: {e}")
+        logging.error(f"Error in /predict/batch: {e}")
         return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
     finally:
         total_latency = time.time() - start_time
@@ -426,5 +635,5 @@ def metrics():
     return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST), 200
 
 if __name__ == '__main__':
-    logging.info("Starting MLOps API on port 5010")
-    app.run(host="0.0.0.0", port=5010)
\ No newline at end of file
+    logging.info(f"Starting MLOps API on port {app_port}")
+    app.run(host="0.0.0.0", port=app_port)
\ No newline at end of file
@@ -2,6 +2,11 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 import model_redeployment
 import logging
+import os
+import sys
+# Modules shared by the DevOps and MLOps stacks live in common/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from profiler import SamplingProfiler
 from tenacity import retry, stop_after_attempt, wait_fixed, RetryError
 
 # Configuration
@@ -9,6 +14,10 @@ APP_HOST = "localhost"
 APP_PORT = 10000
 MAX_RETRIES = 5
 RETRY_WAIT = 2
+# /admin/profile is only served when ADMIN_TOKEN is set
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_SIGNAL_SECONDS = float(os.getenv("PROFILE_SIGNAL_SECONDS", 30))
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -21,6 +30,10 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+profiler = SamplingProfiler(PROFILE_DIR)
+profiler.init_app(app, ADMIN_TOKEN)
+profiler.install_signal(seconds=PROFILE_SIGNAL_SECONDS)
+
 # Retry decorator for redeployment logic
 @retry(stop=stop_after_attempt(MAX_RETRIES), wait=wait_fixed(RETRY_WAIT))
 def safe_redeploy_model(index):
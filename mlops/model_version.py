@@ -0,0 +1,127 @@
+import json
+import logging
+import threading
+import time
+
+from prometheus_client import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+MODEL_VERSION_CHANGES = Counter(
+    "mlops_production_model_changes_total",
+    "Number of times the 'production' alias was seen moving to a new model version"
+)
+MODEL_VERSION = Gauge(
+    "mlops_production_model_version",
+    "Model registry version currently behind the 'production' alias"
+)
+
+
+class ServedModelMismatch(RuntimeError):
+    """Raised when scores came from another model than the one they would be keyed on."""
+
+
+class ProductionModelWatcher:
+    """
+    Polls the MLflow registry for the model behind the 'production' alias.
+
+    model_deploy_zero_downtime.sh needs a while after the alias moves before
+    nginx routes /invocations to the new model, and the switch can fail. When
+    the scoring service reports the run_id it serves (report_served()),
+    current() is the registry info of that model, the previous or the new
+    production version, and None for any other. Scoring services that don't
+    report it get a grace period instead: a freshly changed version is only
+    reported once switch_grace seconds have passed. Until then (and while
+    the registry has never been reachable) current() returns None. Callers
+    that can't tell which model answered use confirm() to re-read the alias
+    before keeping scores under its run_id.
+
+    on_change(info), if given, is called from the polling thread for the
+    first version seen and every change after it; if it raises, the change
+    is not recorded and is retried on the next poll.
+    """
+
+    def __init__(self, tracking_uri, poll_interval=20.0, switch_grace=60.0, on_change=None):
+        self.tracking_uri = tracking_uri
+        self.poll_interval = poll_interval
+        self.switch_grace = switch_grace
+        self.on_change = on_change
+
+        self._info = None
+        self._recent = {}  # run_id -> info for the current and previous versions
+        self._served = None
+        self._changed_at = 0.0
+        self._poll_lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def report_served(self, run_id):
+        # Called with the run_id the scoring service says answered a request
+        self._served = run_id
+
+    def confirm(self, info):
+        # Re-reads the alias; raises ServedModelMismatch if it has moved off info
+        latest = self.poll()
+        if latest is None or latest['run_id'] != info['run_id']:
+            raise ServedModelMismatch(f"The 'production' alias no longer points at run {info['run_id']}")
+
+    def current(self):
+        served = self._served
+        if served is not None:
+            return self._recent.get(served)
+        info = self._info
+        if info is None or time.monotonic() - self._changed_at < self.switch_grace:
+            return None
+        return info
+
+    def _run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Failed to check production model version: {e}")
+            time.sleep(self.poll_interval)
+
+    def poll(self):
+        # Also called from confirm(), so polls are serialized
+        with self._poll_lock:
+            return self._poll()
+
+    def _poll(self):
+        # Imported lazily so the API still starts where MLflow isn't installed
+        import mlflow
+        from check_model_version import get_model_version
+
+        mlflow.set_tracking_uri(self.tracking_uri)
+        version_info = get_model_version()
+        if version_info is None:
+            return self._info
+
+        info = json.loads(version_info)
+        previous = self._info
+        if previous is not None and (previous['version'], previous['run_id']) == (info['version'], info['run_id']):
+            return previous
+
+        if self.on_change is not None:
+            try:
+                self.on_change(info)
+            except Exception as e:
+                logger.error(f"Failed to switch to production model version {info['version']}: {e}")
+                return previous
+
+        if previous is None:
+            # First observation: this is the model that is already being served
+            self._changed_at = time.monotonic() - self.switch_grace
+        else:
+            logger.info(f"Production model changed from version {previous['version']} to {info['version']}")
+            MODEL_VERSION_CHANGES.inc()
+            self._changed_at = time.monotonic()
+        self._recent = {info['run_id']: info} if previous is None else {previous['run_id']: previous, info['run_id']: info}
+        self._info = info
+        MODEL_VERSION.set(float(info['version']))
+        return info
@@ -0,0 +1,158 @@
+import logging
+import threading
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+STORE_LOOKUPS = Counter(
+    "mlops_prediction_store_lookups_total",
+    "Prediction lookups: hit (from the table), scored (a race already scored live while the table "
+    "was missing) or miss (the race has to be scored)",
+    ["result"]
+)
+STORE_HIT_RATIO = Gauge(
+    "mlops_prediction_store_hit_ratio",
+    "Share of prediction lookups answered without scoring since the worker started"
+)
+STORE_EVICTIONS = Counter(
+    "mlops_prediction_store_evictions_total",
+    "Races dropped from the prediction store: superseded (a newer table was published) or "
+    "invalidated (live-scored races for a model or data version no longer asked for)",
+    ["reason"]
+)
+STORE_BUILD_TIME = Histogram(
+    "mlops_prediction_store_build_seconds",
+    "Time taken to score every race and rebuild the prediction table"
+)
+STORE_BUILDS = Counter(
+    "mlops_prediction_store_builds_total",
+    "Prediction table rebuilds",
+    ["status"]
+)
+STORE_RACES = Gauge(
+    "mlops_prediction_store_races",
+    "Number of races in the active prediction table"
+)
+STORE_ROWS = Gauge(
+    "mlops_prediction_store_rows",
+    "Number of rider predictions in the active prediction table"
+)
+
+
+class PredictionStore:
+    """
+    Ranked predictions for every race, built in one pass for a given
+    (model version, data version) key. Lookups for any other key kick off a
+    background rebuild; until the new table is published callers score races
+    live and put() them here, so each race is scored at most once per key.
+    Live-scored races are only kept for the key last looked up and are
+    dropped once its table is published, so a race is never held twice and
+    the store never holds more than one table's worth of them.
+    """
+
+    def __init__(self, build_fn, retry_interval=30.0):
+        self._build_fn = build_fn
+        self.retry_interval = retry_interval
+
+        self._lock = threading.Lock()
+        self._current = None  # (key, table), swapped as a single reference
+        self._building = None
+        self._failed = (None, 0.0)
+        self._scored = (None, {})  # (key, {index: ranked}) for races scored live
+        self._hits = 0
+        self._lookups = 0
+
+    def lookup(self, key, source, index):
+        current = self._current
+        if current is not None and current[0] == key:
+            self._count("hit")
+            return current[1][index]
+
+        with self._lock:
+            if self._scored[0] != key:
+                self._drop_scored("invalidated", key)
+            ranked = self._scored[1].get(index)
+        self._count("miss" if ranked is None else "scored")
+        self.schedule_build(key, source)
+        return ranked
+
+    def put(self, key, index, ranked):
+        # Keeps a race scored live for key until its table is published. Only
+        # lookup() moves to a new key, so a request that started before the
+        # version changed can't bring back the old one.
+        with self._lock:
+            if self._scored[0] == key:
+                self._scored[1][index] = ranked
+
+    def _count(self, result):
+        STORE_LOOKUPS.labels(result=result).inc()
+        with self._lock:
+            self._hits += result != "miss"
+            self._lookups += 1
+            STORE_HIT_RATIO.set(self._hits / self._lookups)
+
+    def _drop_scored(self, reason, key=None):
+        if self._scored[1]:
+            STORE_EVICTIONS.labels(reason=reason).inc(len(self._scored[1]))
+        self._scored = (key, {})
+
+    def schedule_build(self, key, source):
+        if self._claim(key, retry_failed=False):
+            threading.Thread(target=self._build, args=(key, source), daemon=True).start()
+
+    def warm(self, key, source):
+        # Builds the table for key in the calling thread, unless it is
+        # already current or being built
+        if self._claim(key, retry_failed=True):
+            self._build(key, source)
+
+    def _claim(self, key, retry_failed):
+        with self._lock:
+            if self._building == key:
+                return False
+            current = self._current
+            if current is not None and current[0] == key:
+                return False
+            failed_key, failed_at = self._failed
+            if not retry_failed and failed_key == key and time.monotonic() - failed_at < self.retry_interval:
+                return False
+            self._building = key
+            return True
+
+    def _build(self, key, source):
+        start_time = time.time()
+        try:
+            logger.info(f"Building prediction table for {key}")
+            table = self._build_fn(source)
+        except Exception as e:
+            logger.error(f"Failed to build prediction table for {key}: {e}")
+            STORE_BUILDS.labels(status="failed").inc()
+            with self._lock:
+                if self._building == key:
+                    self._building = None
+                self._failed = (key, time.monotonic())
+            return
+
+        build_time = time.time() - start_time
+        STORE_BUILD_TIME.observe(build_time)
+        STORE_BUILDS.labels(status="success").inc()
+
+        with self._lock:
+            # A newer version may have been scheduled while this one was building
+            if self._building not in (None, key):
+                logger.info(f"Discarding prediction table for superseded {key}")
+                return
+            previous = self._current
+            self._current = (key, table)
+            self._building = None
+            if self._scored[0] == key:
+                self._drop_scored("superseded", key)
+
+        if previous is not None and previous[0] != key:
+            STORE_EVICTIONS.labels(reason="superseded").inc(len(previous[1]))
+
+        STORE_RACES.set(len(table))
+        STORE_ROWS.set(sum(len(rows) for rows in table))
+        logger.info(f"Prediction table for {key} ready: {len(table)} races in {build_time:.2f}s")
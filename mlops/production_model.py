@@ -0,0 +1,82 @@
+import logging
+import threading
+import time
+
+import numpy as np
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+MODEL_LOADS = Counter(
+    "mlops_in_process_model_loads_total",
+    "Production model loads into the worker (in-process inference)",
+    ["status"]
+)
+MODEL_LOAD_TIME = Histogram(
+    "mlops_in_process_model_load_seconds",
+    "Time taken to load and warm up a production model version in the worker"
+)
+MODEL_LOADED_VERSION = Gauge(
+    "mlops_in_process_model_version",
+    "Model registry version currently scoring requests in the worker"
+)
+
+
+def load_registered_model(info):
+    # Pinned to the version the alias pointed at, so a later alias move
+    # can't change what this load returns
+    import mlflow.pyfunc
+    return mlflow.pyfunc.load_model(f"models:/{info['name']}/{info['version']}")
+
+
+class InProcessModel:
+    """
+    The production model loaded into this worker, for INFERENCE_MODE=in_process.
+
+    update(info) is the ProductionModelWatcher's on_change callback: it loads
+    the new version next to the old one, warms it up on warm_up_rows() and
+    only then swaps it in, so requests keep being served by the old version
+    throughout. current() returns the registry info of the loaded version
+    with the model itself under "model"; a request grabs it once and uses
+    that model for everything it scores.
+
+    common/benchmarks/model_swap_test.py checks the swap under load against
+    a local file-backed MLflow tracking store.
+    """
+
+    def __init__(self, loader=load_registered_model, warm_up_rows=None):
+        self.loader = loader
+        self.warm_up_rows = warm_up_rows
+
+        self._lock = threading.Lock()
+        self._current = None
+
+    def current(self):
+        return self._current
+
+    def update(self, info):
+        with self._lock:
+            current = self._current
+            if current is not None and (current['version'], current['run_id']) == (info['version'], info['run_id']):
+                return current
+
+            start_time = time.time()
+            try:
+                logger.info(f"Loading production model version {info['version']} into the worker")
+                model = self.loader(info)
+                if self.warm_up_rows is not None:
+                    predict(model, self.warm_up_rows())
+            except Exception:
+                MODEL_LOADS.labels(status="failure").inc()
+                raise
+            MODEL_LOADS.labels(status="success").inc()
+            MODEL_LOAD_TIME.observe(time.time() - start_time)
+
+            self._current = dict(info, model=model)
+            MODEL_LOADED_VERSION.set(float(info['version']))
+            logger.info(f"Serving production model version {info['version']} in process")
+            return self._current
+
+
+def predict(model, rows):
+    return np.asarray(model.predict(np.ascontiguousarray(rows, dtype=np.float32)), dtype=np.float32).reshape(-1)
@@ -0,0 +1,202 @@
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+REDEPLOY_JOBS = Counter(
+    "mlops_redeploy_jobs_total",
+    "Redeploy requests by what became of them (succeeded, failed, or coalesced into a queued job)",
+    ["outcome"]
+)
+REDEPLOY_QUEUE_LENGTH = Gauge(
+    "mlops_redeploy_queue_length",
+    "Redeploy jobs waiting or running, as last seen by this worker",
+    ["status"]
+)
+REDEPLOY_PHASE_TIME = Histogram(
+    "mlops_redeploy_phase_seconds",
+    "Time redeploy jobs spent queued and in each phase",
+    ["phase"],
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+)
+REDEPLOY_TIME = Histogram(
+    "mlops_redeploy_time_seconds",
+    "Time taken for the redeployment process",
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+)
+
+ACTIVE = ("queued", "running")
+
+
+class RedeployQueue:
+    """
+    Runs redeploy jobs one at a time in the background. steps is a list of
+    (phase, fn(index)) run in order; the first non-None return value is kept
+    as the job's result.
+
+    Jobs live in a JSON file under state_dir, locked with flock, so every
+    gunicorn worker sees the same queue: a job submitted to one worker can be
+    polled on any other, and whichever worker's runner thread claims it
+    first runs it. There is at most one queued job: submitting while one is
+    queued retargets it to the new index (the latest request wins) and
+    returns its id, so repeated clicks during a retrain cost one more run,
+    not one per click.
+    """
+
+    def __init__(self, state_dir, steps, poll_interval=2.0, history=50):
+        self.steps = steps
+        self.poll_interval = poll_interval
+        self.history = history
+
+        self.state_dir = state_dir
+        self._path = os.path.join(state_dir, "jobs.json")
+        self._lock_path = os.path.join(state_dir, "jobs.lock")
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def start(self):
+        # Per process, so gunicorn's forked workers each get their own runner.
+        # Nothing touches state_dir or starts a thread before the first call,
+        # which submit() and get() make, so importing the server has no side effects
+        if self._pid != os.getpid():
+            os.makedirs(self.state_dir, exist_ok=True)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    @contextmanager
+    def _state(self):
+        with open(self._lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self._path) as f:
+                        jobs = json.load(f)
+                except (FileNotFoundError, ValueError):
+                    jobs = []
+                before = json.dumps(jobs)
+                yield jobs
+                if json.dumps(jobs) != before:
+                    tmp_path = f"{self._path}.{os.getpid()}.tmp"
+                    with open(tmp_path, "w") as f:
+                        json.dump(jobs, f)
+                    os.replace(tmp_path, self._path)
+                for status in ACTIVE:
+                    REDEPLOY_QUEUE_LENGTH.labels(status).set(sum(1 for job in jobs if job["status"] == status))
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def submit(self, index):
+        """Returns (job, coalesced)."""
+        self.start()
+        with self._state() as jobs:
+            queued = next((job for job in jobs if job["status"] == "queued"), None)
+            if queued is not None:
+                if queued["index"] != index:
+                    logger.info(f"Redeploy job {queued['id']} retargeted from index {queued['index']} to {index}")
+                queued["index"] = index
+                queued["requests"] += 1
+                REDEPLOY_JOBS.labels("coalesced").inc()
+                return dict(queued), True
+
+            job = {
+                "id": uuid.uuid4().hex, "index": index, "status": "queued", "requests": 1,
+                "submitted_at": time.time(), "started_at": None, "finished_at": None,
+                "phases": {}, "result": None, "error": None, "pid": None
+            }
+            jobs.append(job)
+            self._prune(jobs)
+        self._wake.set()
+        return dict(job), False
+
+    def get(self, job_id):
+        self.start()
+        with self._state() as jobs:
+            return next((dict(job) for job in jobs if job["id"] == job_id), None)
+
+    def _prune(self, jobs):
+        finished = [job for job in jobs if job["status"] not in ACTIVE]
+        for job in finished[:max(0, len(finished) - self.history)]:
+            jobs.remove(job)
+
+    def _claim(self):
+        with self._state() as jobs:
+            for job in jobs:
+                if job["status"] != "running":
+                    continue
+                if job["pid"] != os.getpid() and _alive(job["pid"]):
+                    return None
+                # The worker running it exited (or restarted) mid-job
+                job.update(status="failed", finished_at=time.time(), error="Worker running the job exited")
+                REDEPLOY_JOBS.labels("failed").inc()
+
+            job = next((job for job in jobs if job["status"] == "queued"), None)
+            if job is None:
+                return None
+            job.update(status="running", started_at=time.time(), pid=os.getpid())
+            return dict(job)
+
+    def _update(self, job_id, **fields):
+        with self._state() as jobs:
+            for job in jobs:
+                if job["id"] == job_id:
+                    job.update(fields)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                job = self._claim()
+                if job is not None:
+                    self._execute(job)
+            except Exception as e:
+                logger.error(f"Redeploy runner failed: {e}")
+
+    def _execute(self, job):
+        logger.info(f"Starting redeploy job {job['id']} for index {job['index']}")
+        REDEPLOY_PHASE_TIME.labels("queued").observe(job["started_at"] - job["submitted_at"])
+        phases, result, error = {}, None, None
+        for phase, fn in self.steps:
+            phase_start = time.time()
+            try:
+                value = fn(job["index"])
+            except Exception as e:
+                logger.error(f"Redeploy job {job['id']} failed in {phase}: {e}")
+                error = f"{phase} failed: {e}"
+            phases[phase] = time.time() - phase_start
+            REDEPLOY_PHASE_TIME.labels(phase).observe(phases[phase])
+            if error is not None:
+                break
+            if result is None:
+                result = value
+            self._update(job["id"], phases=dict(phases), result=result)
+
+        finished_at = time.time()
+        REDEPLOY_TIME.observe(finished_at - job["started_at"])
+        REDEPLOY_JOBS.labels("failed" if error else "succeeded").inc()
+        self._update(
+            job["id"], status="failed" if error else "succeeded", finished_at=finished_at,
+            phases=phases, result=result, error=error
+        )
+        logger.info(f"Redeploy job {job['id']} {'failed' if error else 'succeeded'} in {finished_at - job['started_at']:.1f}s")
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
@@ -0,0 +1,175 @@
+import logging
+import random
+import threading
+import time
+
+import requests
+import urllib3
+from prometheus_client import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_STATE = Gauge(
+    "mlops_upstream_circuit_state",
+    "Circuit breaker state per upstream: 0 closed, 1 half-open, 2 open",
+    ["upstream"]
+)
+CIRCUIT_TRANSITIONS = Counter(
+    "mlops_upstream_circuit_transitions_total",
+    "Circuit breaker state changes per upstream, by the state entered",
+    ["upstream", "state"]
+)
+UPSTREAM_RETRIES = Counter(
+    "mlops_upstream_retries_total",
+    "Upstream calls retried after a failed attempt, by what failed",
+    ["upstream", "reason"]
+)
+UPSTREAM_HEDGES = Counter(
+    "mlops_upstream_hedges_total",
+    "Hedged upstream calls: sent when the first attempt was slow, won when the hedge answered first, "
+    "skipped when the hedge budget was used up",
+    ["upstream", "outcome"]
+)
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+# Tells the upstream how long the caller is still willing to wait, in seconds;
+# the MLOps API reads it from its own callers the same way
+DEADLINE_HEADER = "X-Request-Timeout"
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """Raised when the request's deadline has passed before an upstream call."""
+
+
+def failed_to_connect(e):
+    """
+    True if e happened while connecting, so no part of the request reached
+    the upstream and even a non-idempotent call can safely be resent. A
+    connection dropped after sending (RemoteDisconnected, a reset) is also a
+    ConnectionError, but the upstream may already be handling the request.
+    """
+    if isinstance(e, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(e, requests.exceptions.ConnectionError) or not e.args:
+        return False
+    return isinstance(getattr(e.args[0], "reason", None), urllib3.exceptions.NewConnectionError)
+
+
+_local = threading.local()
+
+
+def set_deadline(seconds):
+    # Deadline for upstream calls made by this thread (None clears it)
+    _local.deadline = None if seconds is None else time.monotonic() + seconds
+
+
+def remaining():
+    """Seconds left before this thread's deadline, or None without one."""
+    deadline = getattr(_local, "deadline", None)
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def deadline_from_header(value, default):
+    # A caller's X-Request-Timeout can only shorten the default, never extend it
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        return default
+    return min(seconds, default) if seconds > 0 else default
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failed calls, so a dead or
+    stuck upstream fails fast instead of holding workers for its timeout.
+    After reset_timeout seconds one probe call is let through (half-open):
+    success closes the circuit again, failure reopens it.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        CIRCUIT_STATE.labels(name).set(STATE_VALUES[CLOSED])
+
+    @property
+    def state(self):
+        return self._state
+
+    def retry_after(self):
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self):
+        with self._lock:
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._transition(HALF_OPEN)
+            if self._state == HALF_OPEN:
+                if self._probing:
+                    return False
+                self._probing = True
+            return True
+
+    def record(self, success):
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probing = False
+            if success:
+                self._failures = 0
+                if self._state != CLOSED:
+                    self._transition(CLOSED)
+                return
+            self._failures += 1
+            if self._state == HALF_OPEN or (self._state == CLOSED and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                self._transition(OPEN)
+
+    def _transition(self, state):
+        if state == OPEN:
+            logger.warning(f"Circuit for {self.name} opened after {self._failures} failures")
+        elif state == CLOSED:
+            logger.info(f"Circuit for {self.name} closed")
+        self._state = state
+        CIRCUIT_STATE.labels(self.name).set(STATE_VALUES[state])
+        CIRCUIT_TRANSITIONS.labels(self.name, state).inc()
+
+
+class RetryPolicy:
+    """
+    Up to attempts tries with full-jitter exponential backoff
+    (uniform(0, min(max_delay, base_delay * 2**n)) between tries). No retry
+    is started once budget seconds have passed since the first try, or when
+    its backoff would run past the request's deadline.
+    """
+
+    def __init__(self, attempts=3, base_delay=0.1, max_delay=2.0, budget=5.0):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+
+    def backoff(self, attempt, started):
+        """Seconds to wait before retry number attempt, or None to give up."""
+        if attempt >= self.attempts:
+            return None
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        if time.monotonic() - started + delay > self.budget:
+            return None
+        left = remaining()
+        if left is not None and delay >= left:
+            return None
+        return delay
@@ -0,0 +1,79 @@
+"""
+Minimal scoring service for the production model that, unlike
+`mlflow models serve`, also accepts and returns NPY tensors:
+
+    MODEL_URI="models:/Race prediction@production" \\
+        gunicorn -w 1 --threads 4 -b 0.0.0.0:5006 "scoring_service:create_app()"
+
+POST /invocations takes {"instances": [[...], ...]} as application/json or
+a 2-D float32 array as application/x-npy, and answers in NPY when the
+Accept header asks for it, JSON ({"predictions": [...]}) otherwise. Every
+answer carries the run_id of the loaded model in X-Model-Run-Id, so the MLOps
+API knows which model produced its scores while deployments switch over.
+"""
+import logging
+import os
+
+import numpy as np
+from flask import Flask, Response, jsonify, request
+
+from tensor_transport import JSON_CONTENT_TYPE, MODEL_RUN_ID_HEADER, NPY_CONTENT_TYPE, decode_npy, encode_npy, is_npy
+
+MODEL_URI = os.getenv("MODEL_URI", "models:/Race prediction@production")
+
+logger = logging.getLogger(__name__)
+
+
+def load_model(model_uri):
+    # Only needed when the service loads the registered model itself
+    import mlflow.pyfunc
+    return mlflow.pyfunc.load_model(model_uri)
+
+
+def create_app(model=None, run_id=None):
+    """
+    model is anything with predict(float32 rows) -> scores; by default the
+    MLflow model at MODEL_URI. run_id defaults to the one in the model's
+    MLflow metadata; without either, X-Model-Run-Id is not sent.
+    """
+    if model is None:
+        model = load_model(MODEL_URI)
+    if run_id is None:
+        run_id = getattr(getattr(model, "metadata", None), "run_id", None)
+    app = Flask(__name__)
+
+    @app.after_request
+    def add_run_id(response):
+        if run_id is not None:
+            response.headers[MODEL_RUN_ID_HEADER] = run_id
+        return response
+
+    @app.route("/ping")
+    def ping():
+        return "", 200
+
+    @app.route("/invocations", methods=["POST"])
+    def invocations():
+        content_type = request.content_type or JSON_CONTENT_TYPE
+        try:
+            if is_npy(content_type):
+                X = decode_npy(request.get_data())
+            elif content_type.split(";")[0].strip() == JSON_CONTENT_TYPE:
+                X = np.asarray(request.get_json(force=True)["instances"], dtype=np.float32)
+            else:
+                return Response(
+                    f"Unsupported content type {content_type}; use {JSON_CONTENT_TYPE} or {NPY_CONTENT_TYPE}",
+                    status=415, mimetype="text/plain"
+                )
+        except (ValueError, KeyError, TypeError) as e:
+            return jsonify({"error": f"Invalid request body: {e}"}), 400
+        if X.ndim != 2:
+            return jsonify({"error": f"Expected a 2-D array, got shape {list(X.shape)}"}), 400
+
+        predictions = np.asarray(model.predict(X.astype(np.float32, copy=False)), dtype=np.float32).reshape(-1)
+        # JSON first, so clients sending */* (or nothing) keep getting JSON
+        if request.accept_mimetypes.best_match([JSON_CONTENT_TYPE, NPY_CONTENT_TYPE]) == NPY_CONTENT_TYPE:
+            return Response(encode_npy(predictions), mimetype=NPY_CONTENT_TYPE)
+        return jsonify({"predictions": predictions.tolist()})
+
+    return app
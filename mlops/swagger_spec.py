@@ -0,0 +1,449 @@
+import json
+import os
+import sys
+
+
+def build_swagger_spec(port):
+    return {
+        "openapi": "3.0.0",
+        "info": {
+            "title": "MLOps API",
+            "version": "1.0.0",
+            "description": "API for MLOps deployment and predictions"
+        },
+        "servers": [
+            {
+                "url": f"http://seito.lavbic.net:{port}",
+                "description": "Production server"
+            }
+        ],
+        "paths": {
+            "/redeploy": {
+                "post": {
+                    "summary": "Trigger model redeployment",
+                    "requestBody": {
+                        "required": True,
+                        "content": {
+                            "application/json": {
+                                "schema": {
+                                    "type": "object",
+                                    "properties": {
+                                        "index": {
+                                            "type": "integer",
+                                            "description": "Index for redeployment"
+                                        }
+                                    },
+                                    "required": ["index"]
+                                }
+                            }
+                        }
+                    },
+                    "responses": {
+                        "202": {
+                            "description": "Redeploy job queued; poll /redeploy/{job_id} for its status. "
+                                           "A request arriving while a job is already queued updates that "
+                                           "job's index and returns its id (coalesced: true)",
+                            "content": {
+                                "application/json": {
+                                    "schema": {
+                                        "type": "object",
+                                        "properties": {
+                                            "id": {"type": "string"},
+                                            "index": {"type": "integer"},
+                                            "status": {"type": "string", "enum": ["queued", "running", "succeeded", "failed"]},
+                                            "requests": {"type": "integer"},
+                                            "submitted_at": {"type": "number"},
+                                            "started_at": {"type": "number", "nullable": True},
+                                            "finished_at": {"type": "number", "nullable": True},
+                                            "phases": {"type": "object", "additionalProperties": {"type": "number"}},
+                                            "result": {"type": "object", "nullable": True},
+                                            "error": {"type": "string", "nullable": True}
+                                        }
+                                    }
+                                }
+                            }
+                        },
+                        "400": {
+                            "description": "Invalid input"
+                        },
+                        "500": {
+                            "description": "Internal server error"
+                        }
+                    }
+                }
+            },
+            "/redeploy/{job_id}": {
+                "get": {
+                    "summary": "Status of a redeploy job",
+                    "parameters": [
+                        {
+                            "name": "job_id",
+                            "in": "path",
+                            "required": True,
+                            "schema": {"type": "string"}
+                        }
+                    ],
+                    "responses": {
+                        "200": {
+                            "description": "Job status with per-phase timings in seconds",
+                            "content": {
+                                "application/json": {
+                                    "schema": {
+                                        "type": "object",
+                                        "properties": {
+                                            "id": {"type": "string"},
+                                            "index": {"type": "integer"},
+                                            "status": {"type": "string", "enum": ["queued", "running", "succeeded", "failed"]},
+                                            "requests": {"type": "integer"},
+                                            "submitted_at": {"type": "number"},
+                                            "started_at": {"type": "number", "nullable": True},
+                                            "finished_at": {"type": "number", "nullable": True},
+                                            "phases": {"type": "object", "additionalProperties": {"type": "number"}},
+                                            "result": {"type": "object", "nullable": True},
+                                            "error": {"type": "string", "nullable": True}
+                                        }
+                                    }
+                                }
+                            }
+                        },
+                        "404": {
+                            "description": "Unknown job id"
+                        }
+                    }
+                }
+            },
+            "/predict": {
+                "get": {
+                    "summary": "Make predictions (cacheable)",
+                    "parameters": [
+                        {
+                            "name": "index",
+                            "in": "query",
+                            "required": True,
+                            "schema": {
+                                "type": "integer"
+                            },
+                            "description": "Index for prediction"
+                        },
+                        {
+                            "name": "top_k",
+                            "in": "query",
+                            "required": False,
+                            "schema": {
+                                "type": "integer",
+                                "minimum": 1
+                            },
+                            "description": "Return only this many riders, highest predictions first"
+                        },
+                        {
+                            "name": "offset",
+                            "in": "query",
+                            "required": False,
+                            "schema": {
+                                "type": "integer",
+                                "minimum": 0,
+                                "default": 0
+                            },
+                            "description": "Number of top-ranked riders to skip"
+                        }
+                    ],
+                    "responses": {
+                        "200": {
+                            "description": "Successful prediction, same body as POST /predict"
+                        },
+                        "304": {
+                            "description": "Prediction unchanged since the ETag sent in If-None-Match"
+                        },
+                        "400": {
+                            "description": "Invalid input"
+                        },
+                        "500": {
+                            "description": "Internal server error"
+                        }
+                    }
+                },
+                "post": {
+                    "summary": "Make predictions",
+                    "requestBody": {
+                        "required": True,
+                        "content": {
+                            "application/json": {
+                                "schema": {
+                                    "type": "object",
+                                    "properties": {
+                                        "index": {
+                                            "type": "integer",
+                                            "description": "Index for prediction"
+                                        },
+                                        "top_k": {
+                                            "type": "integer",
+                                            "minimum": 1,
+                                            "description": "Return only this many riders, highest predictions first"
+                                        },
+                                        "offset": {
+                                            "type": "integer",
+                                            "minimum": 0,
+                                            "default": 0,
+                                            "description": "Number of top-ranked riders to skip"
+                                        }
+                                    },
+                                    "required": ["index"]
+                                }
+                            }
+                        }
+                    },
+                    "responses": {
+                        "200": {
+                            "description": "Successful prediction",
+                            "content": {
+                                "application/json": {
+                                    "schema": {
+                                        "type": "object",
+                                        "properties": {
+                                            "prediction": {
+                                                "type": "array",
+                                                "items": {
+                                                    "type": "object",
+                                                    "properties": {
+                                                        "name": {
+                                                            "type": "string"
+                                                        },
+                                                        "prediction": {
+                                                            "type": "number"
+                                                        },
+                                                        "image_url": {
+                                                            "type": "string"
+                                                        }
+                                                    }
+                                                }
+                                            }
+                                        }
+                                    }
+                                }
+                            }
+                        },
+                        "304": {
+                            "description": "Prediction unchanged since the ETag sent in If-None-Match"
+                        },
+                        "400": {
+                            "description": "Invalid input"
+                        },
+                        "500": {
+                            "description": "Internal server error"
+                        }
+                    }
+                }
+            },
+            "/predict/batch": {
+                "post": {
+                    "summary": "Make predictions for several races at once",
+                    "requestBody": {
+                        "required": True,
+                        "content": {
+                            "application/json": {
+                                "schema": {
+                                    "type": "object",
+                                    "properties": {
+                                        "indices": {
+                                            "type": "array",
+                                            "items": {
+                                                "type": "integer"
+                                            },
+                                            "description": "Indices for prediction"
+                                        },
+                                        "race": {
+                                            "type": "string",
+                                            "description": "Race name as returned by /races; predicts all of its stages"
+                                        },
+                                        "top_k": {
+                                            "type": "integer",
+                                            "minimum": 1,
+                                            "description": "Return only this many riders per race, highest predictions first"
+                                        },
+                                        "offset": {
+                                            "type": "integer",
+                                            "minimum": 0,
+                                            "default": 0,
+                                            "description": "Number of top-ranked riders to skip"
+                                        }
+                                    }
+                                }
+                            }
+                        }
+                    },
+                    "responses": {
+                        "200": {
+                            "description": "Successful prediction",
+                            "content": {
+                                "application/json": {
+                                    "schema": {
+                                        "type": "object",
+                                        "properties": {
+                                            "predictions": {
+                                                "type": "array",
+                                                "items": {
+                                                    "type": "object",
+                                                    "properties": {
+                                                        "index": {
+                                                            "type": "integer"
+                                                        },
+                                                        "prediction": {
+                                                            "type": "array",
+                                                            "items": {
+                                                                "type": "object",
+                                                                "properties": {
+                                                                    "name": {
+                                                                        "type": "string"
+                                                                    },
+                                                                    "prediction": {
+                                                                        "type": "number"
+                                                                    },
+                                                                    "image_url": {
+                                                                        "type": "string"
+                                                                    }
+                                                                }
+                                                            }
+                                                        }
+                                                    }
+                                                }
+                                            }
+                                        }
+                                    }
+                                }
+                            }
+                        },
+                        "304": {
+                            "description": "Prediction unchanged since the ETag sent in If-None-Match"
+                        },
+                        "400": {
+                            "description": "Invalid input"
+                        },
+                        "502": {
+                            "description": "Prediction service error"
+                        },
+                        "503": {
+                            "description": "Prediction service circuit open (see Retry-After), or the in-process model is not loaded yet"
+                        },
+                        "504": {
+                            "description": "Prediction service did not answer within the request's deadline"
+                        },
+                        "500": {
+                            "description": "Internal server error"
+                        }
+                    }
+                }
+            },
+            "/races": {
+                "get": {
+                    "summary": "Get race information",
+                    "responses": {
+                        "200": {
+                            "description": "List of races",
+                            "content": {
+                                "application/json": {
+                                    "schema": {
+                                        "type": "array",
+                                        "items": {
+                                            "type": "object",
+                                            "properties": {
+                                                "name": {
+                                                    "type": "string"
+                                                },
+                                                "stage": {
+                                                    "type": "string"
+                                                },
+                                                "index": {
+                                                    "type": "integer"
+                                                }
+                                            }
+                                        }
+                                    }
+                                }
+                            }
+                        },
+                        "304": {
+                            "description": "Race list unchanged since the ETag sent in If-None-Match"
+                        }
+                    }
+                }
+            },
+            "/images/{filename}": {
+                "get": {
+                    "summary": "Get rider image",
+                    "parameters": [
+                        {
+                            "name": "filename",
+                            "in": "path",
+                            "required": True,
+                            "schema": {
+                                "type": "string"
+                            },
+                            "description": "Image filename"
+                        },
+                        {
+                            "name": "variant",
+                            "in": "query",
+                            "required": False,
+                            "schema": {
+                                "type": "string",
+                                "enum": ["thumb"]
+                            },
+                            "description": "Request the pre-generated thumbnail instead of the full-size image"
+                        }
+                    ],
+                    "responses": {
+                        "200": {
+                            "description": "Image file",
+                            "content": {
+                                "image/*": {
+                                    "schema": {
+                                        "type": "string",
+                                        "format": "binary"
+                                    }
+                                }
+                            }
+                        },
+                        "304": {
+                            "description": "Image unchanged since the ETag or date sent by the client"
+                        }
+                    }
+                }
+            },
+            "/metrics": {
+                "get": {
+                    "summary": "Get Prometheus metrics",
+                    "responses": {
+                        "200": {
+                            "description": "Prometheus metrics",
+                            "content": {
+                                "text/plain": {
+                                    "schema": {
+                                        "type": "string"
+                                    }
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    }
+
+
+def write_swagger_spec(path, port):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(build_swagger_spec(port), f)
+    os.replace(tmp_path, path)
+
+
+if __name__ == "__main__":
+    # Generated at deploy time by common/webhook_listener.sh:
+    # python swagger_spec.py static/swagger.json [port]
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python swagger_spec.py <output.json> [port]", file=sys.stderr)
+        sys.exit(1)
+    port = int(sys.argv[2]) if len(sys.argv) == 3 else int(os.getenv("APP_PORT", 5010))
+    write_swagger_spec(sys.argv[1], port)
+    print(f"Swagger specification written to {sys.argv[1]}")
@@ -0,0 +1,88 @@
+import io
+import json
+import logging
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# NPY bodies: a short header with dtype and shape, then the raw little-endian
+# float32 values (1 KB for 227 features, 4 bytes per prediction)
+NPY_CONTENT_TYPE = "application/x-npy"
+JSON_CONTENT_TYPE = "application/json"
+NPY_ACCEPT = f"{NPY_CONTENT_TYPE}, {JSON_CONTENT_TYPE};q=0.5"
+# What a scoring service that can't read or answer in NPY sends (MLflow's
+# scoring server sends 415 for unsupported content types). A 400 only counts
+# when its body blames the content type; otherwise the rows themselves are bad
+UNSUPPORTED_STATUSES = (406, 415)
+# run_id of the model that produced the scores, set by scoring_service.py
+# (mlflow models serve doesn't send it)
+MODEL_RUN_ID_HEADER = "X-Model-Run-Id"
+
+
+def encode_npy(array):
+    buffer = io.BytesIO()
+    np.lib.format.write_array(buffer, np.ascontiguousarray(array, dtype='<f4'), allow_pickle=False)
+    return buffer.getvalue()
+
+
+def decode_npy(body):
+    return np.lib.format.read_array(io.BytesIO(body), allow_pickle=False)
+
+
+def encode_json(array):
+    return json.dumps({"instances": np.asarray(array).tolist()}).encode()
+
+
+def is_npy(content_type):
+    return (content_type or "").split(";")[0].strip().lower() == NPY_CONTENT_TYPE
+
+
+def unsupported(response):
+    if response.status_code in UNSUPPORTED_STATUSES:
+        return True
+    text = response.text.lower()
+    return response.status_code == 400 and ("content type" in text or "content-type" in text)
+
+
+class InvocationsTransport:
+    """
+    Chooses the body format for /invocations calls. mode is "npy", "json"
+    or "auto": try NPY and fall back to JSON (MLflow's own scoring server
+    only reads JSON and CSV) when the service rejects it, then stick with
+    JSON for retry_interval seconds before trying NPY again.
+    Responses are decoded by their content type either way.
+    """
+
+    def __init__(self, mode="auto", retry_interval=300.0):
+        if mode not in ("auto", "npy", "json"):
+            raise ValueError(f"Unknown invocations format {mode!r}")
+        self.mode = mode
+        self.retry_interval = retry_interval
+        self._json_until = 0.0
+
+    def use_npy(self):
+        return self.mode == "npy" or (self.mode == "auto" and time.monotonic() >= self._json_until)
+
+    def encode(self, rows):
+        if self.use_npy():
+            return encode_npy(rows), {"Content-Type": NPY_CONTENT_TYPE, "Accept": NPY_ACCEPT}
+        return encode_json(rows), {"Content-Type": JSON_CONTENT_TYPE}
+
+    def rejected(self, headers, response):
+        # True if an NPY request was refused and should be resent as JSON
+        if self.mode != "auto" or not is_npy(headers.get("Content-Type")) or not unsupported(response):
+            return False
+        logger.warning(
+            f"Scoring service rejected an NPY body ({response.status_code}); "
+            f"using JSON for the next {self.retry_interval:.0f}s"
+        )
+        self._json_until = time.monotonic() + self.retry_interval
+        return True
+
+    @staticmethod
+    def decode(response):
+        if is_npy(response.headers.get("Content-Type")):
+            return decode_npy(response.content).astype(np.float32, copy=False).reshape(-1)
+        return np.asarray(response.json()['predictions'], dtype=np.float32).reshape(-1)
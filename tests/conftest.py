@@ -0,0 +1,77 @@
+import importlib
+import os
+import sys
+
+import numpy as np
+import pytest
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+# devops/ comes before mlops/ for the modules both stacks have (model_server,
+# prediction_store, artifact_cache), which are tested on the DevOps side
+for directory in ("mlops", "devops", "common"):
+    sys.path.insert(0, os.path.join(REPO_DIR, directory))
+
+from feature_store import RaggedRaces, save_feature_store  # noqa: E402
+from model_artifact import save_model_artifact  # noqa: E402
+
+RACE_WIDTH, RIDER_WIDTH, HIDDEN_SIZE = 3, 5, 16
+
+
+def random_weights(rng, input_size=RACE_WIDTH + RIDER_WIDTH, hidden_size=HIDDEN_SIZE):
+    return {
+        "fc1.weight": rng.standard_normal((hidden_size, input_size)) * 0.5,
+        "fc1.bias": rng.standard_normal(hidden_size) * 0.1,
+        "fc2.weight": rng.standard_normal((1, hidden_size)) * 0.5,
+        "fc2.bias": rng.standard_normal(1) * 0.1
+    }
+
+
+def random_races(rng, lengths, race_width=RACE_WIDTH, rider_width=RIDER_WIDTH):
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    race_features = rng.random((len(lengths), race_width), dtype=np.float32) if race_width else None
+    return RaggedRaces(rng.random((offsets[-1], rider_width), dtype=np.float32), offsets, race_features)
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+
+# Session-wide and read-only: tests that change them work on a copy
+@pytest.fixture(scope="session")
+def model_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("model") / "model.weights")
+    weights = random_weights(np.random.default_rng(1))
+    save_model_artifact(path, weights, {"input_size": RACE_WIDTH + RIDER_WIDTH, "hidden_size": HIDDEN_SIZE})
+    return path
+
+
+@pytest.fixture(scope="session")
+def feature_store(tmp_path_factory):
+    # Factorized ragged races of 2 to 9 riders, the way the DevOps server serves them
+    rng = np.random.default_rng(2)
+    lengths = rng.integers(2, 10, 6)
+    races = random_races(rng, lengths)
+    rider_names = [[f"RIDER {race} {rider}" for rider in range(n)] for race, n in enumerate(lengths)]
+    root = str(tmp_path_factory.mktemp("feature_store"))
+    save_feature_store(root, "test", races, rider_names)
+    return root, races, rider_names
+
+
+@pytest.fixture(scope="session")
+def server(model_path, feature_store, tmp_path_factory):
+    # The DevOps model server, configured (at import) to serve the fixtures
+    # above. It writes static/swagger.json to the working directory on import
+    workdir = tmp_path_factory.mktemp("devops")
+    os.environ.update(
+        MODEL_PATH=model_path,
+        FEATURE_STORE_DIR=feature_store[0],
+        PROFILE_DIR=str(workdir / "profiles"),
+        WARM_UP="0"
+    )
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        return importlib.import_module("model_server")
+    finally:
+        os.chdir(cwd)
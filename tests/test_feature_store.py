@@ -0,0 +1,89 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from conftest import random_races, random_weights
+from convert_feature_store import PAD_NAME, convert_feature_store, infer_race_width
+from feature_store import (
+    MANIFEST_FILE, RaggedRaces, decode_rider_names, open_feature_store, resolve_feature_store, save_feature_store
+)
+from numpy_model import NumpyRaceModel
+
+
+def padded(races, rider_names, max_riders):
+    # The (races, max_riders, features) layout from before the feature store
+    X = np.zeros((len(races), max_riders, races.width), dtype=np.float32)
+    names = np.full((len(races), max_riders), PAD_NAME, dtype=object)
+    for i in range(len(races)):
+        X[i, :len(races[i])] = races[i]
+        names[i, :len(races[i])] = rider_names[i]
+    return X, names
+
+
+def test_round_trip(feature_store):
+    root, races, rider_names = feature_store
+    store = open_feature_store(resolve_feature_store(root, "test"))
+    np.testing.assert_array_equal(store.features.offsets, races.offsets)
+    np.testing.assert_array_equal(store.features.rider_rows, races.rider_rows)
+    np.testing.assert_array_equal(store.features.race_features, races.race_features)
+    decoded = decode_rider_names(store.rider_ids, store.rider_vocab, store.features.offsets)
+    assert [list(race) for race in decoded] == rider_names
+
+
+def test_indexing(rng):
+    races = random_races(rng, [3, 0, 5, 2])
+    assert races[2].shape == (5, races.width)
+    np.testing.assert_array_equal(races[2][:, :races.race_width], np.tile(races.race_features[2], (5, 1)))
+    assert races[1].shape == (0, races.width)
+
+    picked = races[[3, 0]]
+    assert list(picked.lengths) == [2, 3]
+    np.testing.assert_array_equal(picked[0], races[3])
+    np.testing.assert_array_equal(races[1:3].flat_rows(), np.concatenate((races[1], races[2])))
+
+
+def test_invalid_offsets_are_rejected():
+    with pytest.raises(ValueError):
+        RaggedRaces(np.zeros((4, 2)), [0, 3])
+    with pytest.raises(ValueError):
+        RaggedRaces(np.zeros((4, 2)), [0, 3, 2, 4])
+
+
+def test_padded_store_is_rejected(tmp_path, rng):
+    races = random_races(rng, [2, 3])
+    build_dir = save_feature_store(str(tmp_path), "test", races, [["A", "B"], ["C", "D", "E"]])
+    with open(os.path.join(build_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    with open(os.path.join(build_dir, MANIFEST_FILE), "w") as f:
+        json.dump(dict(manifest, layout="padded"), f)
+    with pytest.raises(ValueError, match="padded"):
+        open_feature_store(build_dir)
+
+
+@pytest.mark.parametrize("factorize", [False, True])
+def test_padded_files_convert_without_pad_rows(tmp_path, rng, factorize):
+    races = random_races(rng, [4, 7, 1, 6])
+    rider_names = [[f"RIDER {race} {rider}" for rider in range(n)] for race, n in enumerate(races.lengths)]
+    X, names = padded(races, rider_names, max_riders=9)
+    np.save(tmp_path / "X_test.npy", X)
+    np.save(tmp_path / "rider_names_test.npy", names)
+
+    build_dir, report = convert_feature_store(
+        str(tmp_path / "X_test.npy"), str(tmp_path / "rider_names_test.npy"), str(tmp_path / "store"), factorize=factorize
+    )
+    store = open_feature_store(build_dir)
+    np.testing.assert_array_equal(store.features.offsets, races.offsets)
+    np.testing.assert_array_equal(store.features.flat_rows(), races.flat_rows())
+    assert PAD_NAME not in store.rider_vocab
+    if factorize:
+        assert store.features.race_width == infer_race_width(X)
+
+
+def test_ragged_scoring_matches_full_rows(feature_store):
+    _, races, _ = feature_store
+    model = NumpyRaceModel(random_weights(np.random.default_rng(3)))
+    expected = model.predict(races.flat_rows()).reshape(-1)
+    actual = model.predict_ragged(races.race_features, races.rider_rows, races.offsets)
+    np.testing.assert_allclose(actual, expected, rtol=1e-5, atol=1e-6)
@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytest
+
+from micro_batcher import MicroBatcher
+
+
+def submit_all(batcher, requests):
+    # Submits every (group, item) from its own thread, released together
+    results = [None] * len(requests)
+    barrier = threading.Barrier(len(requests))
+
+    def worker(i, group, item):
+        barrier.wait()
+        results[i] = batcher.submit(group, item, timeout=5)
+
+    threads = [threading.Thread(target=worker, args=(i, *request)) for i, request in enumerate(requests)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_each_request_gets_its_own_result():
+    batches = []
+
+    def batch_fn(group, items):
+        batches.append(list(items))
+        return [item * 10 for item in items]
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=8, max_wait=0.05)
+    group = object()
+    assert submit_all(batcher, [(group, i) for i in range(20)]) == [i * 10 for i in range(20)]
+    assert sorted(item for batch in batches for item in batch) == list(range(20))
+    assert all(len(batch) <= 8 for batch in batches)
+    assert len(batches) < 20
+
+
+def test_batches_never_mix_groups():
+    seen = []
+
+    def batch_fn(group, items):
+        seen.append((group, list(items)))
+        return [(group, item) for item in items]
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=32, max_wait=0.05)
+    old, new = object(), object()
+    requests = [(old if i % 2 else new, i) for i in range(16)]
+    assert submit_all(batcher, requests) == requests
+    for group, items in seen:
+        assert all((old if item % 2 else new) is group for item in items)
+
+
+def test_queued_requests_are_batched_in_arrival_order():
+    batches, running, release = [], threading.Event(), threading.Event()
+
+    def batch_fn(group, items):
+        running.set()
+        release.wait(5)
+        batches.append(list(items))
+        return items
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=2, max_wait=0)
+    group = object()
+    results = {}
+
+    def worker(item):
+        results[item] = batcher.submit(group, item, timeout=5)
+
+    # The first request holds the runner while the others queue up one by one
+    threads = []
+    for item in range(6):
+        threads.append(threading.Thread(target=worker, args=(item,)))
+        threads[-1].start()
+        if item == 0:
+            assert running.wait(5)
+        deadline = time.monotonic() + 5
+        while len(batcher._queue) < item and time.monotonic() < deadline:
+            time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert batches == [[0], [1, 2], [3, 4], [5]]
+    assert results == {item: item for item in range(6)}
+
+
+def test_failed_batch_fails_all_its_requests():
+    def batch_fn(group, items):
+        raise RuntimeError("model failed")
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=4, max_wait=0.01)
+    with pytest.raises(RuntimeError, match="model failed"):
+        batcher.submit(object(), 1, timeout=5)
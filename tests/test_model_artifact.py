@@ -0,0 +1,96 @@
+import shutil
+import struct
+
+import numpy as np
+import pytest
+import torch
+
+from conftest import random_weights
+from model_artifact import (
+    ALIGNMENT, INT8, MAGIC, open_model_artifact, quantize_weights, save_model_artifact, torch_model_from_artifact
+)
+from numpy_model import NumpyRaceModel
+
+HYPERPARAMETERS = {"input_size": 8, "hidden_size": 16}
+
+
+def test_round_trip_is_exact(tmp_path, rng):
+    weights = random_weights(rng)
+    path = str(tmp_path / "model.weights")
+    version = save_model_artifact(path, weights, HYPERPARAMETERS, {"source": "test"})
+
+    artifact = open_model_artifact(path)
+    assert artifact.version == version
+    assert artifact.manifest["metadata"] == {"source": "test"}
+    for name, tensor in weights.items():
+        np.testing.assert_array_equal(artifact.weights[name], tensor.astype(np.float32))
+        assert not artifact.weights[name].flags.writeable
+
+
+def test_same_weights_same_version(tmp_path, rng):
+    weights = random_weights(rng)
+    first = save_model_artifact(str(tmp_path / "a.weights"), weights, HYPERPARAMETERS)
+    second = save_model_artifact(str(tmp_path / "b.weights"), weights, HYPERPARAMETERS, {"other": "metadata"})
+    weights["fc2.bias"] = weights["fc2.bias"] + 1
+    third = save_model_artifact(str(tmp_path / "c.weights"), weights, HYPERPARAMETERS)
+    assert first == second != third
+
+
+@pytest.mark.parametrize("quantization", [None, INT8])
+def test_tensors_are_aligned(tmp_path, rng, quantization):
+    weights = random_weights(rng)
+    if quantization:
+        weights = quantize_weights(weights)
+    path = str(tmp_path / "model.weights")
+    save_model_artifact(path, weights, HYPERPARAMETERS, quantization=quantization)
+
+    with open(path, "rb") as f:
+        header = f.read(8)
+    assert header[:4] == MAGIC
+    data_offset = -(-(8 + struct.unpack("<I", header[4:])[0]) // ALIGNMENT) * ALIGNMENT
+    artifact = open_model_artifact(path)
+    for tensor in artifact.manifest["tensors"]:
+        assert tensor["offset"] % ALIGNMENT == 0
+        assert (data_offset + tensor["offset"]) % ALIGNMENT == 0
+    for weights in artifact.weights.values():
+        assert weights.ctypes.data % ALIGNMENT == 0
+
+
+def test_corrupted_blob_fails_checksum(tmp_path, model_path):
+    path = str(tmp_path / "model.weights")
+    shutil.copyfile(model_path, path)
+    with open(path, "r+b") as f:
+        f.seek(-1, 2)
+        last = f.read(1)
+        f.seek(-1, 2)
+        f.write(bytes([last[0] ^ 0xFF]))
+
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        open_model_artifact(path)
+    # Skipping the hash still opens it
+    open_model_artifact(path, verify_checksum=False)
+
+
+def test_truncated_or_foreign_files_are_rejected(tmp_path, model_path):
+    truncated = tmp_path / "truncated.weights"
+    truncated.write_bytes(open(model_path, "rb").read()[:-4])
+    with pytest.raises(ValueError, match="truncated"):
+        open_model_artifact(str(truncated))
+
+    pickled = tmp_path / "model.pkl"
+    pickled.write_bytes(b"\x80\x04\x95 not an artifact")
+    with pytest.raises(ValueError, match="not a model artifact"):
+        open_model_artifact(str(pickled))
+
+
+def test_wrong_shapes_are_rejected(tmp_path, rng):
+    with pytest.raises(ValueError, match="shape"):
+        save_model_artifact(str(tmp_path / "model.weights"), random_weights(rng), {"input_size": 9, "hidden_size": 16})
+
+
+def test_numpy_engine_matches_torch(model_path, rng):
+    artifact = open_model_artifact(model_path)
+    X = rng.random((50, 8), dtype=np.float32)
+    with torch.no_grad():
+        expected = torch_model_from_artifact(artifact)(torch.tensor(X)).numpy().reshape(-1)
+    np.testing.assert_allclose(NumpyRaceModel(artifact.weights).predict(X).reshape(-1), expected, atol=1e-5)
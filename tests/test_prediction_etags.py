@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+import torch
+
+from model_artifact import open_model_artifact, torch_model_from_artifact
+
+
+@pytest.fixture
+def client(server):
+    return server.app.test_client()
+
+
+def expected_scores(model_path, race):
+    model = torch_model_from_artifact(open_model_artifact(model_path))
+    with torch.no_grad():
+        return model(torch.tensor(race)).numpy().reshape(-1)
+
+
+def test_predict_matches_torch_model(client, model_path, feature_store):
+    _, races, rider_names = feature_store
+    response = client.get("/predict?index=2")
+    assert response.status_code == 200
+    scores = dict(zip(rider_names[2], expected_scores(model_path, races[2])))
+    rows = response.get_json()["prediction"]
+    assert [row["name"] for row in rows] == sorted(scores, key=scores.get, reverse=True)
+    np.testing.assert_allclose([row["prediction"] for row in rows], [scores[row["name"]] for row in rows], atol=1e-5)
+
+
+def test_matching_etag_gets_304(client):
+    response = client.get("/predict?index=1")
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"] == "no-cache"
+
+    not_modified = client.get("/predict?index=1", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.get_data() == b""
+    assert not_modified.headers["ETag"] == etag
+
+    # POST bodies are answered the same way
+    posted = client.post("/predict", json={"index": 1}, headers={"If-None-Match": etag})
+    assert posted.status_code == 304
+
+
+def test_etag_depends_on_race_and_page(client):
+    etags = {
+        client.get(url).headers["ETag"]
+        for url in ("/predict?index=1", "/predict?index=2", "/predict?index=1&top_k=2", "/predict?index=1&top_k=2&offset=1")
+    }
+    assert len(etags) == 4
+    stale = client.get("/predict?index=1", headers={"If-None-Match": client.get("/predict?index=2").headers["ETag"]})
+    assert stale.status_code == 200
+
+
+def test_batch_etag(client, feature_store):
+    _, _, rider_names = feature_store
+    response = client.post("/predict/batch", json={"indices": [3, 0], "top_k": 2})
+    assert response.status_code == 200
+    predictions = response.get_json()["predictions"]
+    assert [result["index"] for result in predictions] == [3, 0]
+    assert all(len(result["prediction"]) == 2 for result in predictions)
+    assert {row["name"] for row in predictions[1]["prediction"]} <= set(rider_names[0])
+
+    etag = response.headers["ETag"]
+    repeat = client.post("/predict/batch", json={"indices": [3, 0], "top_k": 2}, headers={"If-None-Match": etag})
+    assert repeat.status_code == 304
+    reordered = client.post("/predict/batch", json={"indices": [0, 3], "top_k": 2}, headers={"If-None-Match": etag})
+    assert reordered.status_code == 200
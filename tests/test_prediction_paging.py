@@ -0,0 +1,39 @@
+import pytest
+
+
+@pytest.fixture
+def client(server):
+    return server.app.test_client()
+
+
+def names(rows):
+    return [row["name"] for row in rows]
+
+
+@pytest.mark.parametrize("race", [0, 4])
+def test_pages_are_slices_of_the_full_ranking(client, feature_store, race):
+    _, _, rider_names = feature_store
+    full = names(client.get(f"/predict?index={race}").get_json()["prediction"])
+    assert sorted(full) == sorted(rider_names[race])
+    for top_k, offset in ((1, 0), (2, 1), (3, 2), (len(full), 0), (5, len(full))):
+        page = client.post("/predict", json={"index": race, "top_k": top_k, "offset": offset}).get_json()["prediction"]
+        assert names(page) == full[offset:offset + top_k]
+
+
+def test_batch_pages_match_single_races(client):
+    batch = client.post("/predict/batch", json={"indices": [1, 5, 1], "top_k": 2, "offset": 1}).get_json()["predictions"]
+    # Repeated indices are scored and returned once
+    assert [result["index"] for result in batch] == [1, 5]
+    for result in batch:
+        single = client.get(f"/predict?index={result['index']}&top_k=2&offset=1").get_json()["prediction"]
+        assert names(result["prediction"]) == names(single)
+
+
+@pytest.mark.parametrize("page", [{"top_k": 0}, {"top_k": -1}, {"offset": -1}, {"top_k": True}, {"offset": 1.5}])
+def test_invalid_pages_are_rejected(client, page):
+    assert client.post("/predict", json=dict(page, index=0)).status_code == 400
+
+
+@pytest.mark.parametrize("body", ["null", "[0]", '{"index": true}', '{"index": 999}', "not json"])
+def test_invalid_bodies_are_rejected(client, body):
+    assert client.post("/predict", data=body, content_type="application/json").status_code == 400
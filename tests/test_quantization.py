@@ -0,0 +1,70 @@
+import numpy as np
+
+from conftest import random_races
+from model_artifact import open_model_artifact
+from numpy_model import NumpyRaceModel, QuantizedNumpyRaceModel
+from quantization import export_quantized_artifact, predict_races, usable_quantized_artifact
+from quantization_guardrail import quantization_guardrail, top_k_agreement
+
+
+def test_top_k_agreement():
+    offsets = np.array([0, 4, 6])
+    reference = np.array([4, 3, 2, 1, 1, 2], dtype=np.float32)
+    assert top_k_agreement(reference, reference, offsets) == 1.0
+    # The first race's top 3 loses one rider, the two-rider race keeps both
+    candidate = np.array([4, 3, 1, 2, 1, 2], dtype=np.float32)
+    assert top_k_agreement(reference, candidate, offsets) == (2 / 3 + 1) / 2
+
+
+def test_guardrail_thresholds():
+    offsets = np.array([0, 4])
+    y = np.zeros(4)
+    reference = np.array([0.4, 0.3, 0.2, 0.1])
+    assert quantization_guardrail(reference, reference * 1.01, y, offsets)["passed"]
+    assert not quantization_guardrail(reference, reference * 1.05, y, offsets)["passed"]
+    assert not quantization_guardrail(reference, reference[::-1], y, offsets)["passed"]
+
+
+def test_int8_artifact_is_usable_only_for_its_model_and_a_passed_guardrail(tmp_path, model_path, rng):
+    races = random_races(rng, [5, 8, 3, 9])
+    y = predict_races(NumpyRaceModel(open_model_artifact(model_path).weights), races) + 0.5
+    source_version = open_model_artifact(model_path).version
+    int8_path = str(tmp_path / "model.int8.weights")
+
+    version, guardrail = export_quantized_artifact(model_path, int8_path, races, y)
+    assert guardrail["passed"]
+    artifact, reason = usable_quantized_artifact(int8_path, source_version)
+    assert reason is None and artifact.version == version
+    np.testing.assert_allclose(
+        predict_races(QuantizedNumpyRaceModel(artifact.weights), races), y - 0.5,
+        atol=guardrail["max_prediction_difference"] + 1e-6
+    )
+
+    artifact, reason = usable_quantized_artifact(int8_path, "another-model")
+    assert artifact is None and "built from model" in reason
+    artifact, reason = usable_quantized_artifact(str(tmp_path / "missing.weights"), source_version)
+    assert artifact is None and "does not exist" in reason
+
+    export_quantized_artifact(model_path, int8_path, races, y, min_top3_agreement=1.1)
+    artifact, reason = usable_quantized_artifact(int8_path, source_version)
+    assert artifact is None and "failed its accuracy guardrail" in reason
+
+
+def test_server_serves_int8_only_when_quantized_and_guarded(server, monkeypatch, tmp_path, model_path, rng):
+    races = random_races(rng, [5, 8, 3, 9])
+    y = predict_races(NumpyRaceModel(open_model_artifact(model_path).weights), races) + 0.5
+    int8_path = str(tmp_path / "model.int8.weights")
+    version, _ = export_quantized_artifact(model_path, int8_path, races, y)
+    monkeypatch.setattr(server, "QUANTIZED_MODEL_PATH", int8_path)
+
+    model, _ = server.load_model(model_path)
+    assert model.precision == "float32"
+
+    monkeypatch.setattr(server, "QUANTIZED", True)
+    model, model_version = server.load_model(model_path)
+    assert (model.precision, model_version) == ("int8", version)
+
+    # A failed guardrail falls back to the float model
+    export_quantized_artifact(model_path, int8_path, races, y, min_top3_agreement=1.1)
+    model, model_version = server.load_model(model_path)
+    assert (model.precision, model_version) == ("float32", open_model_artifact(model_path).version)
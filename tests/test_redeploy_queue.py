@@ -0,0 +1,70 @@
+import os
+import threading
+import time
+
+from redeploy_queue import RedeployQueue
+
+
+def wait_for(queue, job_id, statuses, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} never reached {statuses}: {queue.get(job_id)}")
+
+
+def test_nothing_happens_before_first_use(tmp_path):
+    state_dir = str(tmp_path / "redeploy_jobs")
+    threads = threading.active_count()
+    RedeployQueue(state_dir, [("retrain", lambda index: index)])
+    assert not os.path.exists(state_dir)
+    assert threading.active_count() == threads
+
+
+def test_requests_during_a_run_coalesce_into_one_job(tmp_path):
+    release, indices = threading.Event(), []
+
+    def retrain(index):
+        indices.append(index)
+        release.wait(5)
+        return f"run-{index}"
+
+    queue = RedeployQueue(str(tmp_path), [("retrain", retrain)], poll_interval=0.01)
+    running, coalesced = queue.submit(1)
+    assert not coalesced
+    wait_for(queue, running["id"], ("running",))
+
+    queued, coalesced = queue.submit(2)
+    assert not coalesced
+    for index in (3, 4):
+        retargeted, coalesced = queue.submit(index)
+        assert coalesced
+        assert retargeted["id"] == queued["id"]
+    assert queue.get(queued["id"])["index"] == 4
+    assert queue.get(queued["id"])["requests"] == 3
+
+    release.set()
+    first = wait_for(queue, running["id"], ("succeeded", "failed"))
+    second = wait_for(queue, queued["id"], ("succeeded", "failed"))
+    assert (first["status"], first["result"]) == ("succeeded", "run-1")
+    assert (second["status"], second["result"]) == ("succeeded", "run-4")
+    # The latest request wins; the intermediate indices never run
+    assert indices == [1, 4]
+
+
+def test_failed_phase_stops_the_job(tmp_path):
+    def retrain(index):
+        raise RuntimeError("upstream down")
+
+    def preprocess(index):
+        raise AssertionError("must not run after a failed retrain")
+
+    queue = RedeployQueue(str(tmp_path), [("retrain", retrain), ("preprocess", preprocess)], poll_interval=0.01)
+    job, _ = queue.submit(1)
+    job = wait_for(queue, job["id"], ("succeeded", "failed"))
+    assert job["status"] == "failed"
+    assert job["error"] == "retrain failed: upstream down"
+    assert set(job["phases"]) == {"retrain"}
+
@@ -0,0 +1,176 @@
+import threading
+import time
+from http.client import RemoteDisconnected
+
+import pytest
+import requests
+import urllib3
+
+from http_client import UpstreamClient
+from resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, RetryPolicy
+
+URL = "http://upstream.test/invocations"
+
+
+def response(status=200):
+    r = requests.Response()
+    r.status_code = status
+    r._content = b"{}"
+    return r
+
+
+def refused():
+    # What requests raises when the TCP connection could not be opened
+    reason = urllib3.exceptions.NewConnectionError(None, "Connection refused")
+    return requests.exceptions.ConnectionError(urllib3.exceptions.MaxRetryError(None, URL, reason))
+
+
+def dropped():
+    # The connection was lost after the request was sent
+    return requests.exceptions.ConnectionError(urllib3.exceptions.ProtocolError(
+        "Connection aborted.", RemoteDisconnected("Remote end closed connection without response")
+    ))
+
+
+def fake_upstream(client, handler):
+    """Routes the client's calls to handler(call_number) and returns the call log."""
+    calls = []
+    lock = threading.Lock()
+
+    def request(method, url, **kwargs):
+        with lock:
+            calls.append((method, url, kwargs))
+            n = len(calls)
+        result = handler(n)
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    client._get_session().request = request
+    return calls
+
+
+def no_backoff():
+    return RetryPolicy(attempts=3, base_delay=0, max_delay=0, budget=5)
+
+
+class TestCircuitBreaker:
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker("test-opens", failure_threshold=2, reset_timeout=60)
+        breaker.record(False)
+        breaker.record(True)
+        breaker.record(False)
+        assert breaker.state == CLOSED
+        breaker.record(False)
+        assert breaker.state == OPEN
+        assert not breaker.allow()
+
+    def test_half_open_lets_one_probe_through(self):
+        breaker = CircuitBreaker("test-probe", failure_threshold=1, reset_timeout=0.01)
+        breaker.record(False)
+        time.sleep(0.02)
+        assert breaker.allow()
+        assert breaker.state == HALF_OPEN
+        assert not breaker.allow()
+        breaker.record(True)
+        assert breaker.state == CLOSED
+        assert breaker.allow()
+
+    def test_probe_is_released_when_the_call_raises(self):
+        breaker = CircuitBreaker("test-release", failure_threshold=1, reset_timeout=0.01)
+        client = UpstreamClient("test-release", breaker=breaker)
+        calls = fake_upstream(client, lambda n: TypeError("bad kwargs") if n == 1 else response())
+        breaker.record(False)
+        time.sleep(0.02)
+
+        with pytest.raises(TypeError):
+            client.post(URL)
+        assert breaker.state == OPEN
+        with pytest.raises(CircuitOpenError):
+            client.post(URL)
+
+        # Not stuck half-open: the next probe goes through after the reset timeout
+        time.sleep(0.02)
+        assert client.post(URL).status_code == 200
+        assert breaker.state == CLOSED
+        assert len(calls) == 2
+
+
+class TestRetries:
+    def test_post_is_resent_when_it_never_connected(self):
+        client = UpstreamClient("test-refused", retry=no_backoff())
+        calls = fake_upstream(client, lambda n: refused() if n == 1 else response())
+        assert client.post(URL).status_code == 200
+        assert len(calls) == 2
+
+    @pytest.mark.parametrize("error", [dropped(), requests.exceptions.ReadTimeout("read timed out")])
+    def test_post_is_not_resent_once_it_may_have_arrived(self, error):
+        client = UpstreamClient("test-sent", retry=no_backoff())
+        calls = fake_upstream(client, lambda n: error)
+        with pytest.raises(type(error)):
+            client.post(URL)
+        assert len(calls) == 1
+
+    def test_idempotent_calls_are_resent_after_a_dropped_connection(self):
+        client = UpstreamClient("test-idempotent", retry=no_backoff())
+        calls = fake_upstream(client, lambda n: dropped() if n == 1 else response())
+        assert client.request("GET", URL, idempotent=True).status_code == 200
+        assert len(calls) == 2
+
+    def test_post_is_resent_only_on_rejected_statuses(self):
+        client = UpstreamClient("test-statuses", retry=no_backoff())
+        statuses = {1: 503, 2: 502}
+        calls = fake_upstream(client, lambda n: response(statuses.get(n, 200)))
+        # 503 says the upstream didn't take the call; a 502 may have come after it did
+        assert client.post(URL).status_code == 502
+        assert len(calls) == 2
+
+    def test_retries_stop_after_attempts(self):
+        client = UpstreamClient("test-attempts", retry=no_backoff())
+        calls = fake_upstream(client, lambda n: refused())
+        with pytest.raises(requests.exceptions.ConnectionError):
+            client.post(URL)
+        assert len(calls) == 3
+
+
+class TestHedging:
+    def test_slow_call_is_hedged_and_the_hedge_wins(self):
+        client = UpstreamClient("test-hedge-wins", hedge_after=0.05)
+
+        def handler(n):
+            time.sleep(1.0 if n == 1 else 0)
+            return response(200 if n == 1 else 201)
+
+        calls = fake_upstream(client, handler)
+        started = time.monotonic()
+        assert client.request("GET", URL, idempotent=True).status_code == 201
+        assert time.monotonic() - started < 0.5
+        assert len(calls) == 2
+
+    def test_post_is_never_hedged(self):
+        client = UpstreamClient("test-hedge-post", hedge_after=0.01)
+        calls = fake_upstream(client, lambda n: time.sleep(0.1) or response())
+        client.post(URL)
+        assert len(calls) == 1
+
+    def test_hedges_are_capped(self):
+        # 10 slow calls at once with a 10% ratio get one hedge between them
+        client = UpstreamClient("test-hedge-cap", pool_size=10, hedge_after=0.02, max_hedge_ratio=0.1)
+        calls = fake_upstream(client, lambda n: time.sleep(0.3) or response())
+        barrier = threading.Barrier(10)
+
+        def call():
+            barrier.wait()
+            client.request("GET", URL, idempotent=True)
+
+        threads = [threading.Thread(target=call) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(calls) == 11
+        # The hedge's slot is freed once it finishes, even if it lost
+        deadline = time.monotonic() + 2
+        while client._hedges_in_flight and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert client._hedges_in_flight == 0